@@ -2,163 +2,205 @@
 🚑 EMERGENCY WHATSAPP BOT - 108 Style
 REAL WhatsApp API Version - CORRECTED
 """
-from flask import Flask, request, jsonify
-import os
-import requests
 import json
-from dotenv import load_dotenv
+import logging
+import threading
+import time
 from datetime import datetime
+import metrics
+from config import load_config
+from bot_logging import configure_logging, LazyJSON
+from outbound import create_dispatcher
+from providers import MetaClient
+from session_store import create_session_store, filter_codes
+from engine import create_engine
+from dedup import create_seen_cache
+from delivery import create_delivery_tracker
+from batch import group_by_number
+from ingest import create_ingest, slim_message, SignatureError, SIGNATURE_HEADER
+from flow import compile_flow, LOCATION
+from dispatch import create_unit_index, dispatch_hook
+from geocode import create_geocoder
+from intents import compile_intents
+from journal import create_journal, replay, INBOUND, STEP, REPLY, DELIVERED
+from templates import templates_for, template_texts
+from tenants import Tenant, create_tenants
 
-# Load environment variables
-load_dotenv()
+# Every .env setting, parsed and checked once (ConfigError lists anything malformed)
+config = load_config()
 
-# Create Flask app
-app = Flask(__name__)
+# Queue-backed logging (LOG_LEVEL / LOG_FORMAT in .env)
+configure_logging(config)
+log = logging.getLogger('app')
+status_log = logging.getLogger('status')
 
-# Store user sessions
-user_sessions = {}
+# Flask is imported when the app is first needed (create_app(), or app.app for
+# gunicorn and the test client), so ASGI mode never loads it. Views register here.
+flask = None
+ROUTES = []
 
-print("="*60)
-print("🚀 REAL WHATSAPP EMERGENCY BOT STARTING...")
-print("="*60)
-print(f"📱 Phone Number ID: {os.getenv('WHATSAPP_PHONE_NUMBER_ID')}")
-print(f"🔑 Token present: {'✅ Yes' if os.getenv('WHATSAPP_TOKEN') else '❌ No'}")
-print(f"🌐 Webhook URL: https://6c9111c6d221.ngrok-free.app")
-print("="*60)
+def route(rule, **options):
+    """Register a view on the Flask app that create_app() builds"""
+    def register(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return register
+
+# Store user sessions (lock-striped, idle TTL + LRU cap, see SESSION_* in .env)
+user_sessions = create_session_store(config)
+
+# Background scheduler that sends replies so the webhook can ack immediately
+# (priority lanes, per-number and per-recipient rate limits, retry with backoff)
+outbound = create_dispatcher(config)
+
+# Pooled keep-alive client for graph.facebook.com (URL and auth built once)
+meta_client = MetaClient.from_config(config)
+
+# Per-phone ordered processing: same phone in order, different phones in parallel
+engine = create_engine(config)
+
+# Recently seen wamids, so Meta redeliveries don't re-run the state machine
+seen_messages = create_seen_cache(config)
+
+# Cluster mode (CLUSTER_SELF / CLUSTER_NODES): this node owns a consistent-hash
+# slice of the callers and forwards the rest of each webhook to their owners
+# (cluster.py pulls in multiprocessing, so it is only imported on cluster nodes)
+cluster = None
+if config.cluster_self:
+    from cluster import create_cluster
+    cluster = create_cluster(config, user_sessions, seen_messages)
+
+# sent -> delivered -> read per reply wamid, with latency percentiles and
+# alerts for dispatch confirmations that never arrive (DELIVERY_* in .env)
+deliveries = create_delivery_tracker(config)
+
+# Raw-body webhook decoding, X-Hub-Signature-256 checked against APP_SECRET
+ingest = create_ingest(config)
+
+# Reply texts in BOT_LANGUAGE (en, hi); the flow is compiled once into a
+# (state, input) dispatch table and every reply body is pre-encoded
+reply_templates = templates_for(config.bot_language)
+
+# Ambulance / fire / police units (DISPATCH_UNITS_FILE) for nearest-unit ETAs
+dispatch_units = create_unit_index(config)
+# Offline gazetteer (GEOCODE_GAZETTEER_FILE) that gives typed addresses coordinates
+geocoder = create_geocoder(config)
+flow_intents = compile_intents()
+
+def build_flow(templates):
+    """Compile the conversation for one template set (every tenant shares the units and gazetteer)"""
+    return compile_flow(templates=templates,
+                        hooks={'dispatch': dispatch_hook(dispatch_units, templates, geocoder)},
+                        intents=flow_intents)
+
+conversation = build_flow(reply_templates)
+
+# Several regional numbers on one deployment (TENANTS_FILE, hot-reloaded): each
+# webhook is routed by metadata.phone_number_id to its tenant's flow, credentials
+# and outbound pool. The .env number above is the default tenant.
+default_tenant = Tenant(config.whatsapp_phone_number_id, 'default', meta_client, conversation, outbound,
+                        default=True)
+tenants = create_tenants(config, default_tenant, build_flow)
+
+# Write-ahead incident journal (JOURNAL_DIR): inbound messages, transitions and
+# replies, replayed at startup so a crash loses neither sessions nor sends
+incident_log = create_journal(config)
+
+# /metrics: hot-path timings recorded per thread, component stats read at scrape time
+metrics.configure_profiler(config)
+metrics.register_components(outbound=outbound, engine=engine, sessions=user_sessions, dedup=seen_messages,
+                           tenants=tenants)
+WEBHOOK_REQUESTS = metrics.counter('webhook_requests_total', "Webhook POSTs by response status",
+                                   ('provider', 'status'))
+PARSE_SECONDS = metrics.histogram('webhook_parse_seconds', "Webhook body decode and envelope grouping time",
+                                  ('provider',))
+TRANSITION_SECONDS = metrics.histogram('flow_transition_seconds', "Time to advance a session by one message",
+                                       ('state',))
+metrics.collector('delivery_awaiting', "Dispatch confirmations sent but not yet delivered",
+                  lambda: deliveries.stats()['awaiting_confirmation'])
+if incident_log is not None:
+    metrics.collector('journal_records_total', "Incident journal records written and fsynced",
+                      lambda: incident_log.stats()['records_written'], kind='counter')
+
+def log_startup():
+    """Startup banner, logged once the server (Flask or ASGI) is being brought up"""
+    log.info("🚀 REAL WHATSAPP EMERGENCY BOT STARTING...")
+    log.info("📱 Phone Number ID: %s", config.whatsapp_phone_number_id)
+    log.info("🔑 Token present: %s", '✅ Yes' if config.whatsapp_token else '❌ No')
+    log.info("🌐 Webhook URL: https://6c9111c6d221.ngrok-free.app")
 
 # ============================================
-# REAL WHATSAPP API FUNCTIONS
+# DEFERRED WARM-UP
 # ============================================
 
-def send_whatsapp_message(phone_number, message_text):
-    """Send REAL WhatsApp message via Meta API"""
-    
-    access_token = os.getenv('WHATSAPP_TOKEN')
-    phone_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
-    
-    if not access_token:
-        print("❌ ERROR: No WhatsApp access token found in .env")
-        print("   Make sure WHATSAPP_TOKEN= is set in .env file")
-        return None
-    
-    if not phone_id:
-        print("❌ ERROR: No Phone Number ID found in .env")
-        return None
-    
-    # WhatsApp API URL
-    url = f"https://graph.facebook.com/v18.0/{phone_id}/messages"
-    
-    # Headers with access token
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
-    # Message payload
-    data = {
-        "messaging_product": "whatsapp",
-        "recipient_type": "individual",
-        "to": phone_number,
-        "type": "text",
-        "text": {"body": message_text}
-    }
-    
-    try:
-        print(f"📤 SENDING to {phone_number}: {message_text[:50]}...")
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"✅ Message sent successfully to {phone_number}")
-            return response.json()
-        else:
-            print(f"❌ Failed to send: {response.status_code}")
-            print(f"   Response: {response.text}")
-            return None
-            
-    except Exception as e:
-        print(f"❌ WhatsApp API Error: {e}")
-        return None
+# Provider sessions (and the requests import behind them) are opened once the
+# server has answered its first request, instead of holding up that first 200
 
-def send_welcome_menu(phone_number):
-    """Send welcome message with emergency options"""
-    
-    message = """🚨 *Welcome to 108 Emergency Services*
+_warm_up_thread = None
+
+def warm_up():
+    """Open every tenant's provider session and pre-encode its reply bodies"""
+    started = time.perf_counter()
+    clients = {id(tenant.client): tenant for tenant in (default_tenant, *tenants)}
+    for tenant in clients.values():
+        tenant.client.warm(template_texts(tenant.conversation.templates))
+    log.info("🔥 Provider clients warmed up in %.0f ms (%s)", (time.perf_counter() - started) * 1000, len(clients))
 
-Please choose emergency type:
+def start_warm_up():
+    """Run warm_up() once, on a background thread"""
+    global _warm_up_thread
+    if _warm_up_thread is None:
+        _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+        _warm_up_thread.start()
 
-1. 🚑 *Medical Emergency* - Ambulance
-2. 🔥 *Fire Emergency* - Fire Brigade  
-3. 👮 *Police Emergency* - Police
+def warm_up_after(response):
+    """after_request hook: start warming up once the first response has been sent"""
+    if _warm_up_thread is None:
+        response.call_on_close(start_warm_up)
+    return response
+
+# ============================================
+# REAL WHATSAPP API FUNCTIONS
+# ============================================
 
-Reply with *1*, *2*, or *3*"""
+def send_whatsapp_message(phone_number, message_text):
+    """Send REAL WhatsApp message via Meta API
     
-    return send_whatsapp_message(phone_number, message)
+    Returns Meta's response body, or None if the message was rejected. Raises
+    RetryableSendError when Meta throttles us or fails transiently, so the
+    outbound scheduler can back off and retry.
+    """
+    return meta_client.deliver(phone_number, message_text)
 
-def ask_for_location(phone_number, emergency_type):
+def welcome_menu_text():
+    """Welcome message with emergency options"""
+    return conversation.render('menu')
+
+def location_request_text(emergency_type):
     """Ask user to share location"""
-    
-    emergency_names = {
-        "medical": "Medical Emergency 🚑",
-        "fire": "Fire Emergency 🔥",
-        "police": "Police Emergency 👮"
-    }
-    
-    message = f"""📍 *{emergency_names.get(emergency_type, 'Emergency')} Selected*
+    return conversation.render('location_request', emergency_type)
 
-Please share your location:
-• Tap 📎 *attachment* icon
-• Select *Location*
-• Send your current location
+def confirmation_text(emergency_type):
+    """Confirmation that help is coming"""
+    return conversation.render('confirmation', emergency_type)
 
-*OR* type your address manually."""
+def send_welcome_menu(phone_number):
+    """Send welcome message with emergency options"""
+    return send_whatsapp_message(phone_number, welcome_menu_text())
 
-    return send_whatsapp_message(phone_number, message)
+def ask_for_location(phone_number, emergency_type):
+    """Ask user to share location"""
+    return send_whatsapp_message(phone_number, location_request_text(emergency_type))
 
 def send_confirmation(phone_number, emergency_type):
     """Send confirmation that help is coming"""
-    
-    messages = {
-        "medical": """✅ *Ambulance Dispatched!*
-        
-⏱️ *ETA:* 8-12 minutes
-📞 *Medical team will call you shortly*
-
-*Please:*
-• Stay with the patient
-• Keep medicines handy
-• Clear entrance pathway
-• Keep phone accessible""",
-        
-        "fire": """✅ *Fire Engine Dispatched!*
-        
-⏱️ *ETA:* 6-10 minutes
-📞 *Firefighters will contact you*
-
-*Immediately:*
-• Evacuate everyone
-• Close all doors
-• Don't use elevators
-• Gather at safe distance""",
-        
-        "police": """✅ *Police Patrol Dispatched!*
-        
-⏱️ *ETA:* 5-9 minutes  
-📞 *Officer will call for details*
-
-*Please:*
-• Stay in safe location
-• Secure premises
-• Keep phone ready
-• Note suspect details"""
-    }
-    
-    return send_whatsapp_message(phone_number, messages.get(emergency_type, "✅ Help is on the way!"))
+    return send_whatsapp_message(phone_number, confirmation_text(emergency_type))
 
 # ============================================
 # FLASK ROUTES
 # ============================================
 
-@app.route('/')
+@route('/')
 def home():
     """Home page"""
     return """
@@ -200,163 +242,462 @@ def home():
     </html>
     """
 
-@app.route('/test')
+@route('/test')
 def test():
     """Test endpoint"""
     return "✅ Emergency WhatsApp Bot is running!"
 
-@app.route('/health')
+@route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return flask.jsonify({
         "status": "healthy",
         "service": "WhatsApp Emergency Bot",
-        "whatsapp_configured": bool(os.getenv('WHATSAPP_TOKEN')),
+        "whatsapp_configured": bool(config.whatsapp_token),
         "sessions_active": len(user_sessions),
+        "session_store": user_sessions.stats(),
+        "engine": engine.stats(),
+        "dedup": seen_messages.stats(),
+        "ingest": ingest.stats(),
+        "outbound": outbound.stats(),
+        "deliveries": deliveries.stats(),
+        "payload_cache": meta_client.payloads.stats(),
+        "dispatch": dispatch_units.stats(),
+        "geocoder": geocoder.stats(),
+        "journal": incident_log.stats() if incident_log is not None else None,
+        "tenants": tenants.stats(),
+        "cluster": cluster.stats() if cluster is not None else None,
         "webhook_url": "https://6c9111c6d221.ngrok-free.app"
     })
 
-@app.route('/sessions')
+@route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@route('/metrics/profile', methods=['GET', 'POST'])
+def profile():
+    """Sampling profiler: POST ?enabled=1|0 to toggle, GET for folded stacks"""
+    if flask.request.method == 'POST':
+        enabled = flask.request.args.get('enabled', '1') not in ('0', 'false', 'off')
+        if not metrics.toggle_profiler(enabled):
+            return flask.jsonify({"error": "Set METRICS_PROFILE_HZ to enable the profiler"}), 403
+        return flask.jsonify({"profiling": enabled, "samples": metrics.PROFILER.samples})
+    if metrics.PROFILER is None:
+        return flask.jsonify({"error": "Set METRICS_PROFILE_HZ to enable the profiler"}), 404
+    return metrics.PROFILER.folded(flask.request.args.get('limit', type=int)), 200, {'Content-Type': 'text/plain'}
+
+def parse_time(value):
+    """Unix seconds or an ISO-8601 timestamp -> unix seconds"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def session_query(args):
+    """(filters, cursor, limit) from /sessions query parameters; ValueError if malformed"""
+    filters = {key: args[key] for key in ('state', 'emergency_type') if args.get(key)}
+    filter_codes(**filters)
+    filters.update({key: parse_time(args[key]) for key in ('active_after', 'active_before') if args.get(key)})
+    limit = int(args.get('limit') or 100)
+    if not 1 <= limit <= 1000:
+        raise ValueError("limit must be between 1 and 1000")
+    return filters, args.get('cursor') or None, limit
+
+def ndjson_lines(rows):
+    """One {"phone": ..., **session} JSON object per line"""
+    for phone, session in rows:
+        yield json.dumps({"phone": phone, **session}, ensure_ascii=False) + "\n"
+
+@route('/deliveries')
+def delivery_report():
+    """Delivery counts and latency percentiles, plus confirmations overdue right now"""
+    return flask.jsonify({
+        "stats": deliveries.stats(),
+        "overdue": [dict(record, wamid=wamid) for wamid, record in deliveries.overdue()]
+    })
+
+@route('/deliveries/<wamid>')
+def delivery_status(wamid):
+    """sent / delivered / read timestamps of one reply"""
+    record = deliveries.get(wamid)
+    if record is None:
+        return flask.jsonify({"error": "Unknown message id"}), 404
+    return flask.jsonify(dict(record, wamid=wamid))
+
+@route('/tenants', methods=['GET'])
+def tenant_report():
+    """Numbers served, with each tenant's outbound queue"""
+    return flask.jsonify(tenants.stats())
+
+@route('/tenants/reload', methods=['POST'])
+def reload_tenants():
+    """Re-read TENANTS_FILE now instead of waiting for the mtime check"""
+    if tenants.path is None:
+        return flask.jsonify({"error": "Set TENANTS_FILE to serve several numbers"}), 404
+    if not tenants.reload():
+        return flask.jsonify({"error": "Tenants file could not be loaded, previous tenants kept"}), 500
+    return flask.jsonify({"tenants": len(tenants), "reloads": tenants.reloads})
+
+@route('/cluster', methods=['GET'])
+def cluster_report():
+    """Ring members, this node's share and forwarding / handoff counts"""
+    if cluster is None:
+        return flask.jsonify({"error": "Set CLUSTER_SELF to run as a cluster node"}), 404
+    return flask.jsonify(cluster.stats())
+
+@route('/cluster/members', methods=['POST'])
+def cluster_members():
+    """Change the ring on every node: {"nodes": ["host:port", ...]} (needs the admin token)"""
+    if cluster is None:
+        return flask.jsonify({"error": "Set CLUSTER_SELF to run as a cluster node"}), 404
+    if not cluster.admin_allowed(flask.request.headers.get('Authorization')):
+        return flask.jsonify({"error": "Send Authorization: Bearer <CLUSTER_ADMIN_TOKEN>"}), 403
+    nodes = (flask.request.get_json(silent=True) or {}).get('nodes')
+    if not nodes or not isinstance(nodes, list):
+        return flask.jsonify({"error": "Expected {\"nodes\": [\"host:port\", ...]}"}), 400
+    epoch, unreached = cluster.change(nodes)
+    status = 200 if not unreached else 502
+    return flask.jsonify({"epoch": epoch, "nodes": sorted(set(nodes)), "unreached": unreached}), status
+
+@route('/sessions')
 def sessions():
-    """Show active user sessions"""
-    return jsonify({
+    """Active sessions a page at a time, ordered by phone
+    
+    ?state= &emergency_type= &active_after= &active_before= (unix or ISO) filter,
+    ?cursor= continues from the previous page's next_cursor, ?limit= (max 1000).
+    ?format=ndjson streams every matching session instead, one per line.
+    """
+    try:
+        filters, cursor, limit = session_query(flask.request.args)
+    except ValueError as e:
+        return flask.jsonify({"error": str(e)}), 400
+    
+    if flask.request.args.get('format') == 'ndjson':
+        return flask.Response(flask.stream_with_context(ndjson_lines(user_sessions.export(**filters))),
+                        mimetype='application/x-ndjson')
+    
+    rows, next_cursor = user_sessions.page(cursor, limit, **filters)
+    return flask.jsonify({
         "total_sessions": len(user_sessions),
-        "sessions": user_sessions
+        "count": len(rows),
+        "sessions": dict(rows),
+        "next_cursor": next_cursor
     })
 
+# ============================================
+# MESSAGE PROCESSING (runs on the sender's engine partition)
+# ============================================
+
+def location_fields(pin):
+    """Session fields for a shared location pin, or None if it has no coordinates"""
+    try:
+        lat, lon = float(pin['latitude']), float(pin['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    label = pin.get('address') or pin.get('name') or f"{lat:.5f},{lon:.5f}"
+    return {'location': label, 'latitude': lat, 'longitude': lon}
+
+def apply_message(phone, session, message, flow=None):
+    """Advance one session by one message (through a tenant's flow if given).
+    
+    Returns (session, reply): the new session dict (None = no session) and the
+    reply to send as (text, priority), or None.
+    """
+    flow = flow or conversation
+    fields = None
+    if message.get('type') == 'text':
+        text = message['text']['body']
+        log.info("📨 Message from %s: %s", phone, text, extra={'phone': phone})
+    elif message.get('type') == 'location':
+        text, fields = LOCATION, location_fields(message.get('location') or {})
+        if fields is None:
+            return session, None
+        log.info("📍 Location from %s: %s", phone, fields['location'], extra={'phone': phone})
+    else:
+        return session, None
+    
+    state = session['state'] if session else flow.initial
+    started = time.perf_counter()
+    new_session, reply = flow.step(session, text, fields)
+    TRANSITION_SECONDS.since(started, state)
+    if new_session is not session:
+        log.info("🔀 %s: %s → %s", phone, state, new_session['state'],
+                 extra={'phone': phone, 'state': new_session['state'],
+                        'emergency_type': new_session.get('emergency_type')})
+    return new_session, reply
+
+def advance_session(phone, messages, tenant=None):
+    """Run all of one phone's messages through the state machine in one pass.
+    
+    Reads the session once, writes it back once, and returns the (text, priority)
+    replies in order. tenant (default: the .env number) picks the flow and the
+    session key.
+    """
+    tenant = tenant or default_tenant
+    key = tenant.session_key(phone)
+    original = session = user_sessions.get(key)
+    if cluster is not None:
+        # Mid-handoff the previous owner may hold a newer copy than the one it pushed
+        session = cluster.claim(key) or session
+    replies = []
+    
+    for message in messages:
+        before = session
+        session, reply = apply_message(phone, session, message, tenant.conversation)
+        if incident_log is not None:
+            journal_step(key, message, before, session)
+        if reply:
+            replies.append(reply)
+    
+    if session is not original:
+        user_sessions.set(key, session)
+    return replies
+
+def process_messages(phone, messages, tenant=None):
+    """Engine job: advance the session, then queue each reply on the phone's outbound lane"""
+    for text, priority in advance_session(phone, messages, tenant):
+        queue_reply(phone, text, priority, tenant=tenant)
+
+def queue_reply(phone, text, priority, ref=None, tenant=None):
+    """Queue one reply on its tenant's pool, journaled first so a crash before it is sent re-drives it
+
+    A full pool is waited on for up to QUEUE_WAIT seconds (slowing the engine,
+    so the webhook sheds load with 503s); a reply still not queued is logged
+    and stays pending in the journal for the next replay. Returns False then.
+    """
+    tenant = tenant or default_tenant
+    if ref is None:
+        ref = journal_reply(tenant.session_key(phone), text, priority)
+    if tenant.outbound.submit(send_reply, phone, text, priority, ref, tenant,
+                              priority=priority, recipient=phone, timeout=config.queue_wait):
+        return True
+    log.error("❌ Reply to %s not queued (outbound full or stopping)%s", phone,
+              " - left pending in the journal" if ref is not None else " - lost")
+    return False
+
+def send_reply(phone_number, message_text, priority, ref=None, tenant=None):
+    """Outbound job: send, start tracking the wamid, mark the journaled reply done
+    
+    A send that raises is not marked, so retries and a later replay still own it.
+    """
+    if tenant is None or tenant is default_tenant:
+        result = send_whatsapp_message(phone_number, message_text)
+    else:
+        result = tenant.client.deliver(phone_number, message_text)
+    deliveries.sent(result, phone_number, priority)
+    journal_delivered(ref, result)
+    return result
+
+# ============================================
+# INCIDENT JOURNAL
+# ============================================
+
+# Records are keyed by session key (the phone, prefixed "<number>:" for
+# tenants other than the .env number) so replay can route them again
+
+def journal_messages(key, messages):
+    """Journal messages as received, before they are queued for processing"""
+    if incident_log is not None:
+        for message in messages:
+            incident_log.append(INBOUND, p=key, m=message)
+
+def journal_step(key, message, before, after):
+    """Mark a message processed, with the session it produced if it changed one"""
+    if after is before:
+        incident_log.append(STEP, p=key, id=message.get('id'))
+    else:
+        incident_log.append(STEP, p=key, id=message.get('id'), s=after)
+
+def journal_reply(key, text, priority):
+    """Journal a reply about to be sent; returns the ref its delivery is marked with"""
+    if incident_log is not None:
+        return incident_log.append(REPLY, p=key, text=text, pri=priority)
+    return None
+
+def journal_delivered(ref, result):
+    if incident_log is not None and ref is not None:
+        incident_log.append(DELIVERED, ref=ref, ok=result is not None)
+
+def recover_from_journal():
+    """Open the journal and re-drive whatever the last process left unfinished
+
+    Sessions are restored, messages that were acked but never processed go back
+    to the engine and unsent replies back to the outbound queue. Anything older
+    than JOURNAL_RECOVER_MAX_AGE seconds (default 1h) is left alone.
+    """
+    incident_log.open()
+    recovery = replay(incident_log.directory, max_age=config.journal_recover_max_age)
+    for key, (session, _) in recovery.sessions.items():
+        if session is not None:
+            user_sessions.set(key, session)
+    for key, messages in recovery.unprocessed.items():
+        tenant, phone = tenants.for_key(key)
+        if tenant is None:
+            log.warning("⚠️ %s journaled messages for %s dropped: tenant no longer configured", len(messages), key)
+            continue
+        if not engine.submit(key, process_messages, phone, messages, tenant, timeout=config.queue_wait):
+            log.error("❌ %s journaled messages for %s not re-driven (engine full) - left for the next replay",
+                      len(messages), key)
+    for ref, (key, text, priority, _) in sorted(recovery.pending.items()):
+        tenant, phone = tenants.for_key(key)
+        if tenant is None:
+            log.warning("⚠️ Journaled reply to %s dropped: tenant no longer configured", key)
+            continue
+        queue_reply(phone, text, priority, ref=ref, tenant=tenant)
+    log.info("📒 Journal replayed in %.2fs: %s records, %s sessions restored, %s messages and %s replies re-driven",
+             recovery.seconds, recovery.records, len(recovery.sessions),
+             sum(map(len, recovery.unprocessed.values())), len(recovery.pending))
+
+if incident_log is not None:
+    recover_from_journal()
+
 # ============================================
 # WHATSAPP WEBHOOK HANDLING - CORRECTED
 # ============================================
 
-@app.route('/webhook', methods=['GET'])
+@route('/webhook', methods=['GET'])
 def verify_webhook():
     """Verify webhook with Meta"""
-    mode = request.args.get('hub.mode')
-    token = request.args.get('hub.verify_token')
-    challenge = request.args.get('hub.challenge')
+    mode = flask.request.args.get('hub.mode')
+    token = flask.request.args.get('hub.verify_token')
+    challenge = flask.request.args.get('hub.challenge')
     
-    print(f"🔍 Webhook verification attempt: mode={mode}, token={token}")
+    log.info("🔍 Webhook verification attempt: mode=%s", mode)
     
-    if mode == 'subscribe' and token == os.getenv('VERIFY_TOKEN'):
-        print("✅ Webhook verified successfully!")
+    if mode == 'subscribe' and token == config.verify_token:
+        log.info("✅ Webhook verified successfully!")
         # RETURN THE CHALLENGE WITH THE CRITICAL HEADER
         return challenge, 200, {'ngrok-skip-browser-warning': 'any-value'}
     
-    print("❌ Webhook verification failed")
+    log.warning("❌ Webhook verification failed")
     return "Verification failed", 403
 
-@app.route('/webhook', methods=['POST'])
+def accept_webhook(by_number, statuses):
+    """One engine job per sender, routed to the tenant that owns the number
+    the messages were sent to, then the delivery receipts for our replies
+
+    Returns False if a full engine partition refused some sender's batch:
+    those wamids are un-marked as seen and closed in the journal, so the
+    caller answers 503 and Meta's redelivery is processed, not deduplicated.
+    With a journal, it returns once the messages' records are fsynced (or
+    JOURNAL_ACK_TIMEOUT runs out), so an acked message survives a crash.
+    """
+    accepted, journaled = True, False
+    for number, by_phone in by_number.items():
+        tenant = tenants.route(number)
+        if tenant is None:
+            log.warning("⚠️ %s messages for unknown number %s dropped",
+                        sum(map(len, by_phone.values())), number)
+            continue
+        for phone, messages in by_phone.items():
+            key = tenant.session_key(phone)
+            journal_messages(key, messages)
+            journaled = incident_log is not None
+            if not engine.submit(key, process_messages, phone, messages, tenant):
+                accepted = False
+                refuse_messages(key, messages)
+    
+    if statuses:
+        deliveries.update(statuses)
+    for status in statuses:
+        status_log.info("📤 Message status: %s for %s", status.get('status'), status.get('id'))
+    if journaled and config.journal_ack_timeout and not incident_log.sync(config.journal_ack_timeout):
+        # The messages are queued already; a 503 would only get the redelivery deduplicated
+        log.warning("⚠️ Journal not durable after %.1fs - acking anyway", config.journal_ack_timeout)
+    return accepted
+
+def refuse_messages(key, messages):
+    """Forget messages the engine refused: Meta will redeliver them after our 503"""
+    for message in messages:
+        seen_messages.forget(message.get('id'))
+        if incident_log is not None:
+            journal_step(key, message, None, None)
+
+if cluster is not None:
+    cluster.start(accept_webhook)
+
+@route('/webhook', methods=['POST'])
 def handle_webhook():
     """Handle incoming WhatsApp messages - ONLY ONE POST ROUTE!"""
     
-    # LOG EVERYTHING
-    print("\n" + "="*60)
-    print("📥 WEBHOOK CALLED!")
-    print(f"📋 Headers: {dict(request.headers)}")
+    # Headers and payload are only rendered when LOG_LEVEL=DEBUG
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("📥 WEBHOOK CALLED! Headers: %s", dict(flask.request.headers))
     
     try:
-        data = request.get_json()
+        started = time.perf_counter()
+        try:
+            data = ingest.decode(flask.request.get_data(cache=False), flask.request.headers.get(SIGNATURE_HEADER))
+        except SignatureError as e:
+            log.warning("❌ Webhook rejected: %s", e)
+            WEBHOOK_REQUESTS.inc('meta', '403')
+            return flask.jsonify({"error": "Invalid signature"}), 403
         if not data:
-            print("❌ No JSON data received")
-            return jsonify({"error": "No data"}), 400
-        
-        print(f"✅ Received JSON data")
-        print(f"📊 Data keys: {list(data.keys())}")
+            log.warning("❌ No JSON data received")
+            WEBHOOK_REQUESTS.inc('meta', '400')
+            return flask.jsonify({"error": "No data"}), 400
         
-        # Log full data (truncated)
-        data_str = json.dumps(data, indent=2)
-        print(f"📄 Data preview:\n{data_str[:500]}...")
+        log.debug("📄 Data preview:\n%s", LazyJSON(data))
         
         # Check if this is a WhatsApp message
         if data.get('object') == 'whatsapp_business_account':
-            print("🎯 WhatsApp message detected!")
-            
-            # Extract phone number and message
-            for entry in data.get('entry', []):
-                for change in entry.get('changes', []):
-                    value = change.get('value', {})
-                    
-                    # Handle messages
-                    if 'messages' in value:
-                        for message in value['messages']:
-                            phone = message['from']
-                            msg_type = message['type']
-                            
-                            if msg_type == 'text':
-                                text = message['text']['body']
-                                print(f"📨 Message from {phone}: {text}")
-                                
-                                # Handle HELP command
-                                if text.lower() == 'help':
-                                    # Initialize session
-                                    user_sessions[phone] = {
-                                        'state': 'awaiting_choice',
-                                        'last_active': datetime.now().isoformat()
-                                    }
-                                    
-                                    # Send welcome menu
-                                    send_welcome_menu(phone)
-                                    print(f"👤 {phone}: Sent welcome menu")
-                                
-                                # Handle emergency choice
-                                elif text in ['1', '2', '3']:
-                                    if phone in user_sessions:
-                                        emergency_map = {'1': 'medical', '2': 'fire', '3': 'police'}
-                                        emergency_type = emergency_map.get(text)
-                                        
-                                        user_sessions[phone]['emergency_type'] = emergency_type
-                                        user_sessions[phone]['state'] = 'awaiting_location'
-                                        
-                                        ask_for_location(phone, emergency_type)
-                                        print(f"🚨 {phone}: Selected {emergency_type}")
-                                    else:
-                                        send_whatsapp_message(phone, "Please type HELP first")
-                                
-                                # Handle other messages
-                                else:
-                                    if phone in user_sessions:
-                                        # If waiting for location, accept text as address
-                                        if user_sessions[phone]['state'] == 'awaiting_location':
-                                            user_sessions[phone]['location'] = text
-                                            user_sessions[phone]['state'] = 'completed'
-                                            
-                                            emergency_type = user_sessions[phone].get('emergency_type', 'unknown')
-                                            send_confirmation(phone, emergency_type)
-                                            print(f"📍 {phone}: Provided address for {emergency_type}")
-                                        
-                                    else:
-                                        # If no session, prompt for HELP
-                                        send_whatsapp_message(phone, "Type 'HELP' to start emergency services")
-                                        print(f"💬 {phone}: Prompted to type HELP")
-                    
-                    # Handle message status updates
-                    elif 'statuses' in value:
-                        for status in value['statuses']:
-                            print(f"📤 Message status: {status.get('status')} for {status.get('id')}")
+            # One pass over the envelope; in a cluster, other nodes' callers are
+            # forwarded to them (and deduplicated there)
+            by_number, statuses = group_by_number(data, seen_messages if cluster is None else None, slim_message)
+            PARSE_SECONDS.since(started, 'meta')
+            forwarded = True
+            if cluster is not None:
+                by_number, statuses, forwarded = cluster.split(by_number, statuses)
+            if not (accept_webhook(by_number, statuses) and forwarded):
+                WEBHOOK_REQUESTS.inc('meta', '503')
+                return flask.jsonify({"error": "Busy, retry later"}), 503
         
         else:
-            print("⚠️ Not a WhatsApp business account message")
+            log.warning("⚠️ Not a WhatsApp business account message")
         
-        print("="*60)
-        return jsonify({"status": "ok"}), 200
+        WEBHOOK_REQUESTS.inc('meta', '200')
+        return flask.jsonify({"status": "ok"}), 200
         
     except Exception as e:
-        print(f"❌ Error in webhook handler: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        log.exception("❌ Error in webhook handler: %s", e)
+        WEBHOOK_REQUESTS.inc('meta', '500')
+        return flask.jsonify({"error": str(e)}), 500
+
+# ============================================
+# FLASK APP (built on first use)
+# ============================================
+
+_flask_app = None
+
+def create_app():
+    """The Flask app with every @route view registered (Flask is imported on the first call)"""
+    global flask, _flask_app
+    if _flask_app is None:
+        import flask
+        flask_app = flask.Flask(__name__)
+        for rule, view, options in ROUTES:
+            flask_app.add_url_rule(rule, view_func=view, **options)
+        flask_app.after_request(warm_up_after)
+        _flask_app = flask_app
+        log_startup()
+    return _flask_app
+
+def __getattr__(name):
+    # app.app (gunicorn app:app, flask run, the test client) builds the Flask app
+    if name == 'app':
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ============================================
 # START SERVER
 # ============================================
 
 if __name__ == '__main__':
-    port = int(os.getenv('PORT', 5000))
-    print(f"🌐 Starting server on port {port}...")
-    print(f"📱 Test URL: http://localhost:{port}")
-    print(f"🌍 Ngrok URL: https://6c9111c6d221.ngrok-free.app")
-    print("="*60)
-    print("💡 Send 'HELP' to +1 555 179 9388 on WhatsApp!")
-    print("="*60)
+    port = config.port
+    log.info("🌐 Starting server on port %s...", port)
+    log.info("📱 Test URL: http://localhost:%s", port)
+    log.info("🌍 Ngrok URL: https://6c9111c6d221.ngrok-free.app")
+    log.info("💡 Send 'HELP' to +1 555 179 9388 on WhatsApp!")
     
-    app.run(host='0.0.0.0', port=port, debug=True, threaded=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""
+⚡ EMERGENCY WHATSAPP BOT - ASGI (asyncio) mode
+Same routes and state machine as app.py, but the HTTP side is served on an
+event loop. Messages are processed on the same per-phone engine threads
+(nothing that can block - session store I/O, cluster RPCs - runs on the loop),
+and replies leave through the same outbound scheduler as in Flask mode
+(each tenant's pool, rate limits, priority lanes, retry with backoff), so a
+throttled send is retried rather than lost.
+
+Sends use the pooled `requests` clients on the scheduler's worker threads,
+not an async HTTP client: the scheduler's token buckets, retries and journal
+marks are thread-based, so an async sender would bypass them. What this mode
+buys is HTTP serving without a thread per open webhook request.
+
+Run: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import time
+from itertools import islice
+from urllib.parse import parse_qs
+
+import app as bot
+import metrics
+from batch import group_by_number
+from ingest import SignatureError, slim_message
+
+log = logging.getLogger('asgi')
+
+
+# ============================================
+# HTTP HELPERS
+# ============================================
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        event = await receive()
+        chunks.append(event.get('body', b''))
+        if not event.get('more_body'):
+            return b''.join(chunks)
+
+
+def header(scope, name):
+    """First value of a (lowercase, bytes) request header as str, or None"""
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def respond(send, status, body, content_type=b'application/json', headers=()):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode() if content_type == b'application/json' else str(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode()), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+# ============================================
+# ROUTES
+# ============================================
+
+async def verify_webhook(scope, receive, send):
+    """Verify webhook with Meta"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    mode = query.get('hub.mode', [None])[0]
+    token = query.get('hub.verify_token', [None])[0]
+    challenge = query.get('hub.challenge', [''])[0]
+
+    if mode == 'subscribe' and token == bot.config.verify_token:
+        log.info("✅ Webhook verified successfully!")
+        return await respond(send, 200, challenge, b'text/plain',
+                             [(b'ngrok-skip-browser-warning', b'any-value')])
+    log.warning("❌ Webhook verification failed")
+    await respond(send, 403, "Verification failed", b'text/plain')
+
+
+async def handle_webhook(scope, receive, send):
+    """Handle incoming WhatsApp messages"""
+    body = await read_body(receive)
+    started = time.perf_counter()
+    try:
+        data = bot.ingest.decode(body, header(scope, b'x-hub-signature-256'))
+    except SignatureError as e:
+        log.warning("❌ Webhook rejected: %s", e)
+        bot.WEBHOOK_REQUESTS.inc('meta', '403')
+        return await respond(send, 403, {"error": "Invalid signature"})
+    if not data:
+        log.warning("❌ No JSON data received")
+        bot.WEBHOOK_REQUESTS.inc('meta', '400')
+        return await respond(send, 400, {"error": "No data"})
+
+    try:
+        if data.get('object') == 'whatsapp_business_account':
+            cluster = bot.cluster
+            by_number, statuses = group_by_number(data, bot.seen_messages if cluster is None else None,
+                                                  slim_message)
+            bot.PARSE_SECONDS.since(started, 'meta')
+            forwarded = True
+            if cluster is not None:
+                # Forwarding is a blocking RPC, so it runs off the loop
+                by_number, statuses, forwarded = await asyncio.get_running_loop().run_in_executor(
+                    None, cluster.split, by_number, statuses)
+            # Sessions advance on the engine's per-phone threads: the cluster claim
+            # RPC and a sqlite / server session store would block the loop
+            if bot.incident_log is None:
+                accepted = bot.accept_webhook(by_number, statuses)
+            else:
+                # Waits for the journal fsync before we ack
+                accepted = await asyncio.get_running_loop().run_in_executor(
+                    None, bot.accept_webhook, by_number, statuses)
+            if not (accepted and forwarded):
+                bot.WEBHOOK_REQUESTS.inc('meta', '503')
+                return await respond(send, 503, {"error": "Busy, retry later"})
+        else:
+            log.warning("⚠️ Not a WhatsApp business account message")
+        bot.WEBHOOK_REQUESTS.inc('meta', '200')
+        await respond(send, 200, {"status": "ok"})
+
+    except Exception as e:
+        log.exception("❌ Error in webhook handler: %s", e)
+        bot.WEBHOOK_REQUESTS.inc('meta', '500')
+        await respond(send, 500, {"error": str(e)})
+
+
+async def health(scope, receive, send):
+    """Health check endpoint"""
+    await respond(send, 200, await asyncio.get_running_loop().run_in_executor(None, health_report))
+
+
+def health_report():
+    """The /health payload (the session store's count and stats can block, so run on the executor)"""
+    return {
+        "status": "healthy",
+        "service": "WhatsApp Emergency Bot",
+        "mode": "asgi",
+        "whatsapp_configured": bool(bot.config.whatsapp_token),
+        "sessions_active": len(bot.user_sessions),
+        "session_store": bot.user_sessions.stats(),
+        "dedup": bot.seen_messages.stats(),
+        "ingest": bot.ingest.stats(),
+        "outbound": bot.outbound.stats(),
+        "deliveries": bot.deliveries.stats(),
+        "journal": bot.incident_log.stats() if bot.incident_log is not None else None,
+        "tenants": bot.tenants.stats(),
+        "cluster": bot.cluster.stats() if bot.cluster is not None else None,
+    }
+
+
+async def metrics_endpoint(scope, receive, send):
+    """Prometheus scrape endpoint"""
+    await respond(send, 200, metrics.render(), metrics.CONTENT_TYPE.encode())
+
+
+async def deliveries(scope, receive, send):
+    """Delivery counts, latency percentiles and overdue confirmations"""
+    await respond(send, 200, {
+        "stats": bot.deliveries.stats(),
+        "overdue": [dict(record, wamid=wamid) for wamid, record in bot.deliveries.overdue()],
+    })
+
+
+async def tenants(scope, receive, send):
+    """Numbers served, with each tenant's outbound queue"""
+    await respond(send, 200, bot.tenants.stats())
+
+
+async def reload_tenants(scope, receive, send):
+    """Re-read TENANTS_FILE now (see app.reload_tenants)"""
+    if bot.tenants.path is None:
+        return await respond(send, 404, {"error": "Set TENANTS_FILE to serve several numbers"})
+    if not bot.tenants.reload():
+        return await respond(send, 500, {"error": "Tenants file could not be loaded, previous tenants kept"})
+    await respond(send, 200, {"tenants": len(bot.tenants), "reloads": bot.tenants.reloads})
+
+
+async def cluster_report(scope, receive, send):
+    """Ring members, this node's share and forwarding / handoff counts"""
+    if bot.cluster is None:
+        return await respond(send, 404, {"error": "Set CLUSTER_SELF to run as a cluster node"})
+    await respond(send, 200, bot.cluster.stats())
+
+
+async def cluster_members(scope, receive, send):
+    """Change the ring on every node (see app.cluster_members)"""
+    if bot.cluster is None:
+        return await respond(send, 404, {"error": "Set CLUSTER_SELF to run as a cluster node"})
+    if not bot.cluster.admin_allowed(header(scope, b'authorization')):
+        return await respond(send, 403, {"error": "Send Authorization: Bearer <CLUSTER_ADMIN_TOKEN>"})
+    try:
+        nodes = json.loads(await read_body(receive) or b'{}').get('nodes')
+    except (ValueError, AttributeError):
+        nodes = None
+    if not nodes or not isinstance(nodes, list):
+        return await respond(send, 400, {"error": 'Expected {"nodes": ["host:port", ...]}'})
+    epoch, unreached = await asyncio.get_running_loop().run_in_executor(None, bot.cluster.change, nodes)
+    await respond(send, 200 if not unreached else 502,
+                  {"epoch": epoch, "nodes": sorted(set(nodes)), "unreached": unreached})
+
+
+async def sessions(scope, receive, send):
+    """Active sessions a page at a time, or ?format=ndjson to stream them all (see app.sessions)"""
+    query = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    try:
+        filters, cursor, limit = bot.session_query(query)
+    except ValueError as e:
+        return await respond(send, 400, {"error": str(e)})
+
+    loop = asyncio.get_running_loop()
+    if query.get('format') == 'ndjson':
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson')]})
+        # The export reads the store (locks, SQLite, the session server), so
+        # each chunk is pulled on the executor and only sent from the loop
+        lines = bot.ndjson_lines(bot.user_sessions.export(**filters))
+        while True:
+            chunk = await loop.run_in_executor(None, next_lines, lines)
+            if not chunk:
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await respond(send, 200, await loop.run_in_executor(None, session_page, filters, cursor, limit))
+
+
+def next_lines(lines, count=500):
+    """The next `count` lines of an NDJSON export joined, or '' once it is exhausted"""
+    return ''.join(islice(lines, count))
+
+
+def session_page(filters, cursor, limit):
+    """One /sessions page (blocking store reads, run on the executor)"""
+    rows, next_cursor = bot.user_sessions.page(cursor, limit, **filters)
+    return {
+        "total_sessions": len(bot.user_sessions),
+        "count": len(rows),
+        "sessions": dict(rows),
+        "next_cursor": next_cursor,
+    }
+
+
+ROUTES = {
+    ('GET', '/webhook'): verify_webhook,
+    ('POST', '/webhook'): handle_webhook,
+    ('GET', '/health'): health,
+    ('GET', '/sessions'): sessions,
+    ('GET', '/deliveries'): deliveries,
+    ('GET', '/tenants'): tenants,
+    ('POST', '/tenants/reload'): reload_tenants,
+    ('GET', '/cluster'): cluster_report,
+    ('POST', '/cluster/members'): cluster_members,
+    ('GET', '/metrics'): metrics_endpoint,
+}
+
+# ============================================
+# ASGI ENTRY POINT
+# ============================================
+
+async def lifespan(receive, send):
+    while True:
+        event = await receive()
+        if event['type'] == 'lifespan.startup':
+            bot.log_startup()
+            log.info("⚡ ASGI mode ready")
+            await send({'type': 'lifespan.startup.complete'})
+            bot.start_warm_up()
+        elif event['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        return await respond(send, 404, {"error": "Not found"})
+    await route(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=bot.config.port, log_level='warning')
@@ -0,0 +1,54 @@
+"""
+📦 BATCH INGESTION - walk a Meta webhook envelope once
+entry[] -> changes[] -> value.messages[] / value.statuses[] is flattened in a
+single pass into per-phone message lists (arrival order kept) plus the status
+updates, so each phone's batch can be handled by one engine job. Messages are
+also keyed by the business number they were sent to (metadata.phone_number_id)
+so several tenants can share one webhook.
+"""
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def group_by_number(data, seen=None, pick=None):
+    """Return ({phone_number_id: {phone: [message, ...]}}, [status, ...]) for a webhook payload.
+
+    Messages whose id is already in the `seen` cache (redeliveries) are dropped;
+    pick(message), if given, replaces each kept message (e.g. with a slimmer dict).
+    Changes without metadata are keyed None.
+    """
+    by_number = {}
+    statuses = []
+
+    for entry in data.get('entry', ()):
+        for change in entry.get('changes', ()):
+            value = change.get('value') or {}
+            by_phone = None
+
+            for message in value.get('messages', ()):
+                if seen is not None and seen.seen(message.get('id')):
+                    log.info("🔁 Duplicate delivery of %s ignored", message.get('id'))
+                    continue
+                phone = message.get('from')
+                if phone:
+                    if by_phone is None:
+                        number = (value.get('metadata') or {}).get('phone_number_id')
+                        by_phone = by_number.setdefault(number, {})
+                    by_phone.setdefault(phone, []).append(pick(message) if pick else message)
+
+            statuses.extend(value.get('statuses', ()))
+
+    return by_number, statuses
+
+
+def group_envelope(data, seen=None, pick=None):
+    """Return ({phone: [message, ...]}, [status, ...]), whatever number each was sent to"""
+    by_number, statuses = group_by_number(data, seen, pick)
+    if len(by_number) == 1:
+        return next(iter(by_number.values())), statuses
+    by_phone = {}
+    for messages_by_phone in by_number.values():
+        for phone, messages in messages_by_phone.items():
+            by_phone.setdefault(phone, []).extend(messages)
+    return by_phone, statuses
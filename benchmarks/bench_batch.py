@@ -0,0 +1,92 @@
+"""
+📊 Batch pipeline benchmark: large multi-message envelopes
+Builds envelopes from the test_webhook.py fixture (HELP, choice, address for
+many phones in one POST) and compares:
+  serial      - process each message and send inline (the original handler)
+  per-message - one engine job and one outbound job per message (a phone's
+                replies can race each other in the outbound pool)
+  batch       - group_envelope + one engine job / one outbound job per phone
+Sends are stubbed with a short sleep to stand in for the Graph API round trip.
+Usage: python benchmarks/bench_batch.py [phones_per_envelope] [envelopes] [send_ms]
+"""
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Whole envelopes are queued at once; don't let the default backpressure drop them
+os.environ.setdefault('ENGINE_QUEUE_SIZE', '100000')
+os.environ.setdefault('OUTBOUND_QUEUE_SIZE', '100000')
+# Measures batching, not pacing: switch the outbound rate limits off
+os.environ.setdefault('OUTBOUND_RATE_PER_SEC', '0')
+os.environ.setdefault('OUTBOUND_RECIPIENT_RATE_PER_SEC', '0')
+
+import app as bot  # noqa: E402
+from batch import group_envelope  # noqa: E402
+from bot_logging import configure_logging  # noqa: E402
+from test_webhook import build_test_payload  # noqa: E402
+
+
+def build_envelope(phones, tag):
+    envelope = build_test_payload()
+    value = envelope['entry'][0]['changes'][0]['value']
+    template = value['messages'][0]
+    value['messages'] = []
+    for i in range(phones):
+        for seq, body in enumerate(("HELP", str(i % 3 + 1), f"{i} Anna Salai, Chennai")):
+            message = copy.deepcopy(template)
+            message['from'] = f"91{i:010d}"
+            message['id'] = f"wamid.{tag}.{i}.{seq}"
+            message['text']['body'] = body
+            value['messages'].append(message)
+    return envelope
+
+
+def serial(envelope):
+    for phone, messages in group_envelope(envelope)[0].items():
+        for message in messages:
+            session = bot.user_sessions.get(phone)
+            session, reply = bot.apply_message(phone, session, message)
+            if session is not None:
+                bot.user_sessions.set(phone, session)
+            if reply:
+                bot.send_whatsapp_message(phone, reply[0])
+
+
+def per_message(envelope):
+    for phone, messages in group_envelope(envelope)[0].items():
+        for message in messages:
+            bot.engine.submit(phone, bot.process_messages, phone, [message])
+
+
+def batched(envelope):
+    for phone, messages in group_envelope(envelope, bot.seen_messages)[0].items():
+        bot.engine.submit(phone, bot.process_messages, phone, messages)
+
+
+def main():
+    phones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    envelopes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    send_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    configure_logging(bot.config, level='WARNING')
+    bot.send_whatsapp_message = lambda phone, text: time.sleep(send_ms / 1000)
+
+    print(f"📊 {envelopes} envelopes x {phones} phones x 3 messages, {send_ms}ms per send, "
+          f"{bot.engine.partitions} partitions, {bot.outbound.workers} outbound workers")
+    for label, run in (("serial", serial), ("per-message", per_message), ("batch", batched)):
+        bot.user_sessions.clear()
+        start = time.perf_counter()
+        for n in range(envelopes):
+            run(build_envelope(phones, f"{label}{n}"))
+        bot.engine.join()
+        bot.outbound.join()
+        elapsed = time.perf_counter() - start
+        total = envelopes * phones * 3
+        completed = sum(1 for s in bot.user_sessions.snapshot().values() if s['state'] == 'completed')
+        print(f"   {label:<12} {total / elapsed:>8.0f} msg/s  ({elapsed:.2f}s, {completed}/{phones} completed)")
+
+
+if __name__ == '__main__':
+    main()
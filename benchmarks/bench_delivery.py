@@ -0,0 +1,92 @@
+"""
+📬 Delivery tracker: status-update cost, out-of-order correctness and footprint
+Records N sends, then feeds their sent / delivered / read webhooks shuffled
+(read before delivered, receipts before our own send record), checks every
+message ends in the right state, and times updates, percentiles and the
+overdue scan.
+Usage: python benchmarks/bench_delivery.py [messages]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delivery import DeliveryTracker  # noqa: E402
+from outbound import PRIORITY_URGENT, PRIORITY_LOW  # noqa: E402
+
+
+def replay(events, early, count, trace=False):
+    """Sends (with the early receipts just before them), then every remaining receipt"""
+    tracker = DeliveryTracker(max_entries=count * 2, alert_after=60, check_interval=0)
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for i, wamid, steps in events:
+        if i in early:
+            tracker.update(steps)
+        tracker.sent({"messages": [{"id": wamid}]}, f"91{i:010d}", PRIORITY_URGENT if i % 4 == 0 else PRIORITY_LOW)
+    sends_and_early = time.perf_counter() - started
+    updates = 0
+    started = time.perf_counter()
+    for i, wamid, steps in events:
+        if i not in early:
+            for step in steps:
+                tracker.update([step])
+                updates += 1
+    elapsed = time.perf_counter() - started
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"   peak allocations:      {peak / count:6.0f} bytes/message")
+    return tracker, sends_and_early, updates, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(3)
+    base = time.time() - 600
+
+    # A tenth of the receipts race ahead of our own send record
+    early = set(rng.sample(range(count), count // 10))
+    events, expected = [], {}
+    for i in range(count):
+        wamid = f"wamid.bench.{i}"
+        fate = rng.random()
+        final = 'failed' if fate < 0.02 else 'sent' if fate < 0.07 else 'delivered' if fate < 0.4 else 'read'
+        expected[wamid] = final
+        sent_at = base + i * 0.002
+        steps = [{"id": wamid, "status": "sent", "timestamp": str(int(sent_at))}]
+        if final == 'failed':
+            steps.append({"id": wamid, "status": "failed", "timestamp": str(int(sent_at) + 1),
+                          "errors": [{"code": 131026, "title": "Message undeliverable"}]})
+        if final in ('delivered', 'read'):
+            steps.append({"id": wamid, "status": "delivered", "timestamp": str(int(sent_at + rng.expovariate(0.5)))})
+        if final == 'read':
+            steps.append({"id": wamid, "status": "read", "timestamp": str(int(sent_at + 5 + rng.expovariate(0.05)))})
+        rng.shuffle(steps)
+        events.append((i, wamid, steps))
+
+    tracker, sends_and_early, updates, elapsed = replay(events, early, count)
+    _, _, _, _ = replay(events, early, count, trace=True)
+    print(f"📬 {count:,} messages, {updates:,} status updates delivered one per call")
+    print(f"   send + early receipts: {sends_and_early / count * 1e6:6.2f} µs/message")
+    print(f"   status update:         {elapsed / updates * 1e6:6.2f} µs/update")
+
+    started = time.perf_counter()
+    latency = tracker.latency()
+    print(f"   percentiles in {(time.perf_counter() - started) * 1000:.1f}ms: "
+          f"delivered p50 {latency['delivered']['p50']:.0f}s p99 {latency['delivered']['p99']:.0f}s, "
+          f"read p50 {latency['read']['p50']:.0f}s p99 {latency['read']['p99']:.0f}s")
+    started = time.perf_counter()
+    overdue = tracker.overdue(time.time() + 120)
+    print(f"   overdue scan in {(time.perf_counter() - started) * 1000:.1f}ms: {len(overdue):,} urgent sends undelivered 2 min on")
+
+    wrong = sum(1 for wamid, final in expected.items() if tracker.get(wamid)['status'] != final)
+    print(f"   {'✅' if not wrong else '❌'} final states: {wrong} wrong of {count:,} ({tracker.stats()['outcomes']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+📊 Nearest-unit lookups: linear scan vs the dispatch grid index
+Places tens of thousands of synthetic units over the city, then times
+nearest-1 / nearest-5 queries from random incident points both ways and
+checks the grid returns the same units as the brute-force scan.
+Usage: python benchmarks/bench_dispatch.py [units] [queries] [cell_km]
+"""
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch import UnitIndex, haversine_km, synthetic_units  # noqa: E402
+
+
+def brute_force(units, lat, lon, n):
+    return heapq.nsmallest(n, ((haversine_km(lat, lon, u.lat, u.lon), u) for u in units),
+                           key=lambda pair: pair[0])
+
+
+def timed(label, lookup, points, baseline=None):
+    start = time.perf_counter()
+    results = [lookup(lat, lon) for lat, lon in points]
+    elapsed = time.perf_counter() - start
+    speedup = f"   {baseline / elapsed:6.0f}x" if baseline else ""
+    print(f"{label:<26} {len(points) / elapsed:>12,.0f} lookups/s{speedup}")
+    return elapsed, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    cell_km = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    units = synthetic_units(count)
+    start = time.perf_counter()
+    index = UnitIndex(units, cell_km=cell_km)
+    print(f"📊 {count} units indexed in {(time.perf_counter() - start) * 1000:.0f}ms "
+          f"({index.stats()['units']}), cell {cell_km}km")
+
+    rng = random.Random(7)
+    points = [(rng.uniform(12.85, 13.10), rng.uniform(77.45, 77.75)) for _ in range(queries)]
+    ambulances = [u for u in units if u.kind == 'ambulance']
+    brute_points = points[:max(1, queries // 20)]   # the scan is slow; sample it
+
+    for n in (1, 5):
+        base, expected = timed(f"linear scan, nearest {n}", lambda la, lo: brute_force(ambulances, la, lo, n),
+                               brute_points)
+        base = base / len(brute_points) * len(points)
+        _, found = timed(f"grid index, nearest {n}", lambda la, lo: index.nearest('ambulance', la, lo, n),
+                         points, baseline=base)
+        mismatches = sum(1 for want, got in zip(expected, found)
+                         if [u.unit_id for _, u in want] != [u.unit_id for _, u in got])
+        print(f"   {'✅' if not mismatches else '❌'} {len(expected) - mismatches}/{len(expected)} "
+              f"sampled queries match the linear scan")
+
+    _, assignments = timed("assign() with ETA", lambda la, lo: index.assign('medical', la, lo), points)
+    etas = [a.eta_max for a in assignments if a]
+    print(f"   median ETA upper bound {sorted(etas)[len(etas) // 2]} min")
+
+
+if __name__ == '__main__':
+    main()
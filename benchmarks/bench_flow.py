@@ -0,0 +1,96 @@
+"""
+📊 Conversation state machine: nested if/elif handler vs compiled flow table
+Replays HELP -> choice -> address conversations through both and reports
+transitions/sec (no I/O, no session store, no logging). The two handlers run
+in alternating rounds and the best round of each is reported, so a noisy
+neighbour on a shared box can't decide the comparison.
+Usage: python benchmarks/bench_flow.py [conversations] [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flow import compile_flow  # noqa: E402
+from templates import ANY, templates_for  # noqa: E402
+
+TEMPLATES = templates_for('en')
+
+
+def legacy_step(session, text):
+    """The old hand-written handler, with its per-call maps and templates"""
+    if text.lower() == 'help':
+        return {'state': 'awaiting_choice'}, TEMPLATES['menu']
+
+    if text in ['1', '2', '3']:
+        if session is None:
+            return session, "Please type HELP first"
+        emergency_map = {'1': 'medical', '2': 'fire', '3': 'police'}
+        emergency_type = emergency_map.get(text)
+        emergency_names = {
+            "medical": "Medical Emergency 🚑",
+            "fire": "Fire Emergency 🔥",
+            "police": "Police Emergency 👮"
+        }
+        reply = f"""📍 *{emergency_names.get(emergency_type, 'Emergency')} Selected*
+
+Please share your location:
+• Tap 📎 *attachment* icon
+• Select *Location*
+• Send your current location
+
+*OR* type your address manually."""
+        return dict(session, emergency_type=emergency_type, state='awaiting_location'), reply
+
+    if session is None:
+        return session, "Type 'HELP' to start emergency services"
+
+    if session['state'] == 'awaiting_location':
+        emergency_type = session.get('emergency_type', 'unknown')
+        messages = dict(TEMPLATES['confirmation'])
+        return dict(session, location=text, state='completed'), \
+            messages.get(emergency_type, messages[ANY])
+
+    return session, None
+
+
+def run(step, scripts):
+    sessions = {}
+    start = time.perf_counter()
+    for phone, script in scripts:
+        session = sessions.get(phone)
+        for text in script:
+            session, _ = step(session, text)
+        sessions[phone] = session
+    return time.perf_counter() - start, sessions
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    scripts = [
+        (f"91{i:010d}", ("hi", "HELP", "7", str(i % 3 + 1), f"{i} MG Road, Bengaluru", "thanks"))
+        for i in range(total)
+    ]
+    conversation = compile_flow()
+    print(f"📊 {total} conversations x 6 messages, {len(conversation)} compiled transitions, "
+          f"best of {rounds} rounds")
+
+    handlers = {"if/elif": legacy_step, "compiled flow": conversation.step}
+    best = {label: float('inf') for label in handlers}
+    for _ in range(rounds):
+        results = {}
+        for label, step in handlers.items():
+            elapsed, results[label] = run(step, scripts)
+            best[label] = min(best[label], elapsed)
+        assert results["if/elif"] == results["compiled flow"], "flows diverged"
+
+    transitions = total * 6
+    for label, elapsed in best.items():
+        print(f"{label:<16} {transitions / elapsed:>12,.0f} transitions/s  ({elapsed:.3f}s)")
+    print("   ✅ both handlers produced identical sessions")
+
+
+if __name__ == '__main__':
+    main()
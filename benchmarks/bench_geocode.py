@@ -0,0 +1,100 @@
+"""
+📊 Typed-address geocoding throughput and accuracy
+Builds a synthetic gazetteer, then geocodes a large corpus of addresses the way
+people type them (house numbers, "near ...", abbreviations, typos, pin codes),
+with landmarks repeating Zipf-style. Compares a linear trigram scan with the
+indexed lookup, and the indexed lookup with and without the LRU cache.
+Usage: python benchmarks/bench_geocode.py [places] [addresses]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocode import Gazetteer, Geocoder, normalize, synthetic_places, trigrams  # noqa: E402
+
+SHORTHAND = {"Road": "Rd", "Main Road": "Main Rd", "Layout": "Lyt", "Hospital": "Hosp",
+             "Metro Station": "Metro Stn", "Nagar": "Ngr"}
+
+
+def typo(rng, word):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def typed_address(rng, place):
+    name = place.name
+    for full, short in SHORTHAND.items():
+        if name.endswith(full) and rng.random() < 0.5:
+            name = name[:-len(full)] + short
+    if rng.random() < 0.3:
+        words = name.split()
+        words[0] = typo(rng, words[0])
+        name = ' '.join(words)
+    prefix = rng.choice(("", f"{rng.randint(1, 999)}, ", f"#{rng.randint(1, 99)} 2nd floor ", "near ", "opp "))
+    suffix = rng.choice(("", ", Bengaluru", ", Bangalore 5600" + str(rng.randint(10, 99)), " blr"))
+    text = prefix + name + suffix
+    return text.lower() if rng.random() < 0.3 else text
+
+
+def linear_scan(places, key, min_score=0.7):
+    """Every place scored against every word window, no index"""
+    words = key.split()
+    windows = {size: [trigrams(' '.join(words[i:i + size])) for i in range(len(words) - size + 1)]
+               for size in range(1, len(words) + 1)}
+    best, best_rank = None, (min_score, 0)
+    for place in places:
+        score = 0.0
+        for size in range(max(1, place.words - 1), min(len(words), place.words + 1) + 1):
+            for window in windows[size]:
+                score = max(score, 2 * len(window & place.grams) / (len(window) + len(place.grams)))
+        rank = (score, len(place.grams))
+        if rank >= best_rank:
+            best, best_rank = place, rank
+    return best
+
+
+def run(label, geocode, corpus, baseline=None):
+    start = time.perf_counter()
+    found = [geocode(text) for text, _ in corpus]
+    elapsed = time.perf_counter() - start
+    correct = sum(1 for match, (_, place) in zip(found, corpus) if match is place)
+    speedup = f"  {baseline / elapsed:6.1f}x" if baseline else ""
+    print(f"{label:<22} {len(corpus) / elapsed:>10,.0f} addresses/s  "
+          f"{correct / len(corpus):6.1%} correct{speedup}")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    addresses = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    places = synthetic_places(count)
+    start = time.perf_counter()
+    gazetteer = Gazetteer(places)
+    print(f"📊 {count} places indexed in {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"{addresses} typed addresses")
+
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(count)]   # a few landmarks dominate
+    corpus = [(typed_address(rng, place), place) for place in rng.choices(places, weights, k=addresses)]
+
+    sample = corpus[:max(1, addresses // 1000)]
+    base = run("linear trigram scan", lambda text: linear_scan(places, normalize(text)), sample)
+    base = base / len(sample) * len(corpus)
+
+    cold = Geocoder(gazetteer, cache_size=0)
+    run("indexed, no cache", lambda text: getattr(cold.geocode(text), 'place', None), corpus, base)
+    warm = Geocoder(gazetteer, cache_size=10000)
+    run("indexed + LRU cache", lambda text: getattr(warm.geocode(text), 'place', None), corpus, base)
+    stats = warm.stats()
+    print(f"   cache hit rate {stats['hits'] / (stats['hits'] + stats['misses']):.0%}, "
+          f"exact {stats['exact']}, fuzzy {stats['fuzzy']}, unmatched {stats['unmatched']}")
+
+
+if __name__ == '__main__':
+    main()
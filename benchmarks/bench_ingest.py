@@ -0,0 +1,68 @@
+"""
+📊 Webhook ingest cost per payload size: HMAC verify, JSON decode, envelope walk
+Compares the old path (text decode + stdlib json, full message dicts) with
+the ingest stage (HMAC-SHA256 over the raw bytes + orjson + slimmed
+messages) for envelopes of 1 to 500 messages.
+Usage: python benchmarks/bench_ingest.py [iterations]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+from batch import group_envelope  # noqa: E402
+from ingest import WebhookIngest, sign, slim_message, verify_signature  # noqa: E402
+
+SECRET = b'bench-app-secret'
+
+
+def envelope(messages):
+    """One change carrying `messages` text messages from distinct phones, with contacts like Meta sends"""
+    value = {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "15551799388", "phone_number_id": "950947014765895"},
+        "contacts": [{"profile": {"name": f"Caller {i}"}, "wa_id": f"91{i:010d}"} for i in range(messages)],
+        "messages": [{"from": f"91{i:010d}", "id": f"wamid.HBgLOTE5ODc2NTQzMjEwFQIAEhgU{i:012d}",
+                      "timestamp": "1700000000", "type": "text",
+                      "text": {"body": "HELP there is a fire near the MG Road metro station, please hurry"}}
+                     for i in range(messages)],
+    }
+    return {"object": "whatsapp_business_account",
+            "entry": [{"id": "123456789", "changes": [{"value": value, "field": "messages"}]}]}
+
+
+def per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    decoder = WebhookIngest(SECRET)
+    print(f"📊 parser: {decoder.stats()['parser']}, {iterations} iterations per size (µs per payload)")
+    print(f"{'messages':>8} {'bytes':>9} {'hmac':>8} {'json':>9} {'orjson':>9} {'old path':>10} {'ingest':>9} {'MB/s':>7}")
+    for messages in (1, 10, 100, 500):
+        body = json.dumps(envelope(messages)).encode()
+        signature = sign(body, SECRET)
+        count = max(20, iterations // messages)
+
+        hmac_us = per_call(lambda: verify_signature(body, signature, SECRET), count)
+        json_us = per_call(lambda: json.loads(body.decode()), count)
+        orjson_us = per_call(lambda: ingest.loads(body), count) if ingest.orjson is not None else float('nan')
+        old_us = per_call(lambda: group_envelope(json.loads(body.decode())), count)
+        new_us = per_call(lambda: group_envelope(decoder.decode(body, signature), None, slim_message), count)
+        print(f"{messages:>8} {len(body):>9,} {hmac_us:>8.1f} {json_us:>9.1f} {orjson_us:>9.1f} "
+              f"{old_us:>10.1f} {new_us:>9.1f} {len(body) / new_us:>7.0f}")
+
+    by_phone, _ = group_envelope(decoder.decode(body, signature), None, slim_message)
+    ok = len(by_phone) == 500 and all(m[0]['text']['body'].startswith("HELP") for m in by_phone.values())
+    print(f"   {'✅' if ok else '❌'} signed 500-message envelope verified and decoded")
+
+
+if __name__ == '__main__':
+    main()
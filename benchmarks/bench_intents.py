@@ -0,0 +1,82 @@
+"""
+📊 Menu-step intent classification cost per message
+Classifies a mix of real-world first messages (digits with punctuation, "Help!",
+English / Hindi / Hinglish emergency words, emoji, chit-chat) with the
+Aho-Corasick matcher and with a naive scan that tests every keyword spelling
+in turn, and reports microseconds per message for each.
+Usage: python benchmarks/bench_intents.py [messages]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import (INTENT_KEYWORDS, PRECEDENCE, compile_intents, deletions,  # noqa: E402
+                     normalize, squeeze)
+
+MESSAGES = (
+    "HELP", "Help!", "help me", "helppp 🙏", "1", "1.", "#2", "3)", "१", "२",
+    "ambulance", "Ambulnce pls", "need a doctor fast", "heart attack", "accident near my house",
+    "aag lagi hai", "AAAG!!", "🔥🔥", "gas leak in kitchen", "fire fire",
+    "police", "chor ghar mein", "पुलिस बुलाओ", "मदद करो", "आग", "🚑", "🚓 robbery",
+    "hi", "hello", "good morning", "thanks", "ok", "?", "is this 108", "what is this number",
+)
+
+
+def naive_matcher():
+    """Every keyword spelling as a padded substring test, checked one by one"""
+    spellings = []
+    for intent, phrases in INTENT_KEYWORDS.items():
+        for phrase in phrases:
+            key = squeeze(normalize(phrase))
+            spellings.append((f" {key} ", intent))
+            spellings.extend((f" {variant} ", intent) for variant in deletions(key))
+
+    def match(text):
+        key = normalize(text)
+        padded = f" {squeeze(key)} "
+        best = None
+        for spelling, intent in spellings:
+            start = padded.find(spelling)
+            if start >= 0:
+                rank = (PRECEDENCE.get(intent, 0), start)
+                if best is None or rank < best[0]:
+                    best = (rank, intent)
+        return key, best[1] if best else None
+
+    return match, len(spellings)
+
+
+def timed(label, match, corpus, baseline=None):
+    start = time.perf_counter()
+    results = [match(text) for text in corpus]
+    elapsed = time.perf_counter() - start
+    speedup = f"   {baseline / elapsed:5.1f}x" if baseline else ""
+    print(f"{label:<24} {elapsed / len(corpus) * 1e6:8.2f} µs/message{speedup}")
+    return elapsed, results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(108)
+    corpus = [rng.choice(MESSAGES) for _ in range(count)]
+
+    start = time.perf_counter()
+    matcher = compile_intents()
+    print(f"📊 {len(matcher)} keyword spellings compiled in {(time.perf_counter() - start) * 1000:.1f}ms, "
+          f"{count} messages")
+
+    naive, spellings = naive_matcher()
+    base, expected = timed(f"naive scan ({spellings})", naive, corpus)
+    _, found = timed("aho-corasick", matcher.match, corpus, baseline=base)
+    mismatches = sum(1 for want, got in zip(expected, found) if want != got)
+    print(f"   {'✅' if not mismatches else '❌'} {count - mismatches}/{count} classifications agree")
+
+    recognized = sum(1 for text in MESSAGES if matcher.match(text)[1] or matcher.match(text)[0].isdigit())
+    print(f"   {recognized}/{len(MESSAGES)} sample messages map to help / a menu choice / an emergency")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+📊 Logging overhead microbenchmark: per-request webhook cost at INFO vs DEBUG
+Log output goes to /dev/null so only formatting/queueing cost is measured.
+Usage: python benchmarks/bench_logging.py [requests]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Every request comes from the same phone: keep its replies from queueing behind
+# the per-recipient rate limit (or overflowing the queues) so the drain is quick
+os.environ.setdefault('ENGINE_QUEUE_SIZE', '100000')
+os.environ.setdefault('OUTBOUND_QUEUE_SIZE', '100000')
+os.environ.setdefault('OUTBOUND_RATE_PER_SEC', '0')
+os.environ.setdefault('OUTBOUND_RECIPIENT_RATE_PER_SEC', '0')
+
+import app as bot  # noqa: E402
+from bot_logging import configure_logging  # noqa: E402
+from test_webhook import build_test_payload  # noqa: E402
+
+DRAIN_TIMEOUT = 60.0
+
+
+def run(level, fmt, count, client, devnull):
+    configure_logging(bot.config, level=level, fmt=fmt, stream=devnull)
+    payload = build_test_payload()
+    message = payload['entry'][0]['changes'][0]['value']['messages'][0]
+    start = time.perf_counter()
+    for i in range(count):
+        message['id'] = f"wamid.bench.{level}.{fmt}.{i}"
+        client.post('/webhook', json=payload)
+    elapsed = time.perf_counter() - start
+    if not (bot.engine.join(DRAIN_TIMEOUT) and bot.outbound.join(DRAIN_TIMEOUT)):
+        sys.exit(f"❌ {level} {fmt}: replies still queued after {DRAIN_TIMEOUT:.0f}s")
+    return elapsed / count * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bot.send_whatsapp_message = lambda phone, text: None
+    client = bot.app.test_client()
+    with open(os.devnull, 'w') as devnull:
+        run('INFO', 'text', 200, client, devnull)  # warm-up
+        results = [(level, fmt, run(level, fmt, count, client, devnull))
+                   for level in ('INFO', 'DEBUG') for fmt in ('text', 'json')]
+    configure_logging(bot.config, level='INFO')
+    print(f"📊 {count} webhook requests per run")
+    for level, fmt, micros in results:
+        print(f"   {level:<6} {fmt:<5} {micros:8.1f} µs/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+📊 Instrumentation overhead: per-thread sharded metrics vs one shared lock
+Several threads record into a counter and a histogram at once, the way engine
+and outbound workers do; reports nanoseconds per update and the cost of a
+/metrics scrape.
+Usage: python benchmarks/bench_metrics.py [updates_per_thread] [threads]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Registry  # noqa: E402
+
+
+class LockedCounter:
+    """The obvious alternative: one dict behind one lock"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+
+def hammer(label, record, updates, threads, baseline=None):
+    def work():
+        for i in range(updates):
+            record(i)
+
+    pool = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    per_update = elapsed / (updates * threads) * 1e9
+    overhead = f"   +{per_update - baseline:6.0f} ns" if baseline is not None else ""
+    print(f"{label:<26} {per_update:8.0f} ns/update{overhead}")
+    return per_update
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    registry = Registry()
+    counter = registry.counter('bench_total', "bench", ('state',))
+    histogram = registry.histogram('bench_seconds', "bench", ('state',))
+    locked = LockedCounter()
+    states = ('idle', 'awaiting_choice', 'awaiting_location', 'completed')
+
+    print(f"📊 {threads} threads x {updates} updates")
+    base = hammer("loop only", lambda i: states[i & 3], updates, threads)
+    hammer("locked counter", lambda i: locked.inc(states[i & 3]), updates, threads, base)
+    hammer("sharded counter", lambda i: counter.inc(states[i & 3]), updates, threads, base)
+    hammer("sharded histogram", lambda i: histogram.observe(i * 1e-7, states[i & 3]), updates, threads, base)
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"   scrape: {len(text.splitlines())} lines in {(time.perf_counter() - start) * 1000:.2f}ms")
+    expected = updates * threads
+    total = sum(value for _, _, value in counter.samples())
+    print(f"   {'✅' if total == expected else '❌'} counter total {total} of {expected}")
+
+
+if __name__ == '__main__':
+    main()
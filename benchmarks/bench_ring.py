@@ -0,0 +1,54 @@
+"""
+🕸️ Consistent-hash ring: balance, lookup cost and how many callers move
+For 2 to 16 nodes, places N phone numbers on the ring and reports the spread of
+phones per node, the owner lookup time, and the share of phones that change
+owner when one node joins or leaves (ideal: 1/N), against hash-mod-N
+placement, which moves almost all of them.
+Usage: python benchmarks/bench_ring.py [phones] [vnodes]
+"""
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cluster import HashRing  # noqa: E402
+
+
+def owners(ring, phones):
+    return [ring.owner(phone) for phone in phones]
+
+
+def moved(before, after):
+    return sum(1 for a, b in zip(before, after) if a != b) / len(before)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    vnodes = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+    phones = [f"91{9000000000 + i * 7919 % 1000000000:010d}" for i in range(count)]
+    print(f"🕸️ {count:,} phones, {vnodes} virtual points per node")
+    print(f"{'nodes':>6} {'min/max per node':>18} {'lookup µs':>10} {'join moves (ideal)':>19} "
+          f"{'leave moves (ideal)':>20} {'mod-N join':>11}")
+    for n in (2, 3, 4, 8, 16):
+        nodes = [f"127.0.0.1:{51000 + i}" for i in range(n)]
+        ring = HashRing(nodes, vnodes)
+
+        started = time.perf_counter()
+        placed = owners(ring, phones)
+        lookup_us = (time.perf_counter() - started) / count * 1e6
+        per_node = [placed.count(node) for node in nodes]
+
+        joined = owners(HashRing(nodes + [f"127.0.0.1:{51000 + n}"], vnodes), phones)
+        left = owners(HashRing(nodes[1:], vnodes), phones)
+        mod_before = [zlib.crc32(phone.encode()) % n for phone in phones]
+        mod_after = [zlib.crc32(phone.encode()) % (n + 1) for phone in phones]
+
+        print(f"{n:>6} {min(per_node) / (count / n):>8.2f} / {max(per_node) / (count / n):<7.2f} {lookup_us:>10.2f} "
+              f"{moved(placed, joined):>10.1%} ({1 / (n + 1):>5.1%}) {moved(placed, left):>11.1%} ({1 / n:>5.1%}) "
+              f"{moved(mod_before, mod_after):>11.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+📊 /sessions cost: whole-store JSON dump vs filtered pages vs NDJSON streaming
+Fills a store with mostly finished conversations and a few live incidents,
+then times (and measures peak Python allocations of) the old snapshot()
+response, one filtered page, walking every page with the cursor, and the
+streaming export.
+Usage: python benchmarks/bench_session_pages.py [sessions] [memory|sqlite]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import MemorySessionStore, SQLiteSessionStore  # noqa: E402
+
+
+def fill(store, count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        roll = rng.random()
+        state = 'completed' if roll < 0.9 else 'awaiting_location' if roll < 0.97 else 'awaiting_choice'
+        session = {'state': state}
+        if state != 'awaiting_choice':
+            session['emergency_type'] = rng.choice(('medical', 'fire', 'police'))
+        if state == 'completed':
+            session['location'] = f"{rng.randrange(1, 400)} MG Road"
+        store.set(f"91{i:010d}", session)
+    if hasattr(store, 'flush'):
+        store.flush()
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<36} {elapsed * 1000:9.1f}ms   peak {peak / 1e6:7.2f} MB   {size:>10,} bytes out")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    backend = sys.argv[2] if len(sys.argv) > 2 else 'memory'
+    if backend == 'sqlite':
+        store = SQLiteSessionStore(os.path.join(tempfile.mkdtemp(), 'pages.db'), batch_interval=0.05)
+    else:
+        store = MemorySessionStore(max_entries=count * 2, sweep_interval=0)
+    fill(store, count)
+    live = store.count_by_state()
+    print(f"📊 {count:,} sessions ({backend}): {live}")
+
+    def dump():
+        return len(json.dumps({"total_sessions": len(store), "sessions": store.snapshot()}))
+
+    def one_page():
+        rows, _ = store.page(None, 100, state='awaiting_location', emergency_type='fire')
+        return len(json.dumps(dict(rows)))
+
+    def every_page():
+        size, cursor = 0, None
+        while True:
+            rows, cursor = store.page(cursor, 1000, state='awaiting_location')
+            size += len(json.dumps(dict(rows)))
+            if cursor is None:
+                return size
+
+    def export():
+        return sum(len(json.dumps({"phone": phone, **session})) + 1 for phone, session in store.export())
+
+    measure("snapshot() dump (old /sessions)", dump)
+    measure("page: awaiting_location+fire, 100", one_page)
+    measure("all awaiting_location pages of 1000", every_page)
+    measure("NDJSON export of everything", export)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
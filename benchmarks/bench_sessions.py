@@ -0,0 +1,73 @@
+"""
+📊 Session backend benchmark: read/write latency per backend
+Runs the HELP -> choice -> address write pattern plus reads against the
+memory, sqlite (batched and write-through) and local-socket server backends.
+Usage: python benchmarks/bench_sessions.py [sessions]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_store  # noqa: E402
+from session_store import (MemorySessionStore, RemoteSessionStore,  # noqa: E402
+                           SQLiteSessionStore, serve_sessions)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def measure(label, store, count):
+    writes, reads = [], []
+    clock = time.perf_counter
+    for i in range(count):
+        phone = f"91{i:010d}"
+        t = clock()
+        store.set(phone, {'state': 'awaiting_choice'})
+        writes.append(clock() - t)
+        t = clock()
+        store.update(phone, emergency_type='medical', state='awaiting_location')
+        writes.append(clock() - t)
+        t = clock()
+        store.get(phone)
+        reads.append(clock() - t)
+    if hasattr(store, 'flush'):
+        store.flush()
+
+    def fmt(samples):
+        return (f"p50 {percentile(samples, 50) * 1e6:7.1f}µs  "
+                f"p99 {percentile(samples, 99) * 1e6:8.1f}µs")
+
+    print(f"{label:<26} write {fmt(writes)}   read {fmt(reads)}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp = tempfile.mkdtemp()
+    print(f"📊 {count} sessions per backend")
+
+    measure("memory", MemorySessionStore(sweep_interval=0), count)
+
+    batched = SQLiteSessionStore(os.path.join(tmp, 'batched.db'), batch_interval=0.05)
+    measure("sqlite (batched 50ms)", batched, count)
+    batched.close()
+
+    through = SQLiteSessionStore(os.path.join(tmp, 'through.db'), batch_interval=0)
+    measure("sqlite (write-through)", through, count)
+
+    address = '127.0.0.1:50056'
+    threading.Thread(
+        target=serve_sessions, args=(address, b'bench', MemorySessionStore(sweep_interval=0)),
+        daemon=True,
+    ).start()
+    time.sleep(0.3)
+    measure("server (local socket)", RemoteSessionStore(address, b'bench'), count)
+
+
+if __name__ == '__main__':
+    main()
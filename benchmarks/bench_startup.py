@@ -0,0 +1,179 @@
+"""
+⏱️ Cold start: import time and process start -> first 200 on /health
+Each sample is a fresh interpreter, the way an autoscaler or a restarted
+container sees the bot. For Flask and ASGI mode it measures how long
+`import app` takes and how long from spawning the server until /health first
+answers 200, then lists which heavy modules the import pulled in (flask,
+requests, multiprocessing and sqlite3 should all load lazily).
+
+--history appends each run (with the git commit) to a JSON-lines file and
+prints the trend; --out / --baseline save and compare a run like
+loadtest_webhook.py, exiting non-zero when startup regresses:
+    python benchmarks/bench_startup.py --history startup_history.jsonl
+    python benchmarks/bench_startup.py --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest_modes import MODES, ROOT, free_port  # noqa: E402
+
+HEAVY_MODULES = ('flask', 'requests', 'multiprocessing.managers', 'sqlite3')
+
+IMPORT_PROBE = (
+    "import sys, time, json; started = time.perf_counter(); import app; "
+    "print(json.dumps({'ms': (time.perf_counter() - started) * 1000, "
+    f"'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"
+)
+
+
+def bot_env(port=None):
+    env = dict(os.environ, LOG_LEVEL='WARNING', WHATSAPP_TOKEN='bench-token',
+               WHATSAPP_PHONE_NUMBER_ID='950947014765895')
+    if port is not None:
+        env['PORT'] = str(port)
+    return env
+
+
+def interpreter_ms():
+    """Bare `python -c pass`: the floor every cold start pays"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def import_sample():
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=bot_env(), check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def first_200_ms(command, timeout=30.0):
+    """Spawn the server and poll /health until it answers 200"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    server = subprocess.Popen([part.format(port=port) for part in command], cwd=ROOT, env=bot_env(port),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.002)
+        raise RuntimeError(f"{url} did not answer within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(samples):
+    return {"median": round(statistics.median(samples), 1), "min": round(min(samples), 1),
+            "max": round(max(samples), 1)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(runs):
+    imports = [import_sample() for _ in range(runs)]
+    results = {
+        "interpreter_ms": summarize([interpreter_ms() for _ in range(runs)]),
+        "import_ms": summarize([sample["ms"] for sample in imports]),
+        "heavy_modules_at_import": imports[-1]["loaded"],
+    }
+    for label, command in MODES.items():
+        mode = label.split()[0]
+        results[f"{mode}_first_200_ms"] = summarize([first_200_ms(command) for _ in range(runs)])
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(), "runs": runs,
+            "results": results}
+
+
+def timed_metrics(results):
+    return [key for key in results if key.endswith("_ms") and key != "interpreter_ms"]
+
+
+def compare(report, baseline, tolerance):
+    """Print current vs baseline medians; return the list of regressed metrics"""
+    regressions = []
+    current, before = report["results"], baseline["results"]
+    print(f"   {'metric':<22} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric in timed_metrics(current):
+        old, new = before.get(metric, {}).get("median"), current[metric]["median"]
+        if not old:
+            continue
+        change = (new - old) / old
+        flag = "  ❌" if change > tolerance else ""
+        print(f"   {metric:<22} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(metric)
+    return regressions
+
+
+def show_history(path, last=10):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()][-last:]
+    metrics = timed_metrics(entries[-1]["results"])
+    print(f"   {'when':<20} {'commit':<9}" + "".join(f" {metric:>20}" for metric in metrics))
+    for entry in entries:
+        row = "".join(f" {entry['results'].get(metric, {}).get('median', float('nan')):>20.1f}"
+                      for metric in metrics)
+        print(f"   {entry['time']:<20} {entry['commit'] or '-':<9}{row}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument('--history', help="JSON-lines file to append this run to (and print the trend from)")
+    parser.add_argument('--out', help="write the JSON report here")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    results = report["results"]
+    print(f"⏱️ Cold start, median of {args.runs} fresh processes (min-max), {os.cpu_count()} CPUs")
+    print(f"   python -c pass         {results['interpreter_ms']['median']:>8.1f} ms")
+    for metric in timed_metrics(results):
+        s = results[metric]
+        print(f"   {metric:<22} {s['median']:>8.1f} ms  ({s['min']:.1f}-{s['max']:.1f})")
+    print(f"   heavy modules loaded by `import app`: {', '.join(results['heavy_modules_at_import']) or 'none'}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"   💾 report written to {args.out}")
+
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"   📈 appended to {args.history}:")
+        show_history(args.history)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+📊 Send-body cost: build + json.dumps per send vs pre-encoded template payloads
+Part 1 times body construction alone; part 2 sends through the pooled client to
+the local stub both ways (json= vs a spliced cached body).
+Usage: python benchmarks/bench_templates.py [messages] [threads]
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import MetaClient, meta_text_payload  # noqa: E402
+from mock_server import start_mock  # noqa: E402
+from templates import templates_for, template_texts  # noqa: E402
+
+
+def timed(label, func, total, threads=1, baseline=None):
+    start = time.perf_counter()
+    if threads == 1:
+        for i in range(total):
+            func(i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(func, range(total)))
+    elapsed = time.perf_counter() - start
+    per_send = elapsed / total * 1e6
+    saved = f"   saves {baseline - per_send:6.2f} µs/send" if baseline else ""
+    print(f"{label:<34} {per_send:8.2f} µs/send{saved}")
+    return per_send
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    texts = []
+    for language in ('en', 'hi'):
+        texts.extend(template_texts(templates_for(language)))
+    phones = [f"91{i:010d}" for i in range(1000)]
+
+    client = MetaClient("bench-token", "950947014765895")
+    client.payloads.prewarm(texts)
+
+    def body_rebuilt(i):
+        # What requests' json= does per send: build the dict, dumps, encode
+        return json.dumps(meta_text_payload(phones[i % 1000], texts[i % len(texts)])).encode('utf-8')
+
+    def body_cached(i):
+        return client.payloads.body(phones[i % 1000], texts[i % len(texts)])
+
+    rounds = total * 20
+    print(f"📊 {len(texts)} template texts (en + hi), {rounds} bodies")
+    base = timed("build + json.dumps", body_rebuilt, rounds)
+    timed("pre-encoded, recipient spliced", body_cached, rounds, baseline=base)
+
+    server, base_url = start_mock()
+    client = MetaClient("bench-token", "950947014765895", base_url=base_url, pool_size=threads)
+    client.payloads.prewarm(texts)
+
+    def send_rebuilt(i):
+        return client.post(client.messages_url, meta_text_payload(phones[i % 1000], texts[i % len(texts)]))
+
+    def send_cached(i):
+        return client.send_text(phones[i % 1000], texts[i % len(texts)])
+
+    print(f"📊 {total} sends to the local stub, {threads} threads")
+    send_cached(0)
+    base = timed("post(json=payload)", send_rebuilt, total, threads)
+    timed("send_text (cached body)", send_cached, total, threads, baseline=base)
+    print(f"   cache: {client.payloads.stats()}")
+
+
+if __name__ == '__main__':
+    main()
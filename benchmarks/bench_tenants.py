@@ -0,0 +1,105 @@
+"""
+🏢 Multi-tenant routing cost as the number of tenants grows
+Loads 1 to 500 tenants from a generated TENANTS_FILE, then times the webhook
+hot path that multi-tenancy adds (group_by_number + TenantRegistry.route) on
+envelopes that mix messages for many tenants, against the single-tenant
+group_envelope walk. Also times a full reload and a one-tenant edit.
+Usage: python benchmarks/bench_tenants.py [iterations]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import group_by_number, group_envelope  # noqa: E402
+from config import parse_settings  # noqa: E402
+from flow import compile_flow  # noqa: E402
+from tenants import TenantRegistry, build_tenant  # noqa: E402
+
+
+def tenant_configs(count):
+    return [{"phone_number_id": str(100000 + i), "name": f"region-{i}", "token": f"token-{i}",
+             "language": "hi" if i % 3 == 0 else "en", "outbound": {"workers": 2, "rate": 20}}
+            for i in range(count)]
+
+
+def envelope(numbers, messages, rng):
+    """One entry per business number (as Meta batches them), messages spread over the numbers"""
+    changes = {}
+    for i in range(messages):
+        number = rng.choice(numbers)
+        changes.setdefault(number, []).append({"from": f"91{i:010d}", "id": f"wamid.{i}", "type": "text",
+                                               "text": {"body": "HELP"}})
+    return {"object": "whatsapp_business_account",
+            "entry": [{"id": number, "changes": [{"field": "messages", "value": {
+                "metadata": {"phone_number_id": number}, "messages": batch}}]}
+                for number, batch in changes.items()]}
+
+
+BOT_CONFIG = parse_settings(os.environ)
+
+
+def build(config, previous, default):
+    return build_tenant(config, BOT_CONFIG, previous, default, lambda templates: compile_flow(templates=templates))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(5)
+    print(f"🏢 {iterations} webhooks of 20 messages per size (µs per message)")
+    print(f"{'tenants':>8} {'load ms':>9} {'route':>8} {'group+route':>12} {'single-tenant':>14} {'edit one ms':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tenants.json')
+        for count in (1, 10, 100, 500):
+            configs = tenant_configs(count)
+            with open(path, 'w') as f:
+                json.dump({"tenants": configs}, f)
+            started = time.perf_counter()
+            registry = TenantRegistry(path=path, build=build, reload_interval=0)
+            load_ms = (time.perf_counter() - started) * 1000
+
+            numbers = [config['phone_number_id'] for config in configs]
+            lookups = [rng.choice(numbers) for _ in range(iterations * 20)]
+            started = time.perf_counter()
+            for number in lookups:
+                registry.route(number)
+            route_us = (time.perf_counter() - started) / len(lookups) * 1e6
+
+            envelopes = [envelope(numbers, 20, rng) for _ in range(iterations)]
+            started = time.perf_counter()
+            routed = 0
+            for data in envelopes:
+                by_number, _ = group_by_number(data)
+                for number, by_phone in by_number.items():
+                    tenant = registry.route(number)
+                    for phone in by_phone:
+                        tenant.session_key(phone)
+                        routed += 1
+            multi_us = (time.perf_counter() - started) / routed * 1e6
+
+            started = time.perf_counter()
+            for data in envelopes:
+                group_envelope(data)
+            single_us = (time.perf_counter() - started) / routed * 1e6
+
+            # A one-tenant edit rebuilds that tenant only; everyone else is kept as is
+            configs[0]['templates'] = {"start_hint": "Reply HELP for an ambulance"}
+            with open(path, 'w') as f:
+                json.dump({"tenants": configs}, f)
+            kept = {number: registry.get(number) for number in numbers}
+            started = time.perf_counter()
+            registry.reload()
+            edit_ms = (time.perf_counter() - started) * 1000
+            rebuilt = sum(1 for number in numbers if registry.get(number) is not kept[number])
+
+            print(f"{count:>8} {load_ms:>9.1f} {route_us:>8.3f} {multi_us:>12.3f} {single_us:>14.3f} "
+                  f"{edit_ms:>12.2f}   ({rebuilt} rebuilt, {registry.stats()['unrouted_messages']} unrouted)")
+            registry.close()
+
+
+if __name__ == '__main__':
+    main()
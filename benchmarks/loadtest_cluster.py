@@ -0,0 +1,53 @@
+"""
+🕸️ Cluster throughput as nodes are added
+Runs the end-to-end webhook load test (loadtest_webhook.py) against 1, 2, 3,
+... local cluster nodes behind a round-robin "load balancer", so most
+webhooks land on a node that does not own the caller and are forwarded, then
+once more with a node joining mid-run. Every run must finish with no errors
+and no missing replies. Throughput only scales with the cores available:
+each node is a separate process.
+Usage: python benchmarks/loadtest_cluster.py [max_nodes] [phones]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest_webhook import run  # noqa: E402
+
+
+def options(nodes, phones, join_after=None):
+    return argparse.Namespace(
+        mode='flask', nodes=nodes, join_after=join_after, phones=phones, concurrency=64,
+        provider_latency_ms=50, stray=0.2, invalid=0.1, location=0.4, statuses=0.7,
+        reply_timeout=15.0, pin_timeout=2.0, seed=108)
+
+
+def main():
+    max_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    phones = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    print(f"🕸️ {phones} phones, 64 concurrent, round-robin over the nodes ({os.cpu_count()} CPUs)")
+    print(f"{'nodes':>6} {'webhooks/s':>11} {'scaling':>8} {'ack p50':>8} {'ack p99':>8} {'reply p50':>10} "
+          f"{'reply p99':>10} {'forwarded':>10} {'errors':>7} {'missing':>8}")
+    base = None
+    runs = [(nodes, None) for nodes in range(1, max_nodes + 1)] + [(max(1, max_nodes - 1), 2.0)]
+    for nodes, join_after in runs:
+        report = run(options(nodes, phones, join_after))
+        results = report["results"]
+        rate = results["webhooks_per_sec"]
+        base = base or rate
+        forwarded = sum(node["forwarded_phones"] for node in report["cluster"])
+        label = f"{nodes}+1" if join_after is not None else str(nodes)
+        print(f"{label:>6} {rate:>11.1f} {rate / base:>7.2f}x {results['ack_ms']['p50']:>8.1f} "
+              f"{results['ack_ms']['p99']:>8.1f} {results['reply_ms']['p50']:>10.1f} "
+              f"{results['reply_ms']['p99']:>10.1f} {forwarded:>10} {results['errors']:>7} "
+              f"{results['missing_replies']:>8}")
+        if join_after is not None:
+            moved = sum(node["handed_off"] for node in report["cluster"])
+            print(f"       joined after {join_after:.0f}s: {moved} sessions handed off, "
+                  f"{sum(node['claimed'] for node in report['cluster'])} claimed on a miss")
+
+
+if __name__ == '__main__':
+    main()
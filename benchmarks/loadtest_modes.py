@@ -0,0 +1,120 @@
+"""
+📊 Threaded Flask vs ASGI load test
+Starts mock_server.py as the Graph API with fixed latency (its own process), then runs
+each server mode in a subprocess and fires concurrent HELP webhooks at it. Reports webhook ack
+latency and how long until every reply reached the stub. Both modes send
+replies through the same threaded outbound scheduler, so the comparison is of
+how the webhook is served, not of the sender.
+Usage: python benchmarks/loadtest_modes.py [webhooks] [client_threads] [graph_latency_ms]
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from test_webhook import build_test_payload  # noqa: E402
+
+MODES = {
+    "flask (threaded)": [sys.executable, "-c",
+                         "import os, app; app.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"],
+    "asgi (uvicorn)": [sys.executable, "-m", "uvicorn", "asgi_app:app", "--host", "127.0.0.1",
+                       "--port", "{port}", "--log-level", "warning"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def wait_for(url):
+    for _ in range(100):
+        try:
+            return requests.get(url, timeout=1).json()
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def run_mode(label, command, base_url, total, threads):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), GRAPH_BASE_URL=base_url, LOG_LEVEL='WARNING',
+               WHATSAPP_TOKEN='bench-token', WHATSAPP_PHONE_NUMBER_ID='950947014765895',
+               # Compare serving modes, not pacing: no send rate limit, no dropped replies
+               OUTBOUND_RATE_PER_SEC='0', OUTBOUND_QUEUE_SIZE='100000')
+    server = subprocess.Popen([part.format(port=port) for part in command], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(f"{url}/health")
+
+        local = threading.local()
+        latencies = []
+
+        def fire(i):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            payload = build_test_payload()
+            message = payload['entry'][0]['changes'][0]['value']['messages'][0]
+            message['from'] = f"91{i:010d}"
+            message['id'] = f"wamid.modes.{i}"
+            start = time.perf_counter()
+            local.session.post(f"{url}/webhook", json=payload, timeout=30)
+            latencies.append(time.perf_counter() - start)
+
+        start_hits = wait_for(f"{base_url}/_stats")['hits']
+        hits = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(fire, range(total)))
+        acked = time.perf_counter() - start
+        while hits < total and time.perf_counter() - start < 120:
+            time.sleep(0.02)
+            hits = requests.get(f"{base_url}/_stats").json()['hits'] - start_hits
+        delivered = time.perf_counter() - start
+
+        print(f"   {label:<18} ack p50 {percentile(latencies, 50) * 1000:6.1f}ms  "
+              f"p99 {percentile(latencies, 99) * 1000:6.1f}ms  "
+              f"acks {total / acked:7.0f}/s  all replies sent in {delivered:5.2f}s "
+              f"({hits}/{total})")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'mock_server.py'), 'serve',
+                             '--port', str(stub_port), '--latency-ms', str(latency_ms)],
+                            stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{stub_port}"
+    try:
+        wait_for(f"{base_url}/_stats")
+        print(f"📊 {total} webhooks, {threads} client threads, Graph stub latency {latency_ms}ms")
+        for label, command in MODES.items():
+            run_mode(label, command, base_url, total, threads)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+"""
+📊 End-to-end /webhook load test with comparable latency reports
+Runs the bot (Flask or ASGI) in a subprocess against mock_server.py and plays
+N simulated phones through a realistic mix: stray greetings, HELP, menu
+choices (some invalid), typed addresses or shared location pins, and delivery
+status updates. Each phone waits for the bot's reply before its next message,
+so besides webhook ack latency the run measures end-to-end reply latency
+(webhook POST -> reply reaching the provider).
+
+With --nodes N the bot runs as an N-node cluster and webhooks are spread
+round-robin over the nodes, like a load balancer that knows nothing about
+conversation ownership; --join-after S starts one more node S seconds in.
+
+Reports p50/p95/p99, can save them as JSON and compare against a saved
+baseline, exiting non-zero when a metric regresses beyond the tolerance:
+    python benchmarks/loadtest_webhook.py --phones 500 --out baseline.json
+    python benchmarks/loadtest_webhook.py --phones 500 --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest_modes import MODES, free_port, wait_for  # noqa: E402
+from mock_server import (start_mock, post_webhook, meta_envelope, meta_location_envelope,  # noqa: E402
+                         meta_status_envelope)
+
+# Every webhook is signed, so signature verification is part of what is measured
+APP_SECRET = 'loadtest-app-secret'
+CLUSTER_AUTHKEY = 'loadtest-cluster-key'
+
+# Bengaluru-ish bounding box for address / pin generation
+CITY_LAT = (12.85, 13.10)
+CITY_LON = (77.45, 77.75)
+STREETS = ("MG Road", "Brigade Road", "Residency Road", "Indiranagar 100 Feet Road",
+           "Koramangala 80 Feet Road", "Jayanagar 4th Block", "Whitefield Main Road")
+
+# Metrics where a bigger number is a regression (the rest: smaller is worse)
+HIGHER_IS_WORSE = ("ack_ms", "reply_ms")
+
+
+class ReplyTracker:
+    """Arrival times of replies per recipient, fed by the mock provider"""
+
+    def __init__(self):
+        self._arrivals = {}
+        self._cond = threading.Condition()
+
+    def __call__(self, provider, recipient, payload):
+        with self._cond:
+            self._arrivals.setdefault(recipient, []).append(time.perf_counter())
+            self._cond.notify_all()
+
+    def count(self, phone):
+        with self._cond:
+            return len(self._arrivals.get(phone, ()))
+
+    def wait(self, phone, index, timeout):
+        """Arrival time of the phone's index-th reply, or None on timeout"""
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while len(self._arrivals.get(phone, ())) <= index:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._arrivals[phone][index]
+
+
+def build_script(rng, i, args):
+    """(kind, payload, expects_reply) steps for one simulated phone"""
+    phone = f"91{i:010d}"
+    steps = []
+    if rng.random() < args.stray:
+        steps.append(("text", meta_envelope(phone, rng.choice(("hi", "hello", "??"))), True))
+    steps.append(("text", meta_envelope(phone, "HELP"), True))
+    if rng.random() < args.invalid:
+        steps.append(("text", meta_envelope(phone, "7"), False))
+    steps.append(("text", meta_envelope(phone, str(rng.randint(1, 3))), True))
+    address = f"{rng.randint(1, 999)} {rng.choice(STREETS)}, Bengaluru"
+    if rng.random() < args.location:
+        pin = meta_location_envelope(phone, round(rng.uniform(*CITY_LAT), 6), round(rng.uniform(*CITY_LON), 6))
+        steps.append(("location", (pin, meta_envelope(phone, address)), True))
+    else:
+        steps.append(("text", meta_envelope(phone, address), True))
+
+    # Delivery receipts for our replies arrive interleaved with the user's messages
+    for _ in range(sum(1 for step in steps if step[2])):
+        if rng.random() < args.statuses:
+            at = rng.randint(1, len(steps))
+            steps.insert(at, ("status", meta_status_envelope(phone, rng.choice(("sent", "delivered", "read"))),
+                              False))
+    return phone, steps
+
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000, 2)
+
+    return {"count": len(samples), "p50": pct(50), "p95": pct(95), "p99": pct(99),
+            "max": round(samples[-1] * 1000, 2)}
+
+
+def start_server(args, mock_url, cluster_self=None, cluster_nodes=()):
+    """(process, url) of one bot server, a cluster node when cluster_self is given"""
+    command = next(cmd for label, cmd in MODES.items() if label.startswith(args.mode))
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), GRAPH_BASE_URL=f"{mock_url}/v18.0", LOG_LEVEL='WARNING',
+               WHATSAPP_TOKEN='bench-token', WHATSAPP_PHONE_NUMBER_ID='950947014765895',
+               APP_SECRET=APP_SECRET)
+    if cluster_self:
+        env.update(CLUSTER_SELF=cluster_self, CLUSTER_NODES=','.join(cluster_nodes),
+                   CLUSTER_AUTHKEY=CLUSTER_AUTHKEY)
+    server = subprocess.Popen([part.format(port=port) for part in command], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def run(args):
+    tracker = ReplyTracker()
+    mock, mock_url = start_mock(latency=args.provider_latency_ms / 1000, listener=tracker)
+
+    clustered = args.nodes > 1 or args.join_after is not None
+    members = [f"127.0.0.1:{free_port()}" for _ in range(args.nodes)] if clustered else [None]
+    servers = [start_server(args, mock_url, member, members) for member in members]
+    urls = [url for _, url in servers]
+
+    rng = random.Random(args.seed)
+    scripts = [build_script(rng, i, args) for i in range(args.phones)]
+    ack, reply = [], []
+    counters = {"webhooks": 0, "errors": 0, "missing_replies": 0, "unanswered_pins": 0}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def post(payload):
+        with lock:
+            url = urls[counters["webhooks"] % len(urls)]
+            counters["webhooks"] += 1
+        started = time.perf_counter()
+        try:
+            ok = post_webhook(local.session, f"{url}/webhook", payload, APP_SECRET).status_code == 200
+        except requests.RequestException:
+            ok = False
+        with lock:
+            ack.append(time.perf_counter() - started)
+            counters["errors"] += not ok
+        return started
+
+    def join_later():
+        """One more node joins via the existing ones, then takes its share of the webhooks"""
+        time.sleep(args.join_after)
+        server, url = start_server(args, mock_url, f"127.0.0.1:{free_port()}", members)
+        servers.append((server, url))
+        wait_for(f"{url}/health")
+        with lock:
+            urls.append(url)
+
+    def play(script):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        phone, steps = script
+        expected = tracker.count(phone)
+        for kind, payload, expects_reply in steps:
+            if kind == "location":
+                pin, typed = payload
+                started = post(pin)
+                arrived = tracker.wait(phone, expected, args.pin_timeout)
+                if arrived is None:
+                    # Pin not understood: the user types the address instead
+                    with lock:
+                        counters["unanswered_pins"] += 1
+                    started = post(typed)
+                    arrived = tracker.wait(phone, expected, args.reply_timeout)
+            else:
+                started = post(payload)
+                if not expects_reply:
+                    continue
+                arrived = tracker.wait(phone, expected, args.reply_timeout)
+
+            if arrived is None:
+                with lock:
+                    counters["missing_replies"] += 1
+                continue
+            with lock:
+                reply.append(arrived - started)
+            expected += 1
+
+    cluster = []
+    try:
+        for url in urls:
+            wait_for(f"{url}/health")
+        joiner = None
+        if args.join_after is not None:
+            joiner = threading.Thread(target=join_later, daemon=True)
+            joiner.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(play, scripts))
+        duration = time.perf_counter() - started
+        if joiner is not None:
+            joiner.join()
+        if clustered:
+            cluster = [requests.get(f"{url}/cluster", timeout=5).json() for url in urls]
+    finally:
+        for server, _ in servers:
+            server.terminate()
+            server.wait()
+        mock.shutdown()
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "baseline")},
+        "results": {
+            "duration_s": round(duration, 2),
+            "webhooks_per_sec": round(counters["webhooks"] / duration, 1),
+            "ack_ms": summarize(ack),
+            "reply_ms": summarize(reply),
+            **counters,
+        },
+        "cluster": cluster,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Print current vs baseline; return the list of regressed metrics"""
+    regressions = []
+    current, before = report["results"], baseline["results"]
+    print(f"   {'metric':<22} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric in HIGHER_IS_WORSE:
+        for pct in ("p50", "p95", "p99"):
+            old, new = before.get(metric, {}).get(pct), current[metric].get(pct)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = "  ❌" if change > tolerance else ""
+            print(f"   {metric + ' ' + pct:<22} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+            if flag:
+                regressions.append(f"{metric} {pct}")
+    old, new = before.get("webhooks_per_sec"), current["webhooks_per_sec"]
+    if old:
+        change = (new - old) / old
+        flag = "  ❌" if change < -tolerance else ""
+        print(f"   {'webhooks/s':<22} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append("webhooks_per_sec")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mode', choices=('flask', 'asgi'), default='flask')
+    parser.add_argument('--nodes', type=int, default=1, help="cluster nodes behind the round-robin")
+    parser.add_argument('--join-after', type=float, help="start one more cluster node after this many seconds")
+    parser.add_argument('--phones', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=32, help="phones talking at once")
+    parser.add_argument('--provider-latency-ms', type=float, default=50)
+    parser.add_argument('--stray', type=float, default=0.2, help="share of phones that greet before HELP")
+    parser.add_argument('--invalid', type=float, default=0.1, help="share sending an invalid menu choice")
+    parser.add_argument('--location', type=float, default=0.4, help="share sharing a location pin")
+    parser.add_argument('--statuses', type=float, default=0.7, help="status updates per reply")
+    parser.add_argument('--reply-timeout', type=float, default=15.0)
+    parser.add_argument('--pin-timeout', type=float, default=2.0,
+                        help="how long a user waits on a pin before typing the address")
+    parser.add_argument('--seed', type=int, default=108)
+    parser.add_argument('--out', help="write the JSON report here")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = run(args)
+    results = report["results"]
+    print(f"📊 {args.mode}: {args.phones} phones, {args.concurrency} concurrent, "
+          f"provider latency {args.provider_latency_ms}ms")
+    print(f"   {results['webhooks']} webhooks in {results['duration_s']}s "
+          f"({results['webhooks_per_sec']}/s), {results['errors']} errors")
+    for metric in HIGHER_IS_WORSE:
+        s = results[metric]
+        if s["count"]:
+            print(f"   {metric:<9} p50 {s['p50']:8.1f}  p95 {s['p95']:8.1f}  p99 {s['p99']:8.1f}  "
+                  f"max {s['max']:8.1f}  (n={s['count']})")
+    print(f"   missing replies {results['missing_replies']}, location pins left unanswered "
+          f"{results['unanswered_pins']}")
+    for node in report["cluster"]:
+        print(f"   🕸️ {node['self']}: share {node['owned_share']:.0%}, forwarded {node['forwarded_phones']}, "
+              f"received {node['received_phones']}, handed off {node['handed_off']}, claimed {node['claimed']}, "
+              f"epoch {node['epoch']}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"   💾 report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
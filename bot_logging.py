@@ -0,0 +1,132 @@
+"""
+📝 LOGGING - structured, non-blocking, level-controlled
+Request threads only build a LogRecord and push it on a queue; a single
+listener thread formats (text or JSON lines) and writes it out.
+
+Environment:
+  LOG_LEVEL               DEBUG | INFO | WARNING ... (default INFO)
+  LOG_FORMAT              text | json (default text)
+  LOG_STATUS_SAMPLE_EVERY log 1 in N delivery-status updates (default 20)
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class LazyJSON:
+    """Defers json.dumps(obj) until the record is actually emitted.
+
+    Pass it as a %-style argument: log.debug("payload:\\n%s", LazyJSON(data))
+    costs nothing when DEBUG is off.
+    """
+
+    __slots__ = ('obj', 'limit')
+
+    def __init__(self, obj, limit=500):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self):
+        text = json.dumps(self.obj, indent=2, ensure_ascii=False, default=str)
+        if self.limit and len(text) > self.limit:
+            return text[:self.limit] + '...'
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via extra= become top-level keys"""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Let through 1 in every N records (lock-free counter)"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = max(1, every)
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        return next(self._counter) % self.every == 0
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Only %-interpolates in the caller; timestamps/JSON are built by the listener"""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(config, level=None, fmt=None, stream=None):
+    """Install the queue-backed handler on the root logger (safe to call twice)
+
+    level / fmt override LOG_LEVEL / LOG_FORMAT from config.
+    """
+    global _listener
+
+    level = (level or config.log_level).upper()
+    fmt = fmt or config.log_format
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)-7s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    status_log = logging.getLogger('status')
+    for f in list(status_log.filters):
+        status_log.removeFilter(f)
+    status_log.addFilter(SampleFilter(config.log_status_sample_every))
+    return _listener
+
+
+def flush_logging():
+    """Stop the listener after it has written everything queued so far"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(flush_logging)
@@ -0,0 +1,404 @@
+"""
+🕸️ CLUSTER - several bot processes, each owning a slice of the callers
+Callers' phone numbers are placed on a consistent-hash ring (CLUSTER_VNODES
+virtual points per node), and the node that owns a phone holds its sessions
+and runs its conversations. A webhook may land on any node behind the load
+balancer: the messages (and delivery receipts) it carries for other nodes'
+phones are forwarded to their owners over the same local-socket RPC the
+session server uses, so each conversation still runs in order in one place.
+
+Membership changes (POST /cluster/members, or a new node starting with
+CLUSTER_NODES that does not list itself) go to every node with a new epoch.
+Every RPC also carries both sides' (epoch, nodes), so a node that has not
+heard of a change yet picks it up on first contact, and a forward routed on
+an old ring is passed on to the right owner. Each node swaps in the new ring and pushes the sessions it no longer owns to
+their new owners; adding or removing one of N nodes moves about 1/N of the
+phones. A message that was mid-flight on the old owner can still write the
+session there after it was pushed, so until the handoff has settled
+(CLUSTER_HANDOFF_GRACE seconds) a new owner claims each moved caller's session
+from the previous owner once, on first contact, and the claimed copy wins.
+
+    CLUSTER_SELF=127.0.0.1:51001 CLUSTER_NODES=127.0.0.1:51001,127.0.0.1:51002
+    CLUSTER_AUTHKEY=<shared secret> CLUSTER_ADMIN_TOKEN=<another secret>
+
+The RPC unpickles what peers send, so cluster mode refuses to start without
+CLUSTER_AUTHKEY (the same on every node); keep the RPC ports off the public
+network as well. POST /cluster/members rewrites who owns the callers, so it
+needs "Authorization: Bearer $CLUSTER_ADMIN_TOKEN" and is refused while that
+token is unset. Each node's /sessions lists only its own slice.
+"""
+import atexit
+import bisect
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from multiprocessing.managers import BaseManager, RemoteError
+
+from session_store import parse_address
+
+log = logging.getLogger(__name__)
+
+# Connection failures and exceptions raised on the peer
+RPC_ERRORS = (OSError, EOFError, RemoteError)
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+def phone_of(key):
+    """Phone of a session key ("<phone_number_id>:<phone>" for non-default tenants)"""
+    return key.rpartition(':')[2]
+
+
+class HashRing:
+    """Immutable consistent-hash ring; a membership change builds a new one"""
+
+    def __init__(self, nodes=(), vnodes=128):
+        self.vnodes = vnodes
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted((ring_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key):
+        """Node owning key: the first point clockwise from its hash"""
+        if not self._owners:
+            return None
+        i = bisect.bisect(self._hashes, ring_hash(key))
+        return self._owners[i if i < len(self._owners) else 0]
+
+    def shares(self):
+        """Fraction of the hash space each node owns"""
+        shares = dict.fromkeys(self.nodes, 0.0)
+        if not self._hashes:
+            return shares
+        space = float(1 << 64)
+        previous = self._hashes[-1] - (1 << 64)
+        for h, node in zip(self._hashes, self._owners):
+            shares[node] += (h - previous) / space
+            previous = h
+        return shares
+
+
+class _ClusterManager(BaseManager):
+    pass
+
+
+_local_node = None
+
+
+def _get_local_node():
+    return _local_node
+
+
+_ClusterManager.register('node', callable=_get_local_node,
+                         exposed=('deliver', 'adopt', 'release', 'membership', 'join', 'stats'))
+# deliver / adopt / release / join take the caller's view first and return (result, view)
+
+
+class Cluster:
+    """This node's view of the ring, its RPC endpoint and its peers
+
+    accept(by_number, statuses) runs the share of a webhook this node owns;
+    store is the local session store the handoff moves sessions in and out of.
+    """
+
+    def __init__(self, address, nodes, store, authkey, accept=None, seen=None, vnodes=128,
+                 handoff_grace=30, admin_token=None):
+        if not authkey:
+            raise ValueError("Cluster needs an authkey shared by every node")
+        self.address = address
+        self.store = store
+        self.accept = accept
+        self.seen = seen
+        self.authkey = authkey
+        self.admin_token = admin_token
+        self.vnodes = vnodes
+        self.handoff_grace = handoff_grace
+        self.ring = HashRing(nodes, vnodes)
+        self.previous = None
+        self.epoch = 0
+        self.view = (0, self.ring.nodes)   # (epoch, nodes), replaced whole after the ring
+        self._handoff_until = 0
+        self._claimed = set()   # keys already claimed from their previous owner this handoff
+        self._lock = threading.Lock()
+        self._peers = {}
+        self._server = None
+
+        self.forwarded = 0
+        self.received = 0
+        self.forward_errors = 0
+        self.handed_off = 0
+        self.adopted = 0
+        self.claimed = 0
+        self.handoffs_running = 0
+
+    def start(self, accept=None):
+        """Serve RPC, join the ring if we are not in it yet, hand off restored sessions we don't own"""
+        global _local_node
+        if accept is not None:
+            self.accept = accept
+        _local_node = self
+        self._server = _ClusterManager(address=parse_address(self.address), authkey=self.authkey).get_server()
+        threading.Thread(target=self._server.serve_forever, name="cluster-rpc", daemon=True).start()
+        log.info("🕸️ Cluster node %s serving (%s members)", self.address, len(self.ring.nodes))
+
+        if self.address not in self.ring.nodes:
+            for seed in self.ring.nodes:
+                try:
+                    self._call(seed, 'join', self.address)
+                    break
+                except RPC_ERRORS as e:
+                    log.warning("⚠️ Could not join the cluster via %s: %s", seed, e)
+                    self._drop_peer(seed)
+        elif len(self.store):
+            threading.Thread(target=self._hand_off, daemon=True).start()
+
+    # ----- peers -----
+
+    def _peer(self, address):
+        peer = self._peers.get(address)
+        if peer is None:
+            manager = _ClusterManager(address=parse_address(address), authkey=self.authkey)
+            manager.connect()
+            peer = self._peers[address] = manager.node()
+        return peer
+
+    def _drop_peer(self, address):
+        self._peers.pop(address, None)
+
+    def _learn(self, view):
+        epoch, nodes = view
+        if (epoch, tuple(nodes)) > self.view:
+            self.membership(nodes, epoch)
+
+    def _call(self, address, method, *args):
+        """RPC to a peer, exchanging views so whichever side is behind catches up"""
+        result, view = getattr(self._peer(address), method)(self.view, *args)
+        self._learn(view)
+        return result
+
+    # ----- webhook path -----
+
+    def _unseen(self, by_number):
+        """Drop redelivered messages; done by the owner so a redelivery to another node is still caught"""
+        if self.seen is None:
+            return by_number
+        kept = {}
+        for number, by_phone in by_number.items():
+            for phone, messages in by_phone.items():
+                fresh = []
+                for message in messages:
+                    if self.seen.seen(message.get('id')):
+                        log.info("🔁 Duplicate delivery of %s ignored", message.get('id'))
+                    else:
+                        fresh.append(message)
+                if fresh:
+                    kept.setdefault(number, {})[phone] = fresh
+        return kept
+
+    def split(self, by_number, statuses=()):
+        """Forward other nodes' share of a webhook; returns (by_number, statuses, forwarded)
+
+        by_number / statuses are the share this node owns; forwarded is False if
+        an owner refused its share (its engine was full), so the webhook must not
+        be acked. A share whose owner cannot be reached is kept and run here.
+        """
+        ring = self.ring
+        local, local_statuses, remote = {}, [], {}
+        for number, by_phone in by_number.items():
+            for phone, messages in by_phone.items():
+                owner = ring.owner(phone)
+                if owner is None or owner == self.address:
+                    local.setdefault(number, {})[phone] = messages
+                else:
+                    share = remote.setdefault(owner, ({}, []))
+                    share[0].setdefault(number, {})[phone] = messages
+        for status in statuses:
+            owner = ring.owner(status.get('recipient_id') or '')
+            if owner is None or owner == self.address:
+                local_statuses.append(status)
+            else:
+                remote.setdefault(owner, ({}, []))[1].append(status)
+
+        forwarded = True
+        for owner, (share, owner_statuses) in remote.items():
+            count = sum(len(by_phone) for by_phone in share.values())
+            try:
+                if self._call(owner, 'deliver', share, owner_statuses) is False:
+                    forwarded = False
+                self.forwarded += count
+            except RPC_ERRORS as e:
+                self.forward_errors += 1
+                self._drop_peer(owner)
+                log.error("❌ Forward to %s failed, handling %s phones here: %s", owner, count, e)
+                for number, by_phone in share.items():
+                    local.setdefault(number, {}).update(by_phone)
+                local_statuses.extend(owner_statuses)
+        return self._unseen(local), local_statuses, forwarded
+
+    def deliver(self, view, by_number, statuses):
+        """RPC: another node's forward; anything it routed on an older ring goes on to its owner
+
+        Returns whether all of it was accepted, so the node Meta called can answer 503.
+        """
+        self._learn(view)
+        self.received += sum(len(by_phone) for by_phone in by_number.values())
+        local, local_statuses, forwarded = self.split(by_number, statuses)
+        accepted = self.accept(local, local_statuses)
+        return accepted is not False and forwarded, self.view
+
+    # ----- session handoff -----
+
+    def claim(self, key):
+        """Session the previous owner still holds for key (first contact while a handoff settles), else None"""
+        previous = self.previous
+        if previous is None or time.time() > self._handoff_until or key in self._claimed:
+            return None
+        owner = previous.owner(phone_of(key))
+        if owner is None or owner == self.address:
+            return None
+        self._claimed.add(key)
+        try:
+            session = self._call(owner, 'release', key)
+        except RPC_ERRORS as e:
+            self._drop_peer(owner)
+            log.warning("⚠️ Could not claim %s from %s: %s", key, owner, e)
+            return None
+        if session is not None:
+            self.claimed += 1
+        return session
+
+    def release(self, view, key):
+        """RPC: give up a session to its new owner"""
+        self._learn(view)
+        session = self.store.get(key)
+        if session is not None:
+            self.store.delete(key)
+            self.handed_off += 1
+        return session, self.view
+
+    def adopt(self, view, rows):
+        """RPC: sessions handed to us; one we already hold (claimed or newer) wins"""
+        self._learn(view)
+        for key, session in rows:
+            if key not in self.store:
+                self.store.set(key, session)
+                self.adopted += 1
+        return None, self.view
+
+    def _hand_off(self, batch=500):
+        """Push every local session whose phone another node now owns"""
+        self.handoffs_running += 1
+        try:
+            ring = self.ring
+            leaving = {}
+            for key, session in self.store.export():
+                owner = ring.owner(phone_of(key))
+                if owner is not None and owner != self.address:
+                    leaving.setdefault(owner, []).append((key, session))
+            for owner, rows in leaving.items():
+                for start in range(0, len(rows), batch):
+                    chunk = rows[start:start + batch]
+                    try:
+                        self._call(owner, 'adopt', chunk)
+                    except RPC_ERRORS as e:
+                        self._drop_peer(owner)
+                        log.error("❌ Handoff of %s sessions to %s failed: %s", len(rows) - start, owner, e)
+                        break
+                    for key, _ in chunk:
+                        self.store.delete(key)
+                    self.handed_off += len(chunk)
+            if leaving:
+                log.info("🕸️ Handed off %s sessions to %s nodes", sum(map(len, leaving.values())), len(leaving))
+        finally:
+            self.handoffs_running -= 1
+
+    # ----- membership -----
+
+    def membership(self, nodes, epoch):
+        """RPC: adopt a newer ring and hand off what we no longer own; False if not newer"""
+        nodes = tuple(sorted(set(nodes)))
+        with self._lock:
+            if (epoch, nodes) <= self.view:
+                return False
+            self.previous, self.ring, self.epoch = self.ring, HashRing(nodes, self.vnodes), epoch
+            self._handoff_until = time.time() + self.handoff_grace
+            self._claimed = set()
+            self.view = (epoch, nodes)
+        log.info("🕸️ Cluster epoch %s: %s nodes", epoch, len(nodes))
+        threading.Thread(target=self._hand_off, daemon=True).start()
+        return True
+
+    def change(self, nodes):
+        """Make nodes the membership on every old and new node; returns (epoch, nodes not reached)"""
+        nodes = tuple(sorted(set(nodes)))
+        epoch = self.epoch + 1
+        unreached = []
+        for node in sorted(set(nodes) | set(self.ring.nodes)):
+            if node == self.address:
+                self.membership(nodes, epoch)
+                continue
+            try:
+                self._peer(node).membership(nodes, epoch)
+            except RPC_ERRORS as e:
+                self._drop_peer(node)
+                unreached.append(node)
+                log.error("❌ Membership change not delivered to %s: %s", node, e)
+        return epoch, unreached
+
+    def join(self, view, node):
+        """RPC: add a starting node to the ring"""
+        self._learn(view)
+        if node not in self.ring.nodes:
+            self.change(self.ring.nodes + (node,))
+        return self.epoch, self.view
+
+    def stats(self):
+        return {
+            "self": self.address,
+            "epoch": self.epoch,
+            "nodes": list(self.ring.nodes),
+            "owned_share": round(self.ring.shares().get(self.address, 0.0), 4),
+            "forwarded_phones": self.forwarded,
+            "received_phones": self.received,
+            "forward_errors": self.forward_errors,
+            "handed_off": self.handed_off,
+            "adopted": self.adopted,
+            "claimed": self.claimed,
+            "handoff_running": self.handoffs_running > 0,
+        }
+
+    def admin_allowed(self, authorization):
+        """True if an Authorization header carries the admin token (never while none is set)"""
+        if not self.admin_token or not authorization:
+            return False
+        scheme, _, token = authorization.partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), self.admin_token.encode())
+
+    def close(self):
+        if self._server is not None:
+            self._server.stop_event.set()
+
+
+def create_cluster(config, store, seen=None):
+    """Cluster for CLUSTER_SELF / CLUSTER_NODES (None when CLUSTER_SELF is unset); start() it once accept exists"""
+    address = config.cluster_self
+    if not address:
+        return None
+    authkey = config.cluster_authkey
+    if not authkey:
+        raise ValueError("Set CLUSTER_AUTHKEY (the same secret on every node) to run in cluster mode: "
+                         "the cluster RPC unpickles what peers send")
+    nodes = [node.strip() for node in (config.cluster_nodes or address).split(',') if node.strip()]
+    cluster = Cluster(
+        address, nodes, store, authkey.encode(), seen=seen,
+        vnodes=config.cluster_vnodes,
+        handoff_grace=config.cluster_handoff_grace,
+        admin_token=config.cluster_admin_token or None,
+    )
+    atexit.register(cluster.close)
+    return cluster
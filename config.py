@@ -0,0 +1,161 @@
+"""
+⚙️ CONFIG - every .env setting parsed and checked once, at startup
+load_config() reads .env (once per process), parses each setting in SETTINGS
+and raises ConfigError listing everything that is wrong, so a typo such as
+OUTBOUND_WORKERS=eight stops the bot at boot with one readable message instead
+of a traceback from whichever component happens to read it first. The Config
+is cached: later calls return the same object.
+
+SETTINGS is the only place a default lives: the create_*(config) factories
+take the Config instead of reading the environment, so a benchmark or tool
+that wants different settings builds its own with parse_settings(mapping).
+"""
+import os
+
+from dotenv import load_dotenv
+
+
+class ConfigError(ValueError):
+    """One or more settings are malformed; .problems has one line per setting"""
+
+    def __init__(self, problems):
+        super().__init__("Invalid configuration:\n  " + "\n  ".join(problems))
+        self.problems = problems
+
+
+def flag(value):
+    """'0' / 'false' / 'off' (any case) -> False, anything else -> True"""
+    return value.lower() not in ('0', 'false', 'off')
+
+
+def one_of(*choices):
+    return (lambda value: value in choices), f"one of {', '.join(choices)}"
+
+
+POSITIVE = (lambda value: value > 0), "a value > 0"
+NON_NEGATIVE = (lambda value: value >= 0), "a value >= 0"
+PORT = (lambda value: 0 < value < 65536), "a port number (1-65535)"
+FRACTION = (lambda value: 0 <= value <= 1), "a value between 0 and 1"
+
+TYPE_NAMES = {int: "an integer", float: "a number"}
+
+# NAME: (parse, default, (check, expected) or None)
+SETTINGS = {
+    # WhatsApp provider and webhook
+    'WHATSAPP_PROVIDER': (str.lower, 'meta', one_of('meta', 'wati')),
+    'WHATSAPP_TOKEN': (str, None, None),
+    'WHATSAPP_PHONE_NUMBER_ID': (str, None, None),
+    'GRAPH_BASE_URL': (str, None, None),
+    'WATI_API_KEY': (str, None, None),
+    'WATI_BASE_URL': (str, None, None),
+    'WATI_NUMBER': (str, None, None),
+    'VERIFY_TOKEN': (str, None, None),
+    'APP_SECRET': (str, None, None),
+    'BOT_LANGUAGE': (str, 'en', None),
+    'PORT': (int, 5000, PORT),
+
+    # Logging and metrics
+    'LOG_LEVEL': (str.upper, 'INFO', one_of('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')),
+    'LOG_FORMAT': (str, 'text', one_of('text', 'json')),
+    'LOG_STATUS_SAMPLE_EVERY': (int, 20, POSITIVE),
+    'METRICS_PROFILE_HZ': (float, 0.0, NON_NEGATIVE),
+
+    # Outbound scheduler (a rate of 0 means unlimited)
+    'OUTBOUND_WORKERS': (int, 8, POSITIVE),
+    'OUTBOUND_QUEUE_SIZE': (int, 1000, POSITIVE),
+    'OUTBOUND_RATE_PER_SEC': (float, 80.0, NON_NEGATIVE),
+    'OUTBOUND_BURST': (int, 80, POSITIVE),
+    'OUTBOUND_RECIPIENT_RATE_PER_SEC': (float, 1.0, NON_NEGATIVE),
+    'OUTBOUND_RECIPIENT_BURST': (int, 5, POSITIVE),
+    'OUTBOUND_MAX_RETRIES': (int, 5, NON_NEGATIVE),
+    'OUTBOUND_BACKOFF_BASE': (float, 0.5, NON_NEGATIVE),
+    'OUTBOUND_BACKOFF_MAX': (float, 30.0, NON_NEGATIVE),
+
+    # Engine, dedup, sessions
+    'ENGINE_PARTITIONS': (int, 16, POSITIVE),
+    'ENGINE_QUEUE_SIZE': (int, 1000, POSITIVE),
+    'QUEUE_WAIT': (float, 30.0, NON_NEGATIVE),   # engine jobs / recovery waiting on a full queue
+    'DEDUP_WINDOW': (float, 600.0, POSITIVE),
+    'DEDUP_MAX_ENTRIES': (int, 100000, POSITIVE),
+    'SESSION_BACKEND': (str, 'memory', one_of('memory', 'sqlite', 'server')),
+    'SESSION_STRIPES': (int, 16, POSITIVE),
+    'SESSION_TTL': (float, 3600.0, NON_NEGATIVE),
+    'SESSION_MAX_ENTRIES': (int, 100000, POSITIVE),
+    'SESSION_SWEEP_INTERVAL': (float, 30.0, POSITIVE),
+    'SESSION_DB_PATH': (str, 'sessions.db', None),
+    'SESSION_BATCH_INTERVAL': (float, 0.05, NON_NEGATIVE),
+    'SESSION_BATCH_SIZE': (int, 256, POSITIVE),
+    'SESSION_SERVER_ADDRESS': (str, '127.0.0.1:50055', None),
+    'SESSION_SERVER_AUTHKEY': (str, None, None),
+
+    # Delivery tracking and the incident journal
+    'DELIVERY_MAX_AGE': (float, 86400.0, POSITIVE),
+    'DELIVERY_MAX_ENTRIES': (int, 200000, POSITIVE),
+    'DELIVERY_ALERT_SECONDS': (float, 60.0, POSITIVE),
+    'JOURNAL_DIR': (str, None, None),
+    'JOURNAL_SEGMENT_MB': (int, 64, POSITIVE),
+    'JOURNAL_FSYNC_INTERVAL': (float, 0.01, NON_NEGATIVE),
+    'JOURNAL_FSYNC': (flag, True, None),
+    'JOURNAL_RECOVER_MAX_AGE': (float, 3600.0, NON_NEGATIVE),
+    'JOURNAL_ACK_TIMEOUT': (float, 1.0, NON_NEGATIVE),   # webhook wait for its records' fsync
+
+    # Dispatch units and geocoding
+    'DISPATCH_UNITS_FILE': (str, None, None),
+    'DISPATCH_CELL_KM': (float, 2.0, POSITIVE),
+    'DISPATCH_MAX_KM': (float, 50.0, POSITIVE),
+    'GEOCODE_GAZETTEER_FILE': (str, None, None),
+    'GEOCODE_CACHE_SIZE': (int, 10000, NON_NEGATIVE),
+    'GEOCODE_MIN_SCORE': (float, 0.7, FRACTION),
+
+    # Tenants and cluster mode
+    'TENANTS_FILE': (str, None, None),
+    'TENANTS_RELOAD_INTERVAL': (float, 5.0, NON_NEGATIVE),
+    'CLUSTER_SELF': (str, None, None),
+    'CLUSTER_NODES': (str, None, None),
+    'CLUSTER_AUTHKEY': (str, None, None),
+    'CLUSTER_ADMIN_TOKEN': (str, None, None),
+    'CLUSTER_VNODES': (int, 128, POSITIVE),
+    'CLUSTER_HANDOFF_GRACE': (float, 30.0, NON_NEGATIVE),
+}
+
+
+class Config:
+    """Parsed settings as lowercase attributes: config.port, config.outbound_workers, ..."""
+
+    def __init__(self, values):
+        for name, value in values.items():
+            setattr(self, name.lower(), value)
+
+
+def parse_settings(environ):
+    """Config from a mapping of raw strings; ConfigError names every bad setting"""
+    values, problems = {}, []
+    for name, (parse, default, check) in SETTINGS.items():
+        raw = environ.get(name)
+        if raw is None:
+            values[name] = default
+            continue
+        try:
+            value = parse(raw)
+        except ValueError:
+            problems.append(f"{name}={raw!r}: expected {TYPE_NAMES.get(parse, 'a valid value')}")
+            continue
+        if check is not None and not check[0](value):
+            problems.append(f"{name}={raw!r}: expected {check[1]}")
+            continue
+        values[name] = value
+    if problems:
+        raise ConfigError(problems)
+    return Config(values)
+
+
+_config = None
+
+
+def load_config():
+    """Load .env into the environment and parse it (first call only)"""
+    global _config
+    if _config is None:
+        load_dotenv()
+        _config = parse_settings(os.environ)
+    return _config
@@ -0,0 +1,72 @@
+"""
+🔁 WEBHOOK DEDUP - remembers recently seen message IDs (wamids)
+Meta redelivers a webhook when our 200 is slow; a redelivered message must not
+re-run the state machine. IDs live in two rotating generations, so memory is
+bounded by max_entries and an ID is remembered for between window/2 and window
+seconds (less only if max_entries forces an early rotation).
+"""
+import threading
+import time
+
+
+class SeenCache:
+    """Time- and size-bounded set of message IDs"""
+
+    def __init__(self, window=600, max_entries=100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._current = set()
+        self._previous = set()
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def _rotate_if_due(self, now):
+        elapsed = now - self._rotated_at
+        if elapsed >= self.window / 2 or len(self._current) >= self.max_entries // 2:
+            # After a long idle gap the current generation is already out of window
+            self._previous = self._current if elapsed < self.window else set()
+            self._current = set()
+            self._rotated_at = now
+            self.rotations += 1
+
+    def seen(self, message_id):
+        """Return True if message_id was already seen; otherwise remember it"""
+        if not message_id:
+            return False
+        with self._lock:
+            self._rotate_if_due(time.monotonic())
+            if message_id in self._current or message_id in self._previous:
+                self.hits += 1
+                return True
+            self._current.add(message_id)
+            self.misses += 1
+            return False
+
+    def forget(self, message_id):
+        """Un-mark message_id, so a redelivery of a message we could not take is processed"""
+        with self._lock:
+            self._current.discard(message_id)
+            self._previous.discard(message_id)
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_seconds": self.window,
+                "entries": len(self),
+                "max_entries": self.max_entries,
+                "duplicates": self.hits,
+                "unique": self.misses,
+                "rotations": self.rotations,
+            }
+
+
+def create_seen_cache(config):
+    """Build a cache from DEDUP_WINDOW / DEDUP_MAX_ENTRIES"""
+    return SeenCache(window=config.dedup_window, max_entries=config.dedup_max_entries)
@@ -0,0 +1,292 @@
+"""
+📬 DELIVERY TRACKER - sent -> delivered -> read for every reply we send
+Each accepted send is recorded under the wamid Meta returns; the status
+webhooks (sent / delivered / read / failed) then fill in the timestamps. Updates
+may arrive in any order, even before our own send is recorded: each timestamp
+is set once, a "read" implies "delivered", and a receipt that beat the send
+record is sampled for latency once the send time is known.
+
+Records age out after DELIVERY_MAX_AGE seconds (or beyond DELIVERY_MAX_ENTRIES).
+Delivery and read latencies feed percentiles for /health and /metrics, and a
+dispatch confirmation still not delivered DELIVERY_ALERT_SECONDS after it was
+sent raises one "not delivered" alert.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+from outbound import PRIORITY_URGENT, PRIORITY_NAMES
+
+log = logging.getLogger(__name__)
+
+STATUSES = ('sent', 'delivered', 'read', 'failed')
+
+DELIVERY_SECONDS = metrics.histogram('delivery_seconds', "Time from send to delivered / read receipt",
+                                     ('status',), buckets=(0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900, 3600))
+STATUS_UPDATES = metrics.counter('delivery_status_updates_total', "Status webhooks received by status",
+                                 ('status',))
+OVERDUE_ALERTS = metrics.counter('delivery_overdue_alerts_total', "Confirmations not delivered in time")
+
+
+def message_id(response):
+    """wamid from a Graph send response ({"messages": [{"id": ...}]}), or None"""
+    try:
+        return response['messages'][0]['id']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Delivery:
+    """One outbound message; timestamps are unix seconds, None until seen"""
+
+    __slots__ = ('phone', 'priority', 'created', 'sent_at', 'delivered_at', 'read_at', 'failed_at',
+                 'error', 'alerted')
+
+    def __init__(self, created):
+        self.phone = None
+        self.priority = None
+        self.created = created
+        self.sent_at = None
+        self.delivered_at = None
+        self.read_at = None
+        self.failed_at = None
+        self.error = None
+        self.alerted = False
+
+    @property
+    def status(self):
+        if self.failed_at is not None:
+            return 'failed'
+        if self.read_at is not None:
+            return 'read'
+        if self.delivered_at is not None:
+            return 'delivered'
+        return 'sent' if self.sent_at is not None else 'unknown'
+
+    def to_dict(self):
+        return {
+            "phone": self.phone,
+            "priority": PRIORITY_NAMES.get(self.priority),
+            "status": self.status,
+            "sent_at": self.sent_at,
+            "delivered_at": self.delivered_at,
+            "read_at": self.read_at,
+            "failed_at": self.failed_at,
+            "error": self.error,
+        }
+
+
+def _earliest(current, value):
+    return value if current is None or value < current else current
+
+
+class DeliveryTracker:
+    """wamid -> Delivery, oldest first, plus the urgent sends still awaiting delivery"""
+
+    def __init__(self, max_age=86400, max_entries=200000, alert_after=60, alert_priority=PRIORITY_URGENT,
+                 samples=10000, check_interval=5):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.alert_after = alert_after
+        self.alert_priority = alert_priority
+        self._records = OrderedDict()
+        self._awaiting = OrderedDict()   # wamid -> time we sent it, for sends that can raise an alert
+        self._latency = {'delivered': deque(maxlen=samples), 'read': deque(maxlen=samples)}
+        self._lock = threading.Lock()
+
+        self.tracked = 0
+        self.updates = 0
+        self.unmatched_updates = 0   # status arrived before (or without) our send record
+        self.expired = 0
+        self.alerts = 0
+        self.outcomes = dict.fromkeys(STATUSES, 0)
+
+        self._stop = threading.Event()
+        self._checker = None
+        if alert_after and check_interval:
+            self._checker = threading.Thread(target=self._check_loop, args=(check_interval,),
+                                             name="delivery-checker", daemon=True)
+            self._checker.start()
+
+    def __len__(self):
+        return len(self._records)
+
+    def _record(self, wamid, now):
+        """Existing or new record for wamid (lock held)"""
+        record = self._records.get(wamid)
+        if record is None:
+            record = self._records[wamid] = Delivery(now)
+            self._expire(now)
+        return record
+
+    def _expire(self, now):
+        """Drop the oldest records past max_age / max_entries (lock held)"""
+        records = self._records
+        cutoff = now - self.max_age
+        while records:
+            wamid, record = next(iter(records.items()))
+            if record.created >= cutoff and len(records) <= self.max_entries:
+                break
+            del records[wamid]
+            self._awaiting.pop(wamid, None)
+            self.expired += 1
+
+    def _observe(self, record, status, at):
+        if record.sent_at is not None:
+            latency = max(0.0, at - record.sent_at)
+            self._latency[status].append(latency)
+            DELIVERY_SECONDS.observe(latency, status)
+
+    def _sent_at(self, record, at):
+        """Set the send time; receipts that got here first are sampled now that it is known"""
+        first = record.sent_at is None
+        record.sent_at = _earliest(record.sent_at, at)
+        if first:
+            self.outcomes['sent'] += 1
+            if record.delivered_at is not None:
+                self._observe(record, 'delivered', record.delivered_at)
+            if record.read_at is not None:
+                self._observe(record, 'read', record.read_at)
+
+    def sent(self, response, phone, priority=None):
+        """Record an accepted send; returns its wamid (None if the response has none)"""
+        wamid = message_id(response)
+        if wamid is None:
+            return None
+        now = time.time()
+        with self._lock:
+            record = self._record(wamid, now)
+            record.phone = phone
+            record.priority = priority
+            self.tracked += 1
+            if record.sent_at is None:
+                self._sent_at(record, now)
+            if (priority is not None and priority <= self.alert_priority
+                    and record.delivered_at is None and record.failed_at is None):
+                self._awaiting[wamid] = now   # our clock, so the map stays in time order
+        return wamid
+
+    def update(self, statuses):
+        """Apply the status objects of a webhook (id, status, timestamp, errors)"""
+        now = time.time()
+        with self._lock:
+            for status in statuses:
+                wamid, kind = status.get('id'), status.get('status')
+                if not wamid or kind not in self.outcomes:
+                    continue
+                STATUS_UPDATES.inc(kind)
+                try:
+                    at = float(status.get('timestamp') or now)
+                except (TypeError, ValueError):
+                    at = now
+                self.updates += 1
+                if wamid not in self._records:
+                    self.unmatched_updates += 1
+                self._apply(self._record(wamid, now), wamid, kind, at, status)
+
+    def _apply(self, record, wamid, kind, at, status):
+        if kind == 'sent':
+            self._sent_at(record, at)
+            return
+        if kind == 'failed':
+            if record.failed_at is None:
+                self.outcomes['failed'] += 1
+                errors = status.get('errors') or [{}]
+                record.error = errors[0].get('title') or errors[0].get('code')
+            record.failed_at = _earliest(record.failed_at, at)
+            self._awaiting.pop(wamid, None)
+            return
+        # delivered, or read (which means it was delivered too)
+        if record.delivered_at is None:
+            self.outcomes['delivered'] += 1
+            self._observe(record, 'delivered', at)
+        record.delivered_at = _earliest(record.delivered_at, at)
+        self._awaiting.pop(wamid, None)
+        if kind == 'read':
+            if record.read_at is None:
+                self.outcomes['read'] += 1
+                self._observe(record, 'read', at)
+            record.read_at = _earliest(record.read_at, at)
+
+    def get(self, wamid):
+        with self._lock:
+            record = self._records.get(wamid)
+            return record.to_dict() if record is not None else None
+
+    def overdue(self, now=None):
+        """Urgent sends still undelivered alert_after seconds on, oldest first, as (wamid, dict)"""
+        cutoff = (now or time.time()) - self.alert_after
+        found = []
+        with self._lock:
+            for wamid, sent_at in self._awaiting.items():
+                if sent_at > cutoff:
+                    break   # in send order, so the rest are younger
+                found.append((wamid, self._records[wamid].to_dict()))
+        return found
+
+    def check_overdue(self, now=None):
+        """Alert once per overdue confirmation; returns how many were new"""
+        now = now or time.time()
+        fresh = []
+        with self._lock:
+            for wamid, sent_at in self._awaiting.items():
+                if sent_at > now - self.alert_after:
+                    break
+                record = self._records[wamid]
+                if not record.alerted:
+                    record.alerted = True
+                    fresh.append((wamid, record.phone, now - sent_at))
+            self.alerts += len(fresh)
+        for wamid, phone, waited in fresh:
+            OVERDUE_ALERTS.inc()
+            log.warning("🚨 Confirmation %s to %s not delivered after %.0fs", wamid, phone, waited,
+                        extra={'phone': phone})
+        return len(fresh)
+
+    def _check_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.check_overdue()
+
+    def latency(self):
+        """p50 / p90 / p99 seconds from send to delivered and to read (recent samples)"""
+        with self._lock:
+            samples = {status: sorted(values) for status, values in self._latency.items()}
+        return {status: {f"p{pct}": percentile(ordered, pct) for pct in (50, 90, 99)}
+                for status, ordered in samples.items()}
+
+    def stats(self):
+        latency = self.latency()
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "max_entries": self.max_entries,
+                "max_age_seconds": self.max_age,
+                "tracked_sends": self.tracked,
+                "status_updates": self.updates,
+                "unmatched_updates": self.unmatched_updates,
+                "outcomes": dict(self.outcomes),
+                "awaiting_confirmation": len(self._awaiting),
+                "overdue_alerts": self.alerts,
+                "expired": self.expired,
+                "latency_seconds": latency,
+            }
+
+    def close(self):
+        self._stop.set()
+
+
+def create_delivery_tracker(config):
+    """Build the tracker from DELIVERY_MAX_AGE / DELIVERY_MAX_ENTRIES / DELIVERY_ALERT_SECONDS"""
+    return DeliveryTracker(
+        max_age=config.delivery_max_age,
+        max_entries=config.delivery_max_entries,
+        alert_after=config.delivery_alert_seconds,
+    )
@@ -0,0 +1,247 @@
+"""
+🗺️ UNIT DISPATCH - nearest ambulance / fire / police unit and its ETA
+Station coordinates are bucketed into a uniform lat/lon grid per unit kind; a
+nearest-N query scans rings of cells outward from the caller and stops as soon
+as no unscanned cell can hold anything closer. ETA comes from road-adjusted
+distance and a per-kind average speed.
+
+Units load from DISPATCH_UNITS_FILE (CSV: id,kind,name,lat,lon) at startup.
+Without it the index is empty and confirmations quote the fixed template ETAs.
+Typed addresses get coordinates from geocode.py when a gazetteer is loaded.
+"""
+import csv
+import logging
+import math
+import random
+
+from templates import dispatch_text
+
+log = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+# Emergency type -> kind of unit sent
+UNIT_KINDS = {'medical': 'ambulance', 'fire': 'fire', 'police': 'police'}
+
+# Average urban response speed (km/h) and turnout time (minutes) per unit kind
+UNIT_SPEED_KMH = {'ambulance': 30.0, 'fire': 28.0, 'police': 35.0}
+TURNOUT_MINUTES = {'ambulance': 2.0, 'fire': 1.5, 'police': 1.0}
+ROAD_FACTOR = 1.4   # streets are longer than the straight line
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class Unit:
+    __slots__ = ('unit_id', 'kind', 'name', 'lat', 'lon')
+
+    def __init__(self, unit_id, kind, name, lat, lon):
+        self.unit_id = unit_id
+        self.kind = kind
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+
+    def __repr__(self):
+        return f"Unit({self.unit_id!r}, {self.kind!r}, {self.lat:.5f}, {self.lon:.5f})"
+
+
+class Assignment:
+    """Nearest unit for an incident plus its ETA window in minutes"""
+
+    __slots__ = ('unit', 'distance_km', 'eta_min', 'eta_max')
+
+    def __init__(self, unit, distance_km, eta_min, eta_max):
+        self.unit = unit
+        self.distance_km = distance_km
+        self.eta_min = eta_min
+        self.eta_max = eta_max
+
+    def to_dict(self):
+        return {
+            "unit_id": self.unit.unit_id,
+            "unit_name": self.unit.name,
+            "distance_km": round(self.distance_km, 2),
+            "eta_minutes": [self.eta_min, self.eta_max],
+        }
+
+
+class GridIndex:
+    """Uniform lat/lon grid of points; cells are `cell_km` tall"""
+
+    def __init__(self, cell_km=2.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self._cells = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def add(self, unit):
+        self._cells.setdefault(self._cell(unit.lat, unit.lon), []).append(unit)
+        self._count += 1
+
+    def nearest(self, lat, lon, n=1, max_km=50.0):
+        """Up to n (distance_km, unit) pairs, closest first, within max_km"""
+        if not self._count:
+            return []
+        ci, cj = self._cell(lat, lon)
+        # A degree of longitude shrinks with latitude; use the narrowest one in range
+        lon_km = KM_PER_DEGREE * math.cos(math.radians(min(89.0, abs(lat) + max_km / KM_PER_DEGREE)))
+        ring_km = self.cell_deg * min(KM_PER_DEGREE, lon_km)
+        max_ring = int(max_km / ring_km) + 1
+
+        best = []   # sorted [(distance, unit)], at most n long
+        cells = self._cells
+        for ring in range(max_ring + 1):
+            if ring:
+                # Everything not scanned yet is at least (ring - 1) cells from the query's cell
+                bound = (ring - 1) * ring_km
+                if len(best) == n and bound > best[-1][0]:
+                    break
+                if bound > max_km:
+                    break
+                keys = [(ci + ring, cj + k) for k in range(-ring, ring + 1)]
+                keys += [(ci - ring, cj + k) for k in range(-ring, ring + 1)]
+                keys += [(ci + k, cj + ring) for k in range(-ring + 1, ring)]
+                keys += [(ci + k, cj - ring) for k in range(-ring + 1, ring)]
+            else:
+                keys = [(ci, cj)]
+
+            for key in keys:
+                units = cells.get(key)
+                if not units:
+                    continue
+                for unit in units:
+                    distance = haversine_km(lat, lon, unit.lat, unit.lon)
+                    if distance > max_km or (len(best) == n and distance >= best[-1][0]):
+                        continue
+                    best.append((distance, unit))
+                    best.sort(key=lambda pair: pair[0])
+                    if len(best) > n:
+                        best.pop()
+        return best
+
+
+class UnitIndex:
+    """One grid per unit kind"""
+
+    def __init__(self, units=(), cell_km=2.0, max_km=50.0):
+        self.cell_km = cell_km
+        self.max_km = max_km
+        self._grids = {}
+        self.lookups = 0
+        for unit in units:
+            self.add(unit)
+
+    def add(self, unit):
+        grid = self._grids.get(unit.kind)
+        if grid is None:
+            grid = self._grids[unit.kind] = GridIndex(self.cell_km)
+        grid.add(unit)
+
+    def __len__(self):
+        return sum(len(grid) for grid in self._grids.values())
+
+    def nearest(self, kind, lat, lon, n=1):
+        grid = self._grids.get(kind)
+        self.lookups += 1
+        return grid.nearest(lat, lon, n, self.max_km) if grid else []
+
+    def assign(self, emergency_type, lat, lon):
+        """Nearest unit for an emergency with its ETA window, or None"""
+        kind = UNIT_KINDS.get(emergency_type)
+        found = self.nearest(kind, lat, lon, 1) if kind else []
+        if not found:
+            return None
+        distance, unit = found[0]
+        minutes = TURNOUT_MINUTES[kind] + distance * ROAD_FACTOR / UNIT_SPEED_KMH[kind] * 60
+        return Assignment(unit, distance, max(1, math.floor(minutes * 0.8)), max(2, math.ceil(minutes * 1.25)))
+
+    def stats(self):
+        return {
+            "units": {kind: len(grid) for kind, grid in self._grids.items()},
+            "cell_km": self.cell_km,
+            "max_km": self.max_km,
+            "lookups": self.lookups,
+        }
+
+
+def dispatch_hook(index, templates, geocoder=None):
+    """Flow hook that swaps the fixed-ETA confirmation for one quoting the nearest unit
+
+    A typed address (no pin coordinates) is resolved with the geocoder first,
+    when one is given.
+    """
+
+    def dispatch_nearest(session, reply):
+        if reply is None or session is None:
+            return session, reply
+        lat, lon = session.get('latitude'), session.get('longitude')
+        if (lat is None or lon is None) and geocoder is not None:
+            match = geocoder.geocode(session.get('location'))
+            if match is not None:
+                lat, lon = session['latitude'], session['longitude'] = match.place.lat, match.place.lon
+                session['geocoded'] = match.place.name
+        if lat is None or lon is None:
+            return session, reply
+        emergency_type = session.get('emergency_type')
+        assignment = index.assign(emergency_type, lat, lon)
+        if assignment is None:
+            log.warning("⚠️ No %s unit within %skm of %.5f,%.5f", emergency_type, index.max_km, lat, lon)
+            return session, reply
+        log.info("🚨 Assigned %s (%.1f km, ETA %s-%s min)", assignment.unit.unit_id,
+                 assignment.distance_km, assignment.eta_min, assignment.eta_max,
+                 extra={'emergency_type': emergency_type, 'unit_id': assignment.unit.unit_id})
+        session['unit_id'] = assignment.unit.unit_id
+        session['eta_minutes'] = [assignment.eta_min, assignment.eta_max]
+        return session, (dispatch_text(templates, emergency_type, assignment), reply[1])
+
+    return dispatch_nearest
+
+
+def load_units(path):
+    """Read units from a CSV file with id,kind,name,lat,lon columns"""
+    units = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            units.append(Unit(row['id'], row['kind'].strip().lower(), row.get('name') or row['id'],
+                              float(row['lat']), float(row['lon'])))
+    return units
+
+
+def synthetic_units(count, lat_range=(12.85, 13.10), lon_range=(77.45, 77.75), seed=108):
+    """Randomly placed units over a bounding box (default: Bengaluru), for tests and benchmarks"""
+    rng = random.Random(seed)
+    kinds = list(UNIT_SPEED_KMH)
+    prefixes = {'ambulance': 'AMB', 'fire': 'FIRE', 'police': 'PCR'}
+    units = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        units.append(Unit(f"{prefixes[kind]}-{i}", kind, f"{prefixes[kind]}-{i}",
+                          rng.uniform(*lat_range), rng.uniform(*lon_range)))
+    return units
+
+
+def create_unit_index(config):
+    """Build the index from DISPATCH_UNITS_FILE (empty if unset)"""
+    index = UnitIndex(cell_km=config.dispatch_cell_km, max_km=config.dispatch_max_km)
+    path = config.dispatch_units_file
+    if path:
+        try:
+            for unit in load_units(path):
+                index.add(unit)
+            log.info("🗺️ Loaded %s dispatch units from %s", len(index), path)
+        except (OSError, KeyError, ValueError) as e:
+            log.error("❌ Could not load dispatch units from %s: %s", path, e)
+    return index
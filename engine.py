@@ -0,0 +1,140 @@
+"""
+⚙️ CONVERSATION ENGINE - per-phone ordered, cross-phone parallel processing
+Messages are hashed on the sender's phone to a partition; each partition is
+drained by exactly one thread, so a phone's messages run strictly in order
+while different phones run in parallel.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from session_store import stripe_index
+
+log = logging.getLogger(__name__)
+
+
+class ConversationEngine:
+    """Fixed set of single-threaded partitions keyed by phone number"""
+
+    def __init__(self, partitions=16, max_queue=1000, name="engine"):
+        self.name = name
+        self.partitions = partitions
+        self._queues = [queue.Queue(maxsize=max_queue) for _ in range(partitions)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Spawn one worker per partition (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i, q in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._worker, args=(q,), name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def partition_for(self, phone):
+        return stripe_index(phone, self.partitions)
+
+    def submit(self, phone, func, *args, timeout=0, **kwargs):
+        """Queue func(*args) on the phone's partition. Returns False if rejected.
+
+        A full partition rejects at once unless timeout gives the seconds to
+        wait for room (the webhook never waits; journal recovery does).
+        """
+        if self._stopping:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        self.start()
+
+        try:
+            self._queues[self.partition_for(phone)].put((func, args, kwargs), timeout > 0, timeout or None)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            log.warning("⚠️ Engine partition full - dropped message from %s", phone)
+            return False
+        return True
+
+    def _worker(self, q):
+        while True:
+            job = q.get()
+            if job is None:
+                q.task_done()
+                return
+
+            func, args, kwargs = job
+            try:
+                func(*args, **kwargs)
+                ok = True
+            except Exception as e:
+                log.exception("❌ Engine job %s failed: %s", getattr(func, '__name__', func), e)
+                ok = False
+
+            with self._lock:
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+            q.task_done()
+
+    def join(self, timeout=None):
+        """Wait until every queued message has been processed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for q in self._queues:
+            while q.unfinished_tasks:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.005)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "partitions": self.partitions,
+                "queue_depth": sum(q.qsize() for q in self._queues),
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, timeout=10.0):
+        """Finish queued messages, then stop the partition workers"""
+        if self._stopping:
+            return
+        self._stopping = True
+        if not self._started:
+            return
+
+        self.join(timeout)
+        for q in self._queues:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(1.0)
+
+
+def create_engine(config, name="engine"):
+    """Build an engine from ENGINE_PARTITIONS / ENGINE_QUEUE_SIZE and drain it at exit"""
+    engine = ConversationEngine(
+        partitions=config.engine_partitions,
+        max_queue=config.engine_queue_size,
+        name=name,
+    )
+    atexit.register(engine.shutdown)
+    return engine
@@ -0,0 +1,217 @@
+"""
+🔀 CONVERSATION FLOW - declarative emergency state machine
+The flow (states, input matchers, session updates, reply template names) is plain
+data; compile_flow() turns it once at startup into a dispatch table keyed by
+(state, normalized input) with pre-rendered replies, so a transition is one
+dict lookup. app.py (Meta) and test.py (WATI) both run the same EMERGENCY_FLOW.
+Work that needs live data (e.g. picking the nearest unit) is a named hook the
+front end supplies at compile time.
+"""
+from outbound import PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_LOW
+from templates import ANY, templates_for
+
+CHOICES = {'1': 'medical', '2': 'fire', '3': 'police'}
+
+LOCATION = '<location>'   # input token for a shared location pin (fields carry the coordinates)
+INTENT = '<{}>'           # input token for an intent recognized in free text, e.g. '<fire>'
+
+DISPATCH_FIELDS = ('unit_id', 'eta_minutes', 'geocoded')   # written by the dispatch hook for the last incident
+
+# ============================================
+# FLOW DEFINITION
+# ============================================
+# Rule keys:
+#   on       input (case-insensitive) or tuple of inputs, ANY = fallback
+#   to       next state (omit to stay)
+#   reset    start a fresh session before applying the rule
+#   set      fixed session fields to store
+#   capture  session field that receives the raw input text (or the input's
+#            own fields, for a location pin)
+#   unset    session fields dropped when the rule fires
+#   hook     name of a hook(session, reply) -> (session, reply) run afterwards
+#   reply    template name; priority is its outbound lane
+# Text that matches no rule in a state listed under 'classify' is run through
+# the intent matcher (when one is compiled in) and retried as its normalized
+# form, then as INTENT.format(intent).
+
+SELECT_RULES = [
+    {'on': choice, 'to': 'awaiting_location', 'set': {'emergency_type': emergency},
+     'reply': 'location_request', 'priority': PRIORITY_NORMAL}
+    for choice, emergency in CHOICES.items()
+]
+
+# "ambulance", "aag", "🚓" ... select the emergency exactly like its menu number
+INTENT_RULES = [dict(rule, on=INTENT.format(rule['set']['emergency_type'])) for rule in SELECT_RULES]
+
+EMERGENCY_FLOW = {
+    'initial': 'idle',
+    # Checked before the current state's own rules
+    'global': [
+        {'on': ('help', INTENT.format('help')), 'to': 'awaiting_choice', 'reset': True,
+         'reply': 'menu', 'priority': PRIORITY_LOW},
+    ],
+    # States whose unmatched free text goes through the intent matcher
+    'classify': ('idle', 'awaiting_choice', 'completed'),
+    'states': {
+        'idle': INTENT_RULES + [
+            {'on': tuple(CHOICES), 'reply': 'help_first', 'priority': PRIORITY_LOW},
+            {'on': ANY, 'reply': 'start_hint', 'priority': PRIORITY_LOW},
+        ],
+        'awaiting_choice': SELECT_RULES + INTENT_RULES,
+        'awaiting_location': SELECT_RULES + [
+            {'on': LOCATION, 'to': 'completed', 'capture': 'location', 'unset': DISPATCH_FIELDS,
+             'hook': 'dispatch', 'reply': 'confirmation', 'priority': PRIORITY_URGENT},
+            {'on': ANY, 'to': 'completed', 'capture': 'location',
+             'unset': ('latitude', 'longitude') + DISPATCH_FIELDS,
+             'hook': 'dispatch', 'reply': 'confirmation', 'priority': PRIORITY_URGENT},
+        ],
+        'completed': SELECT_RULES + INTENT_RULES,
+    },
+}
+
+# ============================================
+# COMPILER
+# ============================================
+
+class Transition:
+    """One compiled rule: session update plus pre-rendered reply"""
+
+    __slots__ = ('target', 'reset', 'updates', 'changes', 'capture', 'unset', 'hook',
+                 'reply', 'reply_by_type', 'priority', 'static')
+
+    def __init__(self, rule, templates, state, hooks):
+        self.target = rule.get('to') or state
+        self.reset = rule.get('reset', False)
+        self.capture = rule.get('capture')
+        self.unset = frozenset(rule.get('unset', ()))
+        self.hook = hooks.get(rule['hook']) if rule.get('hook') else None
+        self.priority = rule.get('priority', PRIORITY_NORMAL)
+        # Everything written into the session, state included, merged ahead of time
+        self.updates = dict(rule.get('set', ()), state=self.target)
+        self.changes = bool(rule.get('to') or self.reset or rule.get('set') or self.capture or self.unset)
+
+        template = templates[rule['reply']] if rule.get('reply') else None
+        if isinstance(template, dict) and 'emergency_type' in self.updates:
+            # The rule itself fixes the emergency type, so the reply is known now
+            template = template.get(self.updates['emergency_type'], template[ANY])
+        self.reply = (template, self.priority) if isinstance(template, str) else None
+        self.reply_by_type = {
+            emergency: (text, self.priority) for emergency, text in template.items()
+        } if isinstance(template, dict) else None
+        # Leaves the session alone and always says the same thing
+        self.static = not self.changes and self.hook is None and self.reply_by_type is None
+
+
+class CompiledFlow:
+    """Dispatch table built from a flow definition"""
+
+    def __init__(self, flow, templates, hooks=None, intents=None):
+        self.initial = flow['initial']
+        self.templates = templates
+        self.states = tuple(flow['states'])
+        self.intents = intents
+        classify = frozenset(flow.get('classify', ()))
+        self._rules = {}      # state -> {normalized input: Transition}
+        self._fallback = {}   # state -> Transition for ANY
+
+        for state, rules in flow['states'].items():
+            table = self._rules[state] = {}
+            # Global rules first so they win over a state's own rule for the same input
+            for rule in flow.get('global', []) + rules:
+                transition = Transition(rule, templates, state, hooks or {})
+                matchers = rule['on'] if isinstance(rule['on'], tuple) else (rule['on'],)
+                for matcher in matchers:
+                    if matcher == ANY:
+                        self._fallback.setdefault(state, transition)
+                    else:
+                        # "help", "HELP" and "Help" all hit on the first lookup
+                        for variant in {matcher.lower(), matcher.upper(), matcher.capitalize()}:
+                            table.setdefault(variant, transition)
+
+        # state -> (table, fallback, classify?), so a step starts with one lookup
+        self._states = {
+            state: (table, self._fallback.get(state), state in classify and intents is not None)
+            for state, table in self._rules.items()
+        }
+
+    def __len__(self):
+        # Case variants of an input are one transition
+        return sum(key == key.lower() for table in self._rules.values() for key in table) + len(self._fallback)
+
+    def step(self, session, text, fields=None):
+        """Advance one session dict by one input.
+
+        `fields` are session fields carried by a non-text input (a location
+        pin's label and coordinates); a capturing rule stores them instead of
+        the text. Returns (session, reply): the new session (the same object
+        when nothing changed, None = no session yet) and (text, priority) or None.
+        """
+        entry = self._states.get(session['state'] if session else self.initial)
+        if entry is None:
+            # Sessions written by an older flow restart from the initial state's rules
+            entry = self._states[self.initial]
+        table, fallback, classify = entry
+        transition = table.get(text) or table.get(text.strip().lower())
+        if transition is None:
+            if classify:
+                key, intent = self.intents.match(text)
+                transition = table.get(key) or (table.get(INTENT.format(intent)) if intent else None)
+            if transition is None:
+                transition = fallback
+                if transition is None:
+                    return session, None
+        if transition.static:
+            return session, transition.reply
+
+        if transition.changes:
+            if transition.reset or session is None:
+                session = transition.updates.copy()
+            else:
+                session = {**session, **transition.updates}
+            if transition.unset and not transition.unset.isdisjoint(session):
+                for key in transition.unset:
+                    session.pop(key, None)
+            if transition.capture:
+                if fields:
+                    session.update(fields)
+                else:
+                    session[transition.capture] = text
+
+        if transition.reply_by_type is None:
+            reply = transition.reply
+        else:
+            replies = transition.reply_by_type
+            reply = replies.get(session.get('emergency_type') if session else None, replies[ANY])
+
+        if transition.hook is not None:
+            return transition.hook(session, reply)
+        return session, reply
+
+    def render(self, name, emergency_type=None):
+        """Look up a template the same way step() does (for callers outside the flow)"""
+        template = self.templates[name]
+        if isinstance(template, dict):
+            return template.get(emergency_type, template[ANY])
+        return template
+
+
+def compile_flow(flow=EMERGENCY_FLOW, templates=None, hooks=None, intents=None):
+    """Validate and compile a flow definition (templates default to English)
+
+    hooks maps hook names used by the rules to callables; rules whose hook is
+    not supplied simply skip it. intents is an IntentMatcher (intents.py);
+    without one only literal inputs are recognized.
+    """
+    if templates is None:
+        templates = templates_for('en')
+    states = set(flow['states'])
+    for state in flow.get('classify', ()):
+        if state not in states:
+            raise ValueError(f"flow classifies input in unknown state {state!r}")
+    for state, rules in flow['states'].items():
+        for rule in flow.get('global', []) + rules:
+            if rule.get('to') and rule['to'] not in states:
+                raise ValueError(f"flow rule in {state!r} targets unknown state {rule['to']!r}")
+            if rule.get('reply') and rule['reply'] not in templates:
+                raise ValueError(f"flow rule in {state!r} uses unknown template {rule['reply']!r}")
+    return CompiledFlow(flow, templates, hooks, intents)
@@ -0,0 +1,279 @@
+"""
+🧭 GEOCODER - typed addresses -> coordinates, offline
+Addresses are normalized (case, punctuation, common abbreviations) and matched
+against a gazetteer of named places loaded at startup: an exact lookup over
+word windows first, then a character-trigram index that tolerates typos and
+extra words. Results (misses included) are memoized in a bounded LRU, since the
+same landmarks come up again and again.
+
+Places load from GEOCODE_GAZETTEER_FILE (CSV: name,lat,lon[,aliases] with
+aliases separated by "|"). Without it nothing is geocoded and typed addresses
+are stored as text only, as before.
+"""
+import csv
+import heapq
+import logging
+import random
+import re
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# Spellings people type -> the gazetteer's word
+ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ave': 'avenue', 'ln': 'lane', 'blk': 'block',
+    'mn': 'main', 'crs': 'cross', 'ngr': 'nagar', 'lyt': 'layout', 'hosp': 'hospital',
+    'stn': 'station', 'apts': 'apartments', 'opp': 'opposite', 'nr': 'near',
+    'bangalore': 'bengaluru', 'blr': 'bengaluru',
+}
+
+# Words that never tell two places apart (house / pin numbers are dropped too)
+FILLER = {'near', 'opposite', 'behind', 'beside', 'next', 'to', 'the', 'at', 'no', 'flat',
+          'house', 'floor', 'bengaluru', 'karnataka', 'india'}
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    """Lowercase words with punctuation, numbers and filler dropped and abbreviations expanded
+
+    Gazetteer names go through the same function, so an address and the
+    place it names meet in the middle; it also makes the cache key stable
+    across house numbers and pin codes.
+    """
+    words = (ABBREVIATIONS.get(word, word) for word in _NON_WORD.sub(' ', text.lower()).split())
+    return ' '.join(word for word in words if word not in FILLER and not word.isdigit())
+
+
+def trigrams(key):
+    """Character trigrams of each word of a normalized string, word edges marked"""
+    grams = set()
+    for word in key.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Place:
+    __slots__ = ('name', 'lat', 'lon', 'key', 'grams', 'words')
+
+    def __init__(self, name, lat, lon, key=None):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.key = key or normalize(name)
+        self.grams = frozenset(trigrams(self.key))
+        self.words = self.key.count(' ') + 1
+
+    def __repr__(self):
+        return f"Place({self.name!r}, {self.lat:.5f}, {self.lon:.5f})"
+
+
+class GeoMatch:
+    """A typed address resolved to a place; score is 1.0 for an exact name match"""
+
+    __slots__ = ('place', 'score')
+
+    def __init__(self, place, score):
+        self.place = place
+        self.score = score
+
+    @property
+    def exact(self):
+        return self.score >= 1.0
+
+
+class Gazetteer:
+    """Exact-name table plus a trigram -> places inverted index
+
+    Only trigrams rare enough to be selective are indexed; they pick the
+    candidates. Each candidate is then scored on all of its trigrams against
+    the best same-length word window of the address (Dice similarity), so
+    "... road" vs "... layout" still counts, and a short name hiding inside a
+    longer word ("Ramya" in "Ramyakalga") does not win.
+    """
+
+    def __init__(self, places=(), max_df=0.02):
+        self.max_df = max_df
+        self.places = []
+        self._exact = {}       # normalized name or alias -> Place
+        self._postings = {}    # trigram -> [Place]
+        self._max_words = 1
+        for place in places:
+            self.add(place)
+        self.build()
+
+    def __len__(self):
+        return len(self.places)
+
+    def add(self, place, aliases=()):
+        self.places.append(place)
+        for key in (place.key, *(normalize(alias) for alias in aliases)):
+            if not key:
+                continue
+            self._exact.setdefault(key, place)
+            self._max_words = max(self._max_words, key.count(' ') + 1)
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, []).append(place)
+
+    def build(self):
+        """Drop trigrams shared by too many places ("roa", "oad", ...) from the index
+
+        Call after the last add(). A place made only of common trigrams can
+        still be found by its exact name.
+        """
+        limit = max(50, int(len(self.places) * self.max_df))
+        self._postings = {gram: places for gram, places in self._postings.items() if len(places) <= limit}
+
+    def exact(self, key):
+        """Place named by the longest word window of key, or None"""
+        words = key.split()
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                place = self._exact.get(' '.join(words[start:start + size]))
+                if place is not None:
+                    return place
+        return None
+
+    def fuzzy(self, key, min_score=0.7, min_shared=2, candidates=16):
+        """Best (place, score) for key, score being Dice similarity in 0..1"""
+        words = key.split()
+        shared = {}
+        for gram in trigrams(key):
+            for place in self._postings.get(gram, ()):
+                shared[place] = shared.get(place, 0) + 1
+        if not shared:
+            return None, 0.0
+        shortlist = heapq.nlargest(candidates, (item for item in shared.items() if item[1] >= min_shared),
+                                   key=lambda item: item[1])
+
+        windows = {}   # word count -> trigram sets of each window of the address
+        best, best_rank = None, (min_score, 0)
+        for place, _ in shortlist:
+            score = 0.0
+            for size in range(max(1, place.words - 1), min(len(words), place.words + 1) + 1):
+                grams = windows.get(size)
+                if grams is None:
+                    grams = windows[size] = [trigrams(' '.join(words[i:i + size]))
+                                             for i in range(len(words) - size + 1)]
+                for window in grams:
+                    score = max(score, 2 * len(window & place.grams) / (len(window) + len(place.grams)))
+            # Ties go to the place with more trigrams: the more specific name
+            rank = (score, len(place.grams))
+            if rank >= best_rank:
+                best, best_rank = place, rank
+        return (best, best_rank[0]) if best is not None else (None, 0.0)
+
+
+class Geocoder:
+    """Gazetteer lookups behind an LRU of normalized address -> GeoMatch (or None)"""
+
+    def __init__(self, gazetteer, cache_size=10000, min_score=0.7):
+        self.gazetteer = gazetteer
+        self.cache_size = cache_size
+        self.min_score = min_score
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.exact_matches = 0
+        self.fuzzy_matches = 0
+        self.unmatched = 0
+
+    def __len__(self):
+        return len(self.gazetteer)
+
+    def lookup(self, key):
+        """Uncached match for an already normalized address"""
+        place = self.gazetteer.exact(key)
+        if place is not None:
+            with self._lock:
+                self.exact_matches += 1
+            return GeoMatch(place, 1.0)
+        place, score = self.gazetteer.fuzzy(key, self.min_score)
+        with self._lock:
+            if place is None:
+                self.unmatched += 1
+                return None
+            self.fuzzy_matches += 1
+        return GeoMatch(place, score)
+
+    def geocode(self, text):
+        """GeoMatch for a typed address, or None"""
+        if not text or not len(self.gazetteer):
+            return None
+        key = normalize(text)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+
+        match = self.lookup(key)
+        if self.cache_size:
+            with self._lock:
+                self._cache[key] = match
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return match
+
+    def stats(self):
+        with self._lock:
+            return {
+                "places": len(self.gazetteer),
+                "cache_entries": len(self._cache),
+                "cache_size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "exact": self.exact_matches,
+                "fuzzy": self.fuzzy_matches,
+                "unmatched": self.unmatched,
+            }
+
+
+def load_gazetteer(path, max_df=0.02):
+    """Read places from a CSV file with name,lat,lon[,aliases] columns"""
+    gazetteer = Gazetteer(max_df=max_df)
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            aliases = [alias for alias in (row.get('aliases') or '').split('|') if alias.strip()]
+            gazetteer.add(Place(row['name'].strip(), float(row['lat']), float(row['lon'])), aliases)
+    gazetteer.build()
+    return gazetteer
+
+
+_SYLLABLES = ("ko", "ra", "man", "ga", "la", "ja", "ya", "na", "gar", "in", "di", "vi", "hal", "li",
+              "pu", "ram", "ba", "sa", "van", "hen", "nur", "pe", "te", "kal", "ya", "mal", "le", "shwa")
+_SUFFIXES = ("road", "main road", "cross road", "layout", "nagar", "circle", "block", "market",
+             "hospital", "bus stand", "metro station", "temple", "park", "junction")
+
+
+def synthetic_places(count, lat_range=(12.85, 13.10), lon_range=(77.45, 77.75), seed=108):
+    """Distinct made-up place names over a bounding box (default: Bengaluru), for benchmarks"""
+    rng = random.Random(seed)
+    names = set()
+    places = []
+    while len(places) < count:
+        stem = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{stem} {rng.choice(_SUFFIXES).title()}"
+        if name in names:
+            continue
+        names.add(name)
+        places.append(Place(name, rng.uniform(*lat_range), rng.uniform(*lon_range)))
+    return places
+
+
+def create_geocoder(config):
+    """Build the geocoder from GEOCODE_GAZETTEER_FILE / GEOCODE_CACHE_SIZE / GEOCODE_MIN_SCORE"""
+    path = config.geocode_gazetteer_file
+    gazetteer = Gazetteer()
+    if path:
+        try:
+            gazetteer = load_gazetteer(path)
+            log.info("🧭 Loaded %s gazetteer places from %s", len(gazetteer), path)
+        except (OSError, KeyError, ValueError) as e:
+            log.error("❌ Could not load gazetteer from %s: %s", path, e)
+    return Geocoder(gazetteer, cache_size=config.geocode_cache_size, min_score=config.geocode_min_score)
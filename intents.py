@@ -0,0 +1,166 @@
+"""
+🧠 INTENT MATCHER - "Help!", "ambulance", "aag", "🔥", "१" in one message
+Menu-step input is normalized (case, punctuation, emoji, Devanagari digits,
+stretched letters like "helppp") and scanned once with an Aho-Corasick
+automaton over English, Hindi and transliterated Hinglish keywords, so an
+emergency named in plain words selects it directly instead of costing the
+caller a "type HELP first" round trip.
+
+The flow only consults the matcher in states listed under its 'classify' key;
+typed addresses (awaiting_location) are never classified.
+"""
+import re
+
+# ============================================
+# KEYWORDS
+# ============================================
+
+INTENT_KEYWORDS = {
+    'help': (
+        "help", "sos", "emergency", "urgent", "madad", "bachao", "bachaaoo", "sahayata", "sahayta",
+        "मदद", "बचाओ", "सहायता", "आपातकाल",
+    ),
+    'medical': (
+        "ambulance", "ambulence", "ambulans", "embulance", "doctor", "daktar", "hospital",
+        "aspatal", "haspatal", "medical", "injured", "injury", "accident", "bleeding",
+        "unconscious", "heart attack", "chest pain", "not breathing", "pregnant", "labour pain",
+        "chot", "khoon", "behosh", "saans",
+        "एम्बुलेंस", "एंबुलेंस", "डॉक्टर", "अस्पताल", "चोट", "खून", "बेहोश", "दुर्घटना",
+    ),
+    'fire': (
+        "fire", "smoke", "burning", "blast", "explosion", "gas leak", "cylinder",
+        "aag", "agni", "dhuan", "dhuaan", "jal raha", "jal rahi",
+        "आग", "अग्नि", "धुआं", "धुआँ",
+    ),
+    'police': (
+        "police", "polis", "pulis", "thief", "theft", "robbery", "robbed", "stolen", "fight",
+        "kidnap", "harassment", "chor", "chori", "loot", "ladai", "maar peet", "gunda", "thana",
+        "पुलिस", "चोर", "चोरी", "लूट", "लड़ाई", "थाना",
+    ),
+}
+
+# Emoji stand in for the keyword they picture
+INTENT_EMOJI = {
+    '🆘': 'sos', '🚨': 'emergency',
+    '🚑': 'ambulance', '🏥': 'hospital', '🩸': 'bleeding', '🤕': 'injured',
+    '🔥': 'fire', '🚒': 'fire', '🧯': 'fire',
+    '🚓': 'police', '🚔': 'police', '👮': 'police',
+}
+
+# An emergency named anywhere beats a plain call for help ("help! fire")
+PRECEDENCE = {'help': 1}
+
+# ============================================
+# NORMALIZATION
+# ============================================
+
+_TRANSLATE = {ord(emoji): f" {word} " for emoji, word in INTENT_EMOJI.items()}
+_TRANSLATE.update({ord(digit): str(i) for i, digit in enumerate("०१२३४५६७८९")})
+_TRANSLATE.update({ord(ch): ' ' for ch in "!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~।॥…“”‘’¡¿"})
+
+# Remaining pictographs, variation selectors and joiners
+_SYMBOLS = re.compile("[\u200d\ufe0f\u2190-\u2bff\U0001f000-\U0001faff]+")
+_STRETCH = re.compile(r"(.)\1+")
+
+
+def normalize(text):
+    """Casefolded words separated by single spaces, emoji spelled out"""
+    return ' '.join(_SYMBOLS.sub(' ', text.translate(_TRANSLATE).casefold()).split())
+
+
+def squeeze(key):
+    """Collapse repeated letters so "helppp" / "aaaag" / "aag" all look alike"""
+    return _STRETCH.sub(r"\1", key)
+
+
+def deletions(word):
+    """Spellings with one letter missing ("ambulnce"), for longer ASCII words"""
+    if len(word) < 6 or not word.isascii() or ' ' in word:
+        return ()
+    return tuple(squeeze(word[:i] + word[i + 1:]) for i in range(1, len(word)))
+
+# ============================================
+# AHO-CORASICK AUTOMATON
+# ============================================
+
+class IntentMatcher:
+    """Keyword automaton; each keyword must match whole words"""
+
+    def __init__(self, keywords=INTENT_KEYWORDS, typos=True):
+        self._goto = [{}]     # node -> {char: node}
+        self._fail = [0]
+        self._out = [None]    # node -> (intent, length) of the keyword ending there
+        self.keywords = 0
+
+        for intent, phrases in keywords.items():
+            for phrase in phrases:
+                key = squeeze(normalize(phrase))
+                self._add(f" {key} ", intent)
+                if typos:
+                    for variant in deletions(key):
+                        self._add(f" {variant} ", intent)
+        self._link()
+
+    def _add(self, pattern, intent):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = nxt
+        if self._out[node] is None:   # first intent to claim a spelling keeps it
+            self._out[node] = (intent, len(pattern))
+            self.keywords += 1
+
+    def _link(self):
+        """Breadth-first failure links; outputs are inherited along them"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+
+    def __len__(self):
+        return self.keywords
+
+    def scan(self, key):
+        """(start, intent) for every keyword found in a normalized string"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        node = 0
+        text = f" {squeeze(key)} "
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] is not None:
+                intent, length = out[node]
+                found.append((i + 1 - length, intent))
+                # Keywords share their boundary space: let the next one start on it
+                node = goto[0].get(' ', 0)
+        return found
+
+    def match(self, text):
+        """(normalized text, intent or None): the earliest emergency, else help"""
+        key = normalize(text)
+        best = None
+        for start, intent in self.scan(key):
+            rank = (PRECEDENCE.get(intent, 0), start)
+            if best is None or rank < best[0]:
+                best = (rank, intent)
+        return key, best[1] if best else None
+
+
+def compile_intents(keywords=INTENT_KEYWORDS):
+    """Build the matcher once at startup"""
+    return IntentMatcher(keywords)
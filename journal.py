@@ -0,0 +1,537 @@
+"""
+📒 INCIDENT JOURNAL - append-only write-ahead log of every emergency conversation
+Each inbound message is journaled when the webhook receives it, each processed
+message with the session it produced, each queued reply and its delivery. A
+background thread group-commits appended records with one write + fsync per
+batch, and the log rotates into fixed-size segments. A failed write is retried
+(durable_lsn only moves past records that are really on disk).
+
+Each rotation folds the closed segments into a checkpoint (sessions, messages
+not yet processed, replies not yet delivered) and deletes them, so replay
+reads one checkpoint plus the segments written since, not the whole history.
+
+Record framing: 4-byte length, 4-byte CRC32, compact JSON body. A torn or
+corrupt tail (crash mid-write) ends the log at the last good record.
+
+After a crash, replay() rebuilds the sessions, the inbound messages that were
+acked but never processed, and the replies that were queued but never sent:
+    python journal.py replay journal/          # summary
+    python journal.py tail journal/ -n 20      # last records since the checkpoint
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<II')   # body length, crc32(body)
+SEGMENT_PREFIX = 'journal-'
+SEGMENT_SUFFIX = '.log'
+CHECKPOINT_PREFIX = 'checkpoint-'
+CHECKPOINT_SUFFIX = '.json'
+RETRY_SECONDS = 1.0   # pause before retrying a failed write
+
+# Record kinds
+INBOUND = 'in'     # p=phone, m=message as received
+STEP = 'step'      # p=phone, id=message id, s=session after it (only when it changed)
+REPLY = 'out'      # p=phone, text, pri=priority; its lsn identifies the send
+DELIVERED = 'done'   # ref=lsn of the reply, ok=False when the provider rejected it
+
+
+def segment_name(first_lsn):
+    return f"{SEGMENT_PREFIX}{first_lsn:016d}{SEGMENT_SUFFIX}"
+
+
+def checkpoint_name(lsn):
+    return f"{CHECKPOINT_PREFIX}{lsn:016d}{CHECKPOINT_SUFFIX}"
+
+
+def _listing(directory, prefix, suffix):
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(suffix))
+    return [os.path.join(directory, name) for name in names]
+
+
+def list_segments(directory):
+    """Segment paths, oldest first"""
+    return _listing(directory, SEGMENT_PREFIX, SEGMENT_SUFFIX)
+
+
+def list_checkpoints(directory):
+    """Checkpoint paths, oldest first"""
+    return _listing(directory, CHECKPOINT_PREFIX, CHECKPOINT_SUFFIX)
+
+
+def first_lsn(path):
+    """The lsn a segment starts at (or the one a checkpoint covers up to), from its name"""
+    name = os.path.basename(path)
+    return int(name[name.index('-') + 1:name.rindex('.')])
+
+
+def fsync_directory(directory):
+    """Make created / renamed / deleted directory entries durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def encode(record):
+    body = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def scan_segment(path):
+    """Yield (offset_after, record) for each intact record; stops at a torn / corrupt tail"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset, end, size = 0, len(data), HEADER.size
+    while offset + size <= end:
+        length, crc = HEADER.unpack_from(data, offset)
+        start = offset + size
+        body = data[start:start + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            break
+        offset = start + length
+        yield offset, json.loads(body)
+
+
+def read_records(directory, after=0):
+    """Every intact record past lsn `after` across all segments, in log order"""
+    segments = list_segments(directory)
+    for i, path in enumerate(segments):
+        if i + 1 < len(segments) and first_lsn(segments[i + 1]) <= after + 1:
+            continue   # wholly at or before `after`
+        last = 0
+        for last, record in scan_segment(path):
+            if record['n'] > after:
+                yield record
+        if last < os.path.getsize(path):
+            log.warning("⚠️ Journal segment %s ends in a torn record at byte %s", os.path.basename(path), last)
+
+# ============================================
+# WRITER
+# ============================================
+
+class Journal:
+    """Append-only segmented log with group-committed fsync
+
+    append() only encodes and buffers; the flusher writes and fsyncs whatever
+    accumulated every fsync_interval seconds. sync() waits until everything
+    appended so far is durable (the webhook calls it before acking). Records
+    older than retain_seconds are left out of checkpoints.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync_interval=0.01, fsync=True,
+                 retain_seconds=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.fsync = fsync
+        self.retain_seconds = retain_seconds
+
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._cond = threading.Condition()
+        self._flushed = threading.Condition(self._cond)
+        self._stopping = False
+        self._thread = None
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._synced_size = 0    # end of the last record written (and fsynced) to _path
+        self._synced_lsn = 0     # flusher-only; published as durable_lsn
+        self._checkpointing = threading.Lock()
+
+        self.lsn = 0            # last sequence number handed out
+        self.durable_lsn = 0    # last one written (and fsynced, if enabled)
+        self.records = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.segments = 0
+        self.checkpoint_lsn = 0
+        self.checkpoints = 0
+
+    def open(self):
+        """Find the end of the existing log (cutting a torn tail) and start the flusher"""
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoints = list_checkpoints(self.directory)
+        if checkpoints:
+            self.checkpoint_lsn = self.lsn = first_lsn(checkpoints[-1])
+        segments = list_segments(self.directory)
+        self.segments = len(segments)
+        if segments:
+            path = segments[-1]
+            end = 0
+            for end, record in scan_segment(path):
+                self.lsn = record['n']
+            if end < os.path.getsize(path):
+                log.warning("⚠️ Truncating torn journal tail in %s at byte %s", os.path.basename(path), end)
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+            if not self.lsn:
+                # Last segment holds no intact record; its name still marks where it started
+                self.lsn = first_lsn(path) - 1
+            self._file = open(path, 'ab')
+            self._path = path
+            self._size = self._synced_size = end
+        self.durable_lsn = self._synced_lsn = self.lsn
+
+        self._thread = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._thread.start()
+        return self
+
+    def append(self, kind, **fields):
+        """Buffer one record and return its sequence number"""
+        with self._cond:
+            self.lsn += 1
+            lsn = self.lsn
+            data = encode({'n': lsn, 't': round(time.time(), 3), 'k': kind, **fields})
+            self._buffer.append((lsn, data))
+            self._buffered_bytes += len(data)
+            if self._buffered_bytes >= 1024 * 1024:
+                self._cond.notify()
+        return lsn
+
+    def _rotate(self, lsn):
+        closed, self._file = self._file, None
+        if closed is not None:
+            closed.close()
+        path = os.path.join(self.directory, segment_name(lsn))
+        self._file = open(path, 'ab')
+        self._path = path
+        self._size = self._synced_size = 0
+        self.segments += 1
+        if self.fsync:
+            fsync_directory(self.directory)
+        if closed is not None and self._checkpointing.acquire(blocking=False):
+            threading.Thread(target=self._checkpoint, name="journal-checkpoint", daemon=True).start()
+
+    def _write(self, batch):
+        try:
+            chunk, last = [], None
+            for lsn, data in batch:
+                if self._file is None or (self._size and self._size + len(data) > self.segment_bytes):
+                    if chunk:
+                        self._commit(chunk, last)
+                        chunk = []
+                    self._rotate(lsn)
+                chunk.append(data)
+                last = lsn
+                self._size += len(data)
+            self._commit(chunk, last)
+        except OSError:
+            self._cut_partial()
+            raise
+
+    def _commit(self, chunk, last_lsn):
+        data = b''.join(chunk)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._synced_size = self._size
+        self._synced_lsn = last_lsn
+        self.bytes_written += len(data)
+
+    def _cut_partial(self):
+        """After a failed write, cut the segment back to its last synced record so the retry appends cleanly"""
+        failed, self._file = self._file, None
+        if failed is None:
+            return
+        try:
+            failed.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self._path, self._synced_size)
+            self._file = open(self._path, 'ab')
+            self._size = self._synced_size
+        except OSError as e:
+            # Replay stops reading this segment at the torn record; the retry starts a new one
+            log.warning("⚠️ Could not cut journal segment %s back to %s bytes: %s",
+                        os.path.basename(self._path), self._synced_size, e)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                if not self._buffer and not self._stopping:
+                    self._cond.wait(self.fsync_interval)
+                batch, self._buffer, self._buffered_bytes = self._buffer, [], 0
+                stopping = self._stopping
+            if batch:
+                try:
+                    self._write(batch)
+                    error = None
+                except OSError as e:
+                    error = e
+                with self._cond:
+                    unwritten = [item for item in batch if item[0] > self._synced_lsn]
+                    self.records += len(batch) - len(unwritten)
+                    self.batches += 1
+                    self.durable_lsn = self._synced_lsn
+                    self._flushed.notify_all()
+                    if error is not None:
+                        self.write_errors += 1
+                        if stopping:
+                            log.critical("❌ Journal write failed at shutdown - %s records lost: %s",
+                                         len(unwritten), error)
+                        else:
+                            # Keep them (ahead of anything appended since) and try again
+                            log.error("❌ Journal write failed, retrying %s records in %.0fs: %s",
+                                      len(unwritten), RETRY_SECONDS, error)
+                            self._buffer[:0] = unwritten
+                            self._buffered_bytes += sum(len(data) for _, data in unwritten)
+                            self._cond.wait(RETRY_SECONDS)
+            elif stopping:
+                return
+
+    def _checkpoint(self):
+        try:
+            lsn = write_checkpoint(self.directory, self.retain_seconds, fsync=self.fsync)
+            if lsn:
+                with self._cond:
+                    self.checkpoint_lsn = lsn
+                    self.checkpoints += 1
+                    self.segments = len(list_segments(self.directory))
+        except (OSError, ValueError) as e:
+            log.error("❌ Journal checkpoint failed (segments kept): %s", e)
+        finally:
+            self._checkpointing.release()
+
+    def sync(self, timeout=None):
+        """Wait until every record appended so far is on disk"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self.lsn
+            self._cond.notify()
+            while self.durable_lsn < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            if self._thread is None or self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(5.0)
+        if self._file is not None:
+            self._file.close()
+        log.info("📒 Journal closed at record %s (%s segments)", self.durable_lsn, self.segments)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "directory": self.directory,
+                "segments": self.segments,
+                "last_lsn": self.lsn,
+                "durable_lsn": self.durable_lsn,
+                "records_written": self.records,
+                "bytes_written": self.bytes_written,
+                "fsync_batches": self.batches,
+                "write_errors": self.write_errors,
+                "checkpoint_lsn": self.checkpoint_lsn,
+                "checkpoints": self.checkpoints,
+                "fsync": self.fsync,
+            }
+
+# ============================================
+# REPLAY
+# ============================================
+
+class Recovery:
+    """What a crashed process left behind, rebuilt from the journal"""
+
+    def __init__(self):
+        self.sessions = {}      # phone -> (session dict, time of its last step)
+        self.unprocessed = {}   # phone -> [message, ...] acked but never run through the flow
+        self.pending = {}       # reply lsn -> (phone, text, priority, time queued)
+        self.waiting = {}       # message id -> (phone, message, time) journaled but not yet stepped
+        self.records = 0
+        self.last_lsn = 0
+        self.seconds = 0.0
+
+    def apply(self, record):
+        kind = record['k']
+        if kind == STEP:
+            self.waiting.pop(record.get('id'), None)
+            if 's' in record:
+                self.sessions[record['p']] = (record['s'], record['t'])
+        elif kind == INBOUND:
+            message = record['m']
+            self.waiting[message.get('id') or f"lsn-{record['n']}"] = (record['p'], message, record['t'])
+        elif kind == REPLY:
+            self.pending[record['n']] = (record['p'], record['text'], record.get('pri'), record['t'])
+        elif kind == DELIVERED:
+            self.pending.pop(record['ref'], None)
+        self.records += 1
+        self.last_lsn = record['n']
+
+    def prune(self, cutoff):
+        """Forget anything last touched before cutoff (a time.time())"""
+        self.sessions = {phone: entry for phone, entry in self.sessions.items() if entry[1] >= cutoff}
+        self.pending = {ref: entry for ref, entry in self.pending.items() if entry[3] >= cutoff}
+        self.waiting = {key: entry for key, entry in self.waiting.items() if entry[2] >= cutoff}
+
+    def to_checkpoint(self):
+        return {
+            "lsn": self.last_lsn,
+            "records": self.records,
+            "sessions": [[phone, session, at] for phone, (session, at) in self.sessions.items()],
+            "waiting": [[key, *entry] for key, entry in self.waiting.items()],
+            "pending": [[ref, *entry] for ref, entry in self.pending.items()],
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data):
+        recovery = cls()
+        recovery.last_lsn = data['lsn']
+        recovery.records = data['records']
+        recovery.sessions = {phone: (session, at) for phone, session, at in data['sessions']}
+        recovery.waiting = {key: tuple(entry) for key, *entry in data['waiting']}
+        recovery.pending = {ref: tuple(entry) for ref, *entry in data['pending']}
+        return recovery
+
+    def summary(self):
+        states = {}
+        for session, _ in self.sessions.values():
+            if session:
+                states[session.get('state')] = states.get(session.get('state'), 0) + 1
+        return {
+            "records": self.records,
+            "last_lsn": self.last_lsn,
+            "replay_seconds": round(self.seconds, 3),
+            "sessions": len(self.sessions),
+            "sessions_by_state": states,
+            "unprocessed_messages": sum(map(len, self.unprocessed.values())),
+            "pending_replies": len(self.pending),
+        }
+
+
+def load_checkpoint(directory):
+    """Recovery as of the newest checkpoint (empty if there is none)"""
+    checkpoints = list_checkpoints(directory)
+    if not checkpoints:
+        return Recovery()
+    with open(checkpoints[-1], encoding='utf-8') as f:
+        return Recovery.from_checkpoint(json.load(f))
+
+
+def write_checkpoint(directory, max_age=None, fsync=True):
+    """Fold every closed segment into a new checkpoint, then delete them and older checkpoints
+
+    The last segment is the one being appended to and is kept. Returns the
+    lsn the checkpoint covers, or None when there was nothing to fold.
+    """
+    segments = list_segments(directory)
+    if len(segments) < 2:
+        return None
+    upto = first_lsn(segments[-1]) - 1
+    recovery = load_checkpoint(directory)
+    if upto <= recovery.last_lsn:
+        return None
+    for record in read_records(directory, after=recovery.last_lsn):
+        if record['n'] > upto:
+            break
+        recovery.apply(record)
+    recovery.last_lsn = upto
+    if max_age:
+        recovery.prune(time.time() - max_age)
+
+    path = os.path.join(directory, checkpoint_name(upto))
+    staged = path + '.tmp'
+    with open(staged, 'w', encoding='utf-8') as f:
+        json.dump(recovery.to_checkpoint(), f, ensure_ascii=False, separators=(',', ':'))
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(staged, path)
+    if fsync:
+        fsync_directory(directory)
+    # Only now that the checkpoint is durable are the records it replaces expendable
+    for old in segments[:-1] + list_checkpoints(directory)[:-1]:
+        os.remove(old)
+    log.info("📒 Journal checkpoint at record %s: %s sessions, %s unprocessed messages, %s pending replies",
+             upto, len(recovery.sessions), len(recovery.waiting), len(recovery.pending))
+    return upto
+
+
+def replay(directory, max_age=None):
+    """Fold the journal (from its checkpoint on) into a Recovery; with max_age (seconds), skip anything older"""
+    started = time.perf_counter()
+    recovery = load_checkpoint(directory)
+    for record in read_records(directory, after=recovery.last_lsn):
+        recovery.apply(record)
+
+    if max_age:
+        recovery.prune(time.time() - max_age)
+    for phone, message, _ in recovery.waiting.values():
+        recovery.unprocessed.setdefault(phone, []).append(message)
+    recovery.seconds = time.perf_counter() - started
+    return recovery
+
+
+def create_journal(config):
+    """Journal in JOURNAL_DIR (None when unset), closed at exit; call open() before appending"""
+    if not config.journal_dir:
+        return None
+    journal = Journal(
+        config.journal_dir,
+        segment_bytes=config.journal_segment_mb * 1024 * 1024,
+        fsync_interval=config.journal_fsync_interval,
+        fsync=config.journal_fsync,
+        retain_seconds=config.journal_recover_max_age,
+    )
+    atexit.register(journal.close)
+    return journal
+
+# ============================================
+# COMMAND LINE
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or replay the incident journal")
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_cmd = commands.add_parser('replay', help="rebuild state and print a summary")
+    replay_cmd.add_argument('directory')
+    replay_cmd.add_argument('--sessions', action='store_true', help="also print every rebuilt session")
+    replay_cmd.add_argument('--max-age', type=float, help="ignore anything older than this many seconds")
+    tail = commands.add_parser('tail', help="print the last records")
+    tail.add_argument('directory')
+    tail.add_argument('-n', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == 'tail':
+        last = []
+        for record in read_records(args.directory):
+            last.append(record)
+            if len(last) > args.n:
+                last.pop(0)
+        for record in last:
+            print(json.dumps(record, ensure_ascii=False))
+        return
+
+    recovery = replay(args.directory, args.max_age)
+    print(json.dumps(recovery.summary(), indent=2))
+    if args.sessions:
+        for phone, (session, at) in sorted(recovery.sessions.items()):
+            print(json.dumps({"phone": phone, "at": at, "session": session}, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+    main()
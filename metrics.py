@@ -0,0 +1,376 @@
+"""
+📈 METRICS - Prometheus-style counters, histograms and a sampling profiler
+Hot paths (webhook parsing, flow transitions, provider sends) record into
+per-thread shards: a thread only ever writes its own dict, so an update is a
+couple of dict operations with no lock. Shards are summed when /metrics is
+scraped, together with collectors that read queue depths, retry counts and
+sessions by state straight from the components' stats at scrape time.
+
+The sampling profiler (sys._current_frames at METRICS_PROFILE_HZ) is off by
+default; when METRICS_PROFILE_HZ is set it can be toggled with
+POST /metrics/profile?enabled=1 and read as folded stacks from GET /metrics/profile.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond transitions up to slow provider sends
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ============================================
+# PER-THREAD SHARDS
+# ============================================
+
+class _Shards:
+    """One dict per writing thread, folded together on read"""
+
+    RETIRE_AFTER = 64   # shards before dead threads' shards are folded away
+
+    def __init__(self, merge):
+        self._merge = merge           # merge(into, shard) folds one shard into another
+        self.local = threading.local()   # .shard is this thread's dict once mine() made it
+        self._live = []               # (thread, shard)
+        self._retired = {}            # shards of threads that have exited
+        self._lock = threading.Lock()   # taken only to add / fold shards, never per update
+
+    def mine(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self._lock:
+                self._live.append((threading.current_thread(), shard))
+                if len(self._live) > self.RETIRE_AFTER:
+                    self._retire()
+            return shard
+
+    def _retire(self):
+        """Fold shards of exited threads (Flask spawns one per request) into one (lock held)"""
+        live = []
+        for thread, shard in self._live:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._live = live
+
+    def collect(self):
+        with self._lock:
+            self._retire()
+            total = {}
+            self._merge(total, self._retired)
+            for _, shard in self._live:
+                # dict.copy is atomic under the GIL, so a concurrent update can't break it
+                self._merge(total, shard.copy())
+        return total
+
+
+def _merge_counts(into, shard):
+    for key, value in shard.items():
+        into[key] = into.get(key, 0) + value
+
+
+def _merge_buckets(into, shard):
+    for key, counts in shard.items():
+        total = into.get(key)
+        if total is None:
+            into[key] = list(counts)
+        else:
+            for i, value in enumerate(counts):
+                total[i] += value
+
+# ============================================
+# METRIC TYPES
+# ============================================
+
+class Counter:
+    """Monotonic count, optionally split by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._shards = _Shards(_merge_counts)
+
+    def inc(self, *values, amount=1):
+        try:
+            shard = self._shards.local.shard
+        except AttributeError:
+            shard = self._shards.mine()
+        shard[values] = shard.get(values, 0) + amount
+
+    def samples(self):
+        return [(self.name, dict(zip(self.labels, key)), value)
+                for key, value in sorted(self._shards.collect().items())]
+
+
+class Histogram:
+    """Bucketed observations (Prometheus cumulative `le` buckets, sum and count)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(_merge_buckets)
+
+    def observe(self, value, *values):
+        try:
+            shard = self._shards.local.shard
+        except AttributeError:
+            shard = self._shards.mine()
+        counts = shard.get(values)
+        if counts is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            counts = shard[values] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def since(self, started, *values):
+        """observe() the seconds elapsed since a perf_counter() reading"""
+        self.observe(time.perf_counter() - started, *values)
+
+    def samples(self):
+        result = []
+        for key, counts in sorted(self._shards.collect().items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", dict(labels, le=_number(bound)), cumulative))
+            result.append((f"{self.name}_sum", labels, counts[-1]))
+            result.append((f"{self.name}_count", labels, cumulative))
+        return result
+
+
+class Collector:
+    """Value read from a component at scrape time (gauge, or a counter it already keeps)
+
+    func returns a number, or {label value(s): number} for labelled series.
+    """
+
+    def __init__(self, name, help, func, kind='gauge', labels=()):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.kind = kind
+        self.labels = tuple(labels)
+
+    def samples(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            return [(self.name, {}, value)]
+        return [(self.name, dict(zip(self.labels, key if isinstance(key, tuple) else (key,))), count)
+                for key, count in sorted(value.items())]
+
+# ============================================
+# REGISTRY / EXPOSITION
+# ============================================
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    """Named metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self, prefix='whatsapp_bot_'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_add(self, name, factory):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory(name)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get_or_add(name, lambda full: Counter(full, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_add(name, lambda full: Histogram(full, help, labels, buckets))
+
+    def collector(self, name, help, func, kind='gauge', labels=()):
+        """Register (or replace) a scrape-time collector"""
+        with self._lock:
+            metric = self._metrics[self.prefix + name] = Collector(self.prefix + name, help, func, kind, labels)
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                log.warning("⚠️ Metric %s failed to collect: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                if labels:
+                    rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_number(value)}")
+                else:
+                    lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+collector = REGISTRY.collector
+render = REGISTRY.render
+
+
+def register_components(outbound=None, engine=None, sessions=None, dedup=None, tenants=None):
+    """Scrape-time collectors for the bot's queues, retries and sessions
+
+    The outbound_* series are the default pool; tenants (a TenantRegistry)
+    adds tenant_outbound_* series per phone_number_id, read from the current
+    table so reloaded tenants show up on the next scrape.
+    """
+    if outbound is not None:
+        collector('outbound_queue_depth', "Replies queued or in flight", lambda: outbound.stats()['queue_depth'])
+        collector('outbound_delayed', "Replies waiting out a backoff or rate limit",
+                  lambda: outbound.stats()['delayed'])
+        collector('outbound_retries_total', "Sends retried after throttling or transient errors",
+                  lambda: outbound.stats()['retries'], kind='counter')
+        collector('outbound_throttled_total', "Sends answered with 429 / 5xx / retryable codes",
+                  lambda: outbound.stats()['throttled'], kind='counter')
+        collector('outbound_jobs_total', "Finished outbound jobs by result",
+                  lambda: {key: value for key, value in outbound.stats().items()
+                           if key in ('completed', 'failed', 'rejected')},
+                  kind='counter', labels=('result',))
+    if tenants is not None:
+        collector('tenant_outbound_queue_depth', "Replies queued or in flight, by tenant number",
+                  lambda: {tenant.number: tenant.outbound.stats()['queue_depth'] for tenant in tenants},
+                  labels=('number',))
+        collector('tenant_outbound_jobs_total', "Finished outbound jobs, by tenant number and result",
+                  lambda: {(tenant.number, key): value for tenant in tenants
+                           for key, value in tenant.outbound.stats().items()
+                           if key in ('completed', 'failed', 'rejected')},
+                  kind='counter', labels=('number', 'result'))
+    if engine is not None:
+        collector('engine_queue_depth', "Messages waiting for their phone's partition",
+                  lambda: engine.stats()['queue_depth'])
+        collector('engine_rejected_total', "Messages dropped because a partition was full",
+                  lambda: engine.stats()['rejected'], kind='counter')
+    if sessions is not None:
+        collector('sessions', "Live sessions by conversation state", sessions.count_by_state,
+                  labels=('state',))
+    if dedup is not None:
+        collector('webhook_duplicates_total', "Redelivered messages skipped",
+                  lambda: dedup.stats()['duplicates'], kind='counter')
+    if PROFILER is not None:
+        collector('profiler_samples_total', "Stack samples taken by the sampling profiler",
+                  lambda: PROFILER.samples, kind='counter')
+
+# ============================================
+# SAMPLING PROFILER
+# ============================================
+
+class SamplingProfiler:
+    """Samples every thread's Python stack `hz` times a second into folded-stack counts"""
+
+    def __init__(self, hz=100, max_depth=48):
+        self.interval = 1.0 / hz
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-profiler", daemon=True)
+            self._thread.start()
+        log.info("🔬 Sampling profiler started (%.0f Hz)", 1 / self.interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        log.info("🔬 Sampling profiler stopped (%s samples)", self.samples)
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    key = ';'.join(reversed(stack))
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def folded(self, limit=None):
+        """'frame;frame;frame count' lines, busiest first (flamegraph.pl / speedscope input)"""
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks[:limit])
+
+
+PROFILER = None   # set up by configure_profiler() when METRICS_PROFILE_HZ > 0
+
+
+def configure_profiler(config):
+    """Create the (stopped) profiler at METRICS_PROFILE_HZ; None when it is 0"""
+    global PROFILER
+    hz = config.metrics_profile_hz
+    PROFILER = SamplingProfiler(hz) if hz > 0 else None
+    return PROFILER
+
+
+def toggle_profiler(enabled):
+    """Start / stop the profiler; returns False when METRICS_PROFILE_HZ is unset"""
+    if PROFILER is None:
+        return False
+    if enabled:
+        PROFILER.start()
+    else:
+        PROFILER.stop()
+    return True
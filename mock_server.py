@@ -0,0 +1,315 @@
+"""
+🧪 MOCK WHATSAPP PROVIDERS - local stand-in for the Graph API and WATI
+Emulates both send APIs (configurable latency, error rate, 429 throttling) and
+fires synthetic inbound webhooks at the bot, so capacity tests run on a laptop
+with no network.
+
+  python mock_server.py serve [--port 8900] [--latency-ms 50] [--jitter-ms 20]
+                              [--error-rate 0.01] [--throttle 0.05] [--retry-after 1]
+  python mock_server.py webhooks http://127.0.0.1:5000/webhook [--provider meta|wati]
+                              [--conversations 100] [--threads 8] [--rate 50]
+                              [--app-secret SECRET]  (signs Meta webhooks; default $APP_SECRET)
+
+Point the bot at it with GRAPH_BASE_URL=http://127.0.0.1:8900/v18.0 (app.py) or
+WATI_BASE_URL=http://127.0.0.1:8900/api/v1 (test.py). GET /_stats returns counters.
+"""
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PHONE_NUMBER_ID = "950947014765895"
+
+# ============================================
+# PROVIDER EMULATION
+# ============================================
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Graph: POST /<version>/<phone_id>/messages, WATI: POST /api/v1/sendSessionMessage/<number>"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+
+        path = self.path.split('?', 1)[0]
+        if path.endswith('/messages'):
+            provider = 'meta'
+        elif '/sendSessionMessage/' in path:
+            provider = 'wati'
+        else:
+            return self._reply(404, {"error": {"message": f"Unknown path {path}", "code": 803}})
+
+        server = self.server
+        delay = server.latency + (random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < server.throttle:
+            server.count('throttled')
+            headers = {'Retry-After': str(server.retry_after)} if server.retry_after is not None else {}
+            if provider == 'meta':
+                return self._reply(429, {"error": {"message": "(#130429) Rate limit hit",
+                                                   "type": "OAuthException", "code": 130429}}, headers)
+            return self._reply(429, {"ok": False, "result": "error", "info": "Too many requests"}, headers)
+
+        if roll < server.throttle + server.error_rate:
+            server.count('errors')
+            if provider == 'meta':
+                return self._reply(500, {"error": {"message": "An unknown error occurred",
+                                                   "type": "OAuthException", "code": 1,
+                                                   "is_transient": True}})
+            return self._reply(500, {"ok": False, "result": "error", "info": "Internal server error"})
+
+        payload = json.loads(raw or b'{}')
+        message_id = f"wamid.mock.{server.count('hits')}"
+        recipient = payload.get('to') if provider == 'meta' else path.rsplit('/', 1)[-1]
+        if server.received is not None:
+            server.received.append(payload)
+        if server.listener is not None:
+            server.listener(provider, recipient, payload)
+
+        if provider == 'meta':
+            return self._reply(200, {"messaging_product": "whatsapp",
+                                     "contacts": [{"input": recipient, "wa_id": recipient}],
+                                     "messages": [{"id": message_id}]})
+        return self._reply(200, {"ok": True, "result": "success",
+                                 "message": {"id": message_id, "waId": recipient, "text": payload.get('text')}})
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/_stats':
+            return self._reply(200, self.server.stats())
+        # Phone number lookup used by debug_api.py / test_token.py
+        return self._reply(200, {"id": path.rsplit('/', 1)[-1], "verified_name": "Mock Emergency Bot",
+                                 "quality_rating": "GREEN", "display_phone_number": "15551799388"})
+
+    def _reply(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, handler=MockHandler, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle=0.0, retry_after=None, record=False, listener=None):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.received = [] if record else None   # accepted request bodies, in arrival order
+        self.listener = listener                  # called as listener(provider, recipient, payload)
+
+        self.hits = 0
+        self.throttled = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def count(self, counter):
+        with self._lock:
+            value = getattr(self, counter) + 1
+            setattr(self, counter, value)
+            return value
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "throttled": self.throttled, "errors": self.errors}
+
+
+def start_mock(port=0, **options):
+    """Start the mock in a daemon thread and return (server, base_url)
+
+    Options are MockServer's: latency / jitter (seconds), error_rate and
+    throttle (fractions of sends), retry_after (seconds), record, listener.
+    """
+    server = MockServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# ============================================
+# SYNTHETIC INBOUND WEBHOOKS
+# ============================================
+
+_message_ids = itertools.count()
+
+
+def meta_change(value, phone_number_id=PHONE_NUMBER_ID):
+    """Graph webhook envelope around one change value"""
+    value = dict(value, messaging_product="whatsapp",
+                 metadata={"display_phone_number": "15551799388", "phone_number_id": phone_number_id})
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "123456789", "changes": [{"value": value, "field": "messages"}]}]
+    }
+
+
+def meta_message(phone, message, phone_number_id=PHONE_NUMBER_ID):
+    """Envelope carrying one inbound message of any type (id / from / timestamp filled in)"""
+    message = dict(message, id=f"wamid.mock.in.{next(_message_ids)}", timestamp=str(int(time.time())))
+    message['from'] = phone
+    return meta_change({"contacts": [{"profile": {"name": "Mock User"}, "wa_id": phone}],
+                        "messages": [message]}, phone_number_id)
+
+
+def meta_envelope(phone, body, phone_number_id=PHONE_NUMBER_ID):
+    """Graph webhook envelope carrying one inbound text message"""
+    return meta_message(phone, {"type": "text", "text": {"body": body}}, phone_number_id)
+
+
+def meta_location_envelope(phone, latitude, longitude, name=None, phone_number_id=PHONE_NUMBER_ID):
+    """Graph webhook envelope carrying a shared location pin"""
+    location = {"latitude": latitude, "longitude": longitude}
+    if name:
+        location["name"] = name
+    return meta_message(phone, {"type": "location", "location": location}, phone_number_id)
+
+
+def meta_status_envelope(phone, status="delivered", phone_number_id=PHONE_NUMBER_ID):
+    """Graph webhook envelope carrying one delivery status update"""
+    return meta_change({"statuses": [{
+        "id": f"wamid.mock.{next(_message_ids)}",
+        "status": status,
+        "timestamp": str(int(time.time())),
+        "recipient_id": phone,
+    }]}, phone_number_id)
+
+
+def wati_event(phone, body):
+    """WATI webhook event carrying one inbound text message"""
+    n = next(_message_ids)
+    return {
+        "id": f"mock-in-{n}",
+        "whatsappMessageId": f"wamid.mock.in.{n}",
+        "waId": phone,
+        "senderName": "Mock User",
+        "type": "text",
+        "text": body,
+        "timestamp": str(int(time.time())),
+    }
+
+
+BUILDERS = {'meta': meta_envelope, 'wati': wati_event}
+
+
+def post_webhook(session, url, payload, secret=None, timeout=30):
+    """POST a webhook as raw JSON bytes, signed with X-Hub-Signature-256 like Meta when secret is set"""
+    body = json.dumps(payload).encode()
+    headers = {'Content-Type': 'application/json'}
+    if secret:
+        key = secret.encode() if isinstance(secret, str) else secret
+        headers['X-Hub-Signature-256'] = 'sha256=' + hmac.new(key, body, hashlib.sha256).hexdigest()
+    return session.post(url, data=body, headers=headers, timeout=timeout)
+
+
+def conversation_script(i):
+    """HELP -> emergency choice -> address, spread over the three emergency types"""
+    return ("HELP", str(i % 3 + 1), f"{i} MG Road, Bengaluru")
+
+
+def fire_webhooks(url, provider='meta', conversations=100, threads=8, rate=0.0, first_phone=0, secret=None):
+    """POST full conversations to the bot's webhook; returns (latencies, failures).
+
+    Each phone's messages go out in order; phones run in parallel across
+    `threads`. rate > 0 caps the overall webhooks per second. With an app
+    secret, Meta webhooks are signed.
+    """
+    build = BUILDERS[provider]
+    interval = threads / rate if rate else 0.0
+    local = threading.local()
+    latencies = []
+    failures = []
+
+    def converse(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        phone = f"91{first_phone + i:010d}"
+        for body in conversation_script(i):
+            started = time.perf_counter()
+            try:
+                status = post_webhook(local.session, url, build(phone, body), secret).status_code
+            except requests.RequestException as e:
+                status = str(e)
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            if status != 200:
+                failures.append((phone, body, status))
+            if interval > elapsed:
+                time.sleep(interval - elapsed)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(converse, range(conversations)))
+    return latencies, failures
+
+# ============================================
+# COMMAND LINE
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the WhatsApp Graph and WATI APIs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="emulate the provider send APIs")
+    serve.add_argument('--port', type=int, default=8900)
+    serve.add_argument('--latency-ms', type=float, default=0.0)
+    serve.add_argument('--jitter-ms', type=float, default=0.0)
+    serve.add_argument('--error-rate', type=float, default=0.0, help="fraction of sends answered with 500")
+    serve.add_argument('--throttle', type=float, default=0.0, help="fraction of sends answered with 429")
+    serve.add_argument('--retry-after', type=float, default=None, help="Retry-After seconds on 429s")
+
+    fire = commands.add_parser('webhooks', help="send synthetic inbound conversations to the bot")
+    fire.add_argument('url')
+    fire.add_argument('--provider', choices=sorted(BUILDERS), default='meta')
+    fire.add_argument('--conversations', type=int, default=100)
+    fire.add_argument('--threads', type=int, default=8)
+    fire.add_argument('--rate', type=float, default=0.0, help="max webhooks per second (0 = unlimited)")
+    fire.add_argument('--app-secret', default=os.getenv('APP_SECRET'), help="sign Meta webhooks with this secret")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        server, url = start_mock(args.port, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                                 error_rate=args.error_rate, throttle=args.throttle,
+                                 retry_after=args.retry_after)
+        print(f"🧪 Mock Graph/WATI listening on {url}", flush=True)
+        print(f"   GRAPH_BASE_URL={url}/v18.0  WATI_BASE_URL={url}/api/v1", flush=True)
+        threading.Event().wait()
+
+    started = time.perf_counter()
+    latencies, failures = fire_webhooks(args.url, args.provider, args.conversations,
+                                        args.threads, args.rate,
+                                        secret=args.app_secret if args.provider == 'meta' else None)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"📨 {len(latencies)} webhooks in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f}ms, "
+          f"{len(failures)} failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""
+📤 OUTBOUND DISPATCH - rate-limit-aware scheduler for WhatsApp replies
+The webhook enqueues reply jobs here and returns 200 straight away. Workers
+pick jobs by priority lane (dispatch confirmations before menus), respect a
+phone-number-wide and a per-recipient token bucket, keep each recipient's
+replies in order, and retry throttled / 5xx sends with jittered exponential
+backoff.
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Priority lanes (lower runs first)
+PRIORITY_URGENT = 0   # dispatch confirmations
+PRIORITY_NORMAL = 1   # follow-up prompts (e.g. "share your location")
+PRIORITY_LOW = 2      # menus and "type HELP" hints
+
+PRIORITY_NAMES = {PRIORITY_URGENT: "urgent", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+
+class RetryableSendError(Exception):
+    """Raised by a send function when the provider throttled us or failed transiently"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket; take() returns 0 on success or the seconds to wait"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Job:
+    __slots__ = ('func', 'args', 'kwargs', 'priority', 'recipient', 'seq', 'attempts', 'queued_at')
+
+    def __init__(self, func, args, kwargs, priority, recipient, seq):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.recipient = recipient
+        self.seq = seq
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class OutboundDispatcher:
+    """Priority / rate-limited scheduler drained by a fixed pool of worker threads"""
+
+    def __init__(self, workers=4, max_queue=1000, name="outbound",
+                 rate=80.0, burst=80, recipient_rate=1.0, recipient_burst=5,
+                 max_retries=5, backoff_base=0.5, backoff_max=30.0):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+
+        self._global_bucket = TokenBucket(rate, burst) if rate else None
+        self._recipient_buckets = {}
+
+        self._ready = []      # heap of (priority, seq, job)
+        self._delayed = []    # heap of (ready_at, seq, job) - backoff and rate-limit waits
+        self._lanes = {}      # recipient -> deque of jobs queued behind the one in progress
+        self._pending = 0
+        self._in_flight = 0
+        self._seq = itertools.count()
+
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)
+        self._room = threading.Condition(lock)   # submitters waiting for queue space
+        self._threads = []
+        self._started = False
+        self._accepting = True
+        self._stopping = False
+
+        # Backpressure / scheduling metrics
+        self.enqueued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.max_depth = 0
+        self._started_jobs = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self):
+        """Spawn worker threads (idempotent)"""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, priority=PRIORITY_NORMAL, recipient=None, timeout=0, **kwargs):
+        """Queue a send job. Returns False if the queue is full or shutting down.
+
+        Jobs for the same recipient run one at a time in submission order and
+        share that recipient's token bucket. A full queue rejects at once unless
+        timeout gives the seconds to wait for a job to finish and make room.
+        """
+        self.start()
+
+        with self._cond:
+            if timeout > 0:
+                deadline = time.monotonic() + timeout
+                while self._accepting and self._pending >= self.max_queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._room.wait(remaining)
+            if not self._accepting or self._pending >= self.max_queue:
+                self.rejected += 1
+                full = self._accepting
+            else:
+                job = _Job(func, args, kwargs, priority, recipient, next(self._seq))
+                self._pending += 1
+                self.enqueued += 1
+                self.max_depth = max(self.max_depth, self._pending)
+
+                lane = self._lanes.get(recipient) if recipient is not None else None
+                if lane is not None:
+                    lane.append(job)       # runs after the recipient's earlier replies
+                else:
+                    if recipient is not None:
+                        self._lanes[recipient] = deque()
+                    heapq.heappush(self._ready, (priority, job.seq, job))
+                    self._cond.notify()
+                return True
+
+        if full:
+            log.warning("⚠️ Outbound queue full (%s) - dropped %s", self.max_queue, getattr(func, '__name__', func))
+        return False
+
+    # ----------------------------------------
+    # Scheduling (called with self._cond held)
+    # ----------------------------------------
+
+    def _promote_due(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, job = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (job.priority, job.seq, job))
+
+    def _recipient_bucket(self, recipient, now):
+        bucket = self._recipient_buckets.get(recipient)
+        if bucket is None:
+            if len(self._recipient_buckets) > 10000:
+                # Full buckets carry no state worth keeping
+                self._recipient_buckets = {
+                    r: b for r, b in self._recipient_buckets.items() if not b.full(now)
+                }
+            bucket = self._recipient_buckets[recipient] = TokenBucket(
+                self.recipient_rate, self.recipient_burst, now)
+        return bucket
+
+    def _next_job(self):
+        """Block until a job may run now; None means the worker should exit"""
+        while True:
+            if self._stopping:
+                return None
+            now = time.monotonic()
+            self._promote_due(now)
+
+            if self._ready:
+                job = self._ready[0][2]
+                bucket = None
+                if job.recipient is not None and self.recipient_rate:
+                    bucket = self._recipient_bucket(job.recipient, now)
+                    wait = bucket.take(now)
+                    if wait:
+                        # Only this recipient is over its pair limit - park it, serve others
+                        heapq.heappop(self._ready)
+                        heapq.heappush(self._delayed, (now + wait, job.seq, job))
+                        self.rate_limited += 1
+                        continue
+
+                wait = self._global_bucket.take(now) if self._global_bucket else 0.0
+                if not wait:
+                    heapq.heappop(self._ready)
+                    self._in_flight += 1
+                    return job
+
+                # The whole number is at its limit: hand the recipient token back and wait
+                if bucket is not None:
+                    bucket.tokens += 1
+                self.rate_limited += 1
+                self._cond.wait(wait)
+                continue
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._cond.wait(timeout)
+
+    def _finish(self, job, ok):
+        self._pending -= 1
+        self._in_flight -= 1
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if job.recipient is not None:
+            lane = self._lanes.get(job.recipient)
+            if lane:
+                nxt = lane.popleft()
+                heapq.heappush(self._ready, (nxt.priority, nxt.seq, nxt))
+            else:
+                self._lanes.pop(job.recipient, None)
+        self._cond.notify_all()
+        self._room.notify()
+
+    def _backoff(self, job, retry_after):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (job.attempts - 1)))
+        delay = random.uniform(delay / 2, delay)   # jitter so retries don't stampede
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    return
+                if job.attempts == 0:
+                    waited = time.monotonic() - job.queued_at
+                    self._started_jobs += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+
+            job.attempts += 1
+            name = getattr(job.func, '__name__', job.func)
+            try:
+                job.func(*job.args, **job.kwargs)
+                ok = True
+            except RetryableSendError as e:
+                with self._cond:
+                    self.throttled += 1
+                    if job.attempts <= self.max_retries:
+                        delay = self._backoff(job, e.retry_after)
+                        self.retries += 1
+                        self._in_flight -= 1
+                        heapq.heappush(self._delayed, (time.monotonic() + delay, job.seq, job))
+                        self._cond.notify()
+                        log.warning("⏳ %s to %s throttled (%s) - retry %s in %.1fs",
+                                    name, job.recipient, e, job.attempts, delay)
+                        continue
+                log.error("❌ %s to %s gave up after %s attempts: %s", name, job.recipient, job.attempts, e)
+                ok = False
+            except Exception as e:
+                log.exception("❌ Outbound job %s failed: %s", name, e)
+                ok = False
+
+            with self._cond:
+                self._finish(job, ok)
+
+    def join(self, timeout=None):
+        """Wait until every queued job has run (or given up)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        """Queue depth, lane, retry and latency counters for /health"""
+        with self._cond:
+            ready = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._ready:
+                ready[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            started = self._started_jobs
+            return {
+                "workers": self.workers,
+                "queue_depth": self._pending,
+                "queue_limit": self.max_queue,
+                "max_depth": self.max_depth,
+                "ready_by_priority": ready,
+                "delayed": len(self._delayed),
+                "in_flight": self._in_flight,
+                "enqueued": self.enqueued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "rate_limited_waits": self.rate_limited,
+                "avg_wait_ms": round(self._wait_total / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+            }
+
+    def shutdown(self, timeout=10.0):
+        """Stop accepting jobs, drain what is queued, then stop workers"""
+        with self._cond:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._room.notify_all()
+        if not self._started:
+            return
+
+        log.info("⏳ Draining outbound queue (%s pending)...", self._pending)
+        self.join(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(1.0)
+        log.info("✅ Outbound dispatcher stopped (%s sent, %s failed)", self.completed, self.failed)
+
+
+def create_dispatcher(config, name="outbound", **overrides):
+    """Build a dispatcher from the OUTBOUND_* settings and drain it at exit
+
+    overrides replace individual settings (a tenant's own workers / rate limits).
+    """
+    settings = dict(
+        workers=config.outbound_workers,
+        max_queue=config.outbound_queue_size,
+        rate=config.outbound_rate_per_sec,
+        burst=config.outbound_burst,
+        recipient_rate=config.outbound_recipient_rate_per_sec,
+        recipient_burst=config.outbound_recipient_burst,
+        max_retries=config.outbound_max_retries,
+        backoff_base=config.outbound_backoff_base,
+        backoff_max=config.outbound_backoff_max,
+    )
+    settings.update(overrides)
+    dispatcher = OutboundDispatcher(name=name, **settings)
+    atexit.register(dispatcher.shutdown)
+    return dispatcher
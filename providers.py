@@ -0,0 +1,226 @@
+"""
+📡 PROVIDER CLIENTS - pooled keep-alive HTTP sessions for Meta Graph and WATI
+One client per provider is built at startup and shared by every send (its
+HTTP session, and the requests import, on the first send or warm()). Every
+client implements the same Provider interface: send_text() returns the raw
+response, deliver() sends and classifies the outcome the same way for both
+providers (parsed body, None for a permanent failure, RetryableSendError when
+the provider throttled us or failed transiently).
+"""
+import logging
+import threading
+import time
+
+import metrics
+from outbound import RetryableSendError
+from templates import PayloadCache
+
+log = logging.getLogger(__name__)
+
+SEND_SECONDS = metrics.histogram('outbound_send_seconds', "Provider send latency by HTTP status",
+                                 ('provider', 'status'))
+
+GRAPH_BASE_URL = "https://graph.facebook.com/v18.0"
+WATI_BASE_URL = "https://api.wati.io/api/v1"
+
+# Graph error codes that mean "slow down / try again later", not "bad message"
+RETRYABLE_GRAPH_CODES = frozenset({1, 2, 4, 80007, 130429, 131000, 131048, 131056})
+
+
+def meta_text_payload(phone_number, message_text):
+    """Graph API body for a plain text message"""
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": phone_number,
+        "type": "text",
+        "text": {"body": message_text}
+    }
+
+
+def wati_text_payload(phone_number, message_text):
+    """WATI body for a session message (the number travels in the URL)"""
+    return {"text": message_text}
+
+
+def retry_after_seconds(response):
+    """Retry-After header in seconds, if the provider sent one"""
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Provider:
+    """What app.py / test.py need from a WhatsApp provider"""
+
+    name = "provider"
+    retryable_codes = frozenset()
+    config_hint = "provider credentials"
+
+    @property
+    def configured(self):
+        return bool(self.token)
+
+    def check_response(self, phone_number, response):
+        """Parsed body for a 2xx; raises RetryableSendError for throttling / 5xx; None otherwise"""
+        if 200 <= response.status_code < 300:
+            log.info("✅ Message sent to %s", phone_number, extra={'phone': phone_number, 'provider': self.name})
+            try:
+                return response.json()
+            except ValueError:
+                return {}
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableSendError(f"HTTP {response.status_code}", retry_after_seconds(response))
+
+        if self.retryable_codes:
+            try:
+                code = response.json().get('error', {}).get('code')
+            except (ValueError, AttributeError):
+                code = None
+            if code in self.retryable_codes:
+                raise RetryableSendError(f"{self.name} error {code}", retry_after_seconds(response))
+
+        log.error("❌ Failed to send to %s: %s %s", phone_number, response.status_code, response.text,
+                  extra={'phone': phone_number, 'provider': self.name, 'status_code': response.status_code})
+        return None
+
+    def missing_config(self):
+        log.error("❌ %s not configured - set %s in .env", self.name, self.config_hint)
+
+
+class ProviderClient(Provider):
+    """Shared requests.Session with a sized connection pool and precomputed headers"""
+
+    def __init__(self, token, base_url, pool_size=8, timeout=10):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled session, opened on first use"""
+        return self._session or self._open_session()
+
+    def _open_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                # One pool per host, sized to the number of outbound workers so that
+                # concurrent sends reuse warm TLS connections instead of opening new ones
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=False)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({
+                    'Authorization': f'Bearer {self.token}',
+                    'Content-Type': 'application/json',
+                    'Connection': 'keep-alive',
+                })
+                self._session = session
+        return self._session
+
+    def warm(self, texts=()):
+        """Pre-encode texts and open the session ahead of the first send"""
+        self.payloads.prewarm(texts)
+        self._open_session()
+
+    def post(self, url, payload):
+        return self.session.post(url, json=payload, timeout=self.timeout)
+
+    def post_body(self, url, body):
+        """POST an already-encoded JSON body"""
+        return self.session.post(url, data=body, timeout=self.timeout)
+
+    def deliver(self, phone_number, message_text):
+        """Send a text and classify the result (see Provider.check_response)"""
+        import requests
+
+        if not self.configured:
+            self.missing_config()
+            return None
+        log.debug("📤 %s → %s: %.50s...", self.name, phone_number, message_text)
+        started = time.perf_counter()
+        try:
+            response = self.send_text(phone_number, message_text)
+        except requests.RequestException as e:
+            SEND_SECONDS.since(started, self.name, 'error')
+            raise RetryableSendError(f"network error: {e}")
+        SEND_SECONDS.since(started, self.name, str(response.status_code))
+        return self.check_response(phone_number, response)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class MetaClient(ProviderClient):
+    """WhatsApp Cloud API (graph.facebook.com) client"""
+
+    name = "meta"
+    retryable_codes = RETRYABLE_GRAPH_CODES
+    config_hint = "WHATSAPP_TOKEN and WHATSAPP_PHONE_NUMBER_ID"
+
+    def __init__(self, token, phone_id, base_url=GRAPH_BASE_URL, **kwargs):
+        super().__init__(token, base_url, **kwargs)
+        self.phone_id = phone_id
+        self.messages_url = f"{self.base_url}/{phone_id}/messages"
+        self.payloads = PayloadCache(meta_text_payload)
+
+    @property
+    def configured(self):
+        return bool(self.token and self.phone_id)
+
+    def send_text(self, phone_number, message_text):
+        return self.post_body(self.messages_url, self.payloads.body(phone_number, message_text))
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.whatsapp_token,
+            config.whatsapp_phone_number_id,
+            base_url=config.graph_base_url or GRAPH_BASE_URL,
+            pool_size=config.outbound_workers,
+        )
+
+
+class WatiClient(ProviderClient):
+    """WATI.io session message client"""
+
+    name = "wati"
+    config_hint = "WATI_API_KEY"
+
+    def __init__(self, token, base_url=WATI_BASE_URL, **kwargs):
+        super().__init__(token, base_url, **kwargs)
+        self.send_url_prefix = f"{self.base_url}/sendSessionMessage/"
+        self.payloads = PayloadCache(wati_text_payload)
+
+    def send_text(self, phone_number, message_text):
+        # WATI wants the number without the leading +
+        url = self.send_url_prefix + phone_number.replace('+', '')
+        return self.post_body(url, self.payloads.body(phone_number, message_text))
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.wati_api_key,
+            base_url=config.wati_base_url or WATI_BASE_URL,
+            pool_size=config.outbound_workers,
+        )
+
+
+PROVIDERS = {'meta': MetaClient, 'wati': WatiClient}
+
+
+def create_provider(config, name=None):
+    """Client for WHATSAPP_PROVIDER (meta | wati), or the provider name given"""
+    name = (name or config.whatsapp_provider).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown WHATSAPP_PROVIDER {name!r} (expected one of {', '.join(PROVIDERS)})")
+    return PROVIDERS[name].from_config(config)
@@ -0,0 +1,828 @@
+"""
+🗂️ SESSION STORE - conversation state keyed by phone number
+Sessions are compact __slots__ records with integer state codes. Backends:
+  memory - lock-striped LRU maps with an idle TTL and a background sweeper
+  sqlite - WAL-mode database file with batched writes (survives restarts)
+  server - one memory store served over a local socket to many worker processes
+           (start it with: python session_store.py serve). Clients and server
+           share SESSION_SERVER_AUTHKEY, which is required unless the server
+           listens on loopback or a unix socket; there it defaults to a random
+           key kept in ~/.whatsapp-bot-sessions.key (readable by this user only).
+"""
+import atexit
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+STATES = ('idle', 'awaiting_choice', 'awaiting_location', 'completed')
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+EMERGENCY_TYPES = ('medical', 'fire', 'police', 'unknown')
+EMERGENCY_CODES = {name: code for code, name in enumerate(EMERGENCY_TYPES)}
+
+
+def stripe_index(phone, stripes):
+    """Stable phone -> stripe/partition mapping (same across processes)"""
+    return zlib.crc32(phone.encode()) % stripes
+
+
+def filter_codes(state=None, emergency_type=None):
+    """Validate page() filters and turn them into record codes (None = any)"""
+    if state is not None and state not in STATE_CODES:
+        raise ValueError(f"Unknown state: {state}")
+    if emergency_type is not None and emergency_type not in EMERGENCY_CODES:
+        raise ValueError(f"Unknown emergency_type: {emergency_type}")
+    return (STATE_CODES[state] if state is not None else None,
+            EMERGENCY_CODES[emergency_type] if emergency_type is not None else None)
+
+
+def matches(session, state_code=None, emergency_code=None, active_after=None, active_before=None):
+    return ((state_code is None or session.state == state_code)
+            and (emergency_code is None or session.emergency == emergency_code)
+            and (active_after is None or session.last_active >= active_after)
+            and (active_before is None or session.last_active < active_before))
+
+
+def next_page(rows, limit):
+    """Trim a page fetched with one extra row; the extra row's presence means there is more"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][0]
+    return rows, None
+
+
+class Session:
+    """One conversation, stored as small ints/floats instead of a str-keyed dict"""
+
+    __slots__ = ('state', 'emergency', 'location', 'created', 'last_active', 'extra')
+
+    def __init__(self, state=0, emergency=-1, location=None, created=None, last_active=None):
+        now = time.time()
+        self.state = state
+        self.emergency = emergency
+        self.location = location
+        self.created = created or now
+        self.last_active = last_active or now
+        self.extra = None
+
+    def apply(self, fields):
+        """Merge dict-style fields (as used by the webhook handlers) into the record"""
+        for key, value in fields.items():
+            if key == 'state':
+                self.state = STATE_CODES[value]
+            elif key == 'emergency_type':
+                self.emergency = EMERGENCY_CODES.get(value, EMERGENCY_CODES['unknown'])
+            elif key == 'location':
+                self.location = value
+            elif key in ('created', 'last_active'):
+                continue  # timestamps are maintained by the store
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def to_dict(self):
+        data = {
+            'state': STATES[self.state],
+            'created': datetime.fromtimestamp(self.created).isoformat(),
+            'last_active': datetime.fromtimestamp(self.last_active).isoformat(),
+        }
+        if self.emergency >= 0:
+            data['emergency_type'] = EMERGENCY_TYPES[self.emergency]
+        if self.location is not None:
+            data['location'] = self.location
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, fields):
+        session = cls()
+        session.apply(fields)
+        return session
+
+    def to_row(self):
+        extra = json.dumps(self.extra) if self.extra else None
+        return (self.state, self.emergency, self.location, self.created, self.last_active, extra)
+
+    @classmethod
+    def from_row(cls, row):
+        state, emergency, location, created, last_active, extra = row
+        session = cls(state, emergency, location, created, last_active)
+        if extra:
+            session.extra = json.loads(extra)
+        return session
+
+    def nbytes(self):
+        size = sys.getsizeof(self)
+        if self.location is not None:
+            size += sys.getsizeof(self.location)
+        if self.extra:
+            size += sys.getsizeof(self.extra)
+        return size
+
+
+class SessionStore:
+    """Interface every session backend implements (dicts in, dicts out)"""
+
+    def get(self, phone):
+        """Return a copy of the session as a dict, or None"""
+        raise NotImplementedError
+
+    def set(self, phone, session):
+        raise NotImplementedError
+
+    def update(self, phone, **fields):
+        """Merge fields into an existing session; returns False if there is none"""
+        raise NotImplementedError
+
+    def delete(self, phone):
+        raise NotImplementedError
+
+    def __contains__(self, phone):
+        return self.get(phone) is not None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Every live session as {phone: dict}"""
+        raise NotImplementedError
+
+    def count_by_state(self):
+        """{state name: sessions in it} (for /metrics)"""
+        counts = dict.fromkeys(STATES, 0)
+        for session in self.snapshot().values():
+            counts[session['state']] = counts.get(session['state'], 0) + 1
+        return counts
+
+    def page(self, cursor=None, limit=100, state=None, emergency_type=None, active_after=None, active_before=None):
+        """Up to `limit` sessions ordered by phone, starting after `cursor`
+
+        Filters: state, emergency_type, and last_active (unix seconds) in
+        [active_after, active_before). Returns ([(phone, dict), ...], next_cursor);
+        next_cursor is None on the last page.
+        """
+        filter_codes(state, emergency_type)
+        rows = []
+        for phone, session in self.snapshot().items():
+            if cursor is not None and phone <= cursor:
+                continue
+            if state is not None and session['state'] != state:
+                continue
+            if emergency_type is not None and session.get('emergency_type') != emergency_type:
+                continue
+            if active_after is not None or active_before is not None:
+                last_active = datetime.fromisoformat(session['last_active']).timestamp()
+                if not ((active_after is None or last_active >= active_after)
+                        and (active_before is None or last_active < active_before)):
+                    continue
+            rows.append((phone, session))
+        rows = heapq.nsmallest(limit + 1, rows, key=lambda row: row[0])
+        return next_page(rows, limit)
+
+    def export(self, batch=500, **filters):
+        """Every matching (phone, dict), fetched `batch` at a time (for streaming dumps)"""
+        cursor = None
+        while True:
+            rows, cursor = self.page(cursor, batch, **filters)
+            yield from rows
+            if cursor is None:
+                return
+
+    def stats(self):
+        return {"backend": type(self).__name__, "entries": len(self)}
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store: lock-striped LRU maps with idle TTL and a max-entries cap
+
+    Each stripe also keeps phone sets per state and per emergency type, so
+    filtered pages and count_by_state only touch the sessions that match.
+    """
+
+    def __init__(self, stripes=16, ttl=3600, max_entries=100000, sweep_interval=30):
+        self.stripes = stripes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._per_stripe = max(1, max_entries // stripes)
+        self._maps = [OrderedDict() for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._bytes = [0] * stripes
+        self._by_state = [[set() for _ in STATES] for _ in range(stripes)]
+        self._by_emergency = [{} for _ in range(stripes)]   # emergency code (-1 = none) -> phones
+
+        self._evicted_ttl = [0] * stripes
+        self._evicted_lru = [0] * stripes
+
+        self._sweeper = None
+        self._stop = threading.Event()
+        if sweep_interval and ttl:
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, args=(sweep_interval,), name="session-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _stripe(self, phone):
+        return stripe_index(phone, self.stripes)
+
+    def _expired(self, session, now):
+        return self.ttl and now - session.last_active > self.ttl
+
+    def _index(self, i, phone, session):
+        self._by_state[i][session.state].add(phone)
+        phones = self._by_emergency[i].get(session.emergency)
+        if phones is None:
+            phones = self._by_emergency[i][session.emergency] = set()
+        phones.add(phone)
+
+    def _unindex(self, i, phone, session):
+        self._by_state[i][session.state].discard(phone)
+        self._by_emergency[i][session.emergency].discard(phone)
+
+    def _live(self, i, phone, now):
+        """Fetch a non-expired record and mark it most recently used (lock held)"""
+        data = self._maps[i]
+        session = data.get(phone)
+        if session is None:
+            return None
+        if self._expired(session, now):
+            self._bytes[i] -= session.nbytes()
+            self._unindex(i, phone, session)
+            del data[phone]
+            self._evicted_ttl[i] += 1
+            return None
+        data.move_to_end(phone)
+        return session
+
+    def _insert(self, i, phone, session):
+        data = self._maps[i]
+        old = data.pop(phone, None)
+        if old is not None:
+            self._bytes[i] -= old.nbytes()
+            self._unindex(i, phone, old)
+            session.created = old.created
+        data[phone] = session
+        self._bytes[i] += session.nbytes()
+        self._index(i, phone, session)
+        while len(data) > self._per_stripe:
+            evicted_phone, evicted = data.popitem(last=False)
+            self._bytes[i] -= evicted.nbytes()
+            self._unindex(i, evicted_phone, evicted)
+            self._evicted_lru[i] += 1
+
+    def get(self, phone):
+        i = self._stripe(phone)
+        with self._locks[i]:
+            session = self._live(i, phone, time.time())
+            return session.to_dict() if session is not None else None
+
+    def set(self, phone, session):
+        i = self._stripe(phone)
+        record = Session.from_dict(session)
+        with self._locks[i]:
+            self._insert(i, phone, record)
+
+    def update(self, phone, **fields):
+        i = self._stripe(phone)
+        now = time.time()
+        with self._locks[i]:
+            session = self._live(i, phone, now)
+            if session is None:
+                return False
+            self._bytes[i] -= session.nbytes()
+            self._unindex(i, phone, session)
+            session.apply(fields)
+            session.last_active = now
+            self._bytes[i] += session.nbytes()
+            self._index(i, phone, session)
+            return True
+
+    def delete(self, phone):
+        i = self._stripe(phone)
+        with self._locks[i]:
+            session = self._maps[i].pop(phone, None)
+            if session is None:
+                return None
+            self._bytes[i] -= session.nbytes()
+            self._unindex(i, phone, session)
+            return session.to_dict()
+
+    def __contains__(self, phone):
+        i = self._stripe(phone)
+        with self._locks[i]:
+            return self._live(i, phone, time.time()) is not None
+
+    def __len__(self):
+        return sum(len(data) for data in self._maps)
+
+    def snapshot(self):
+        result = {}
+        for data, lock in zip(self._maps, self._locks):
+            with lock:
+                result.update({phone: session.to_dict() for phone, session in data.items()})
+        return result
+
+    def count_by_state(self):
+        counts = [0] * len(STATES)
+        for by_state, lock in zip(self._by_state, self._locks):
+            with lock:
+                for code, phones in enumerate(by_state):
+                    counts[code] += len(phones)
+        return dict(zip(STATES, counts))
+
+    def _candidates(self, i, state_code, emergency_code):
+        """Smallest index set covering the filters (the stripe's map when unfiltered; lock held)"""
+        sets = []
+        if state_code is not None:
+            sets.append(self._by_state[i][state_code])
+        if emergency_code is not None:
+            sets.append(self._by_emergency[i].get(emergency_code, ()))
+        return min(sets, key=len) if sets else self._maps[i]
+
+    def page(self, cursor=None, limit=100, state=None, emergency_type=None, active_after=None, active_before=None):
+        state_code, emergency_code = filter_codes(state, emergency_type)
+        now = time.time()
+        rows = []
+        for i, lock in enumerate(self._locks):
+            with lock:
+                data = self._maps[i]
+                found = []
+                for phone in self._candidates(i, state_code, emergency_code):
+                    if cursor is not None and phone <= cursor:
+                        continue
+                    session = data[phone]
+                    if not self._expired(session, now) and matches(session, state_code, emergency_code,
+                                                                   active_after, active_before):
+                        found.append(phone)
+                # Only the stripe's first limit + 1 phones can make the page; render just those
+                rows.extend((phone, data[phone].to_dict()) for phone in heapq.nsmallest(limit + 1, found))
+        rows.sort(key=lambda row: row[0])
+        return next_page(rows[:limit + 1], limit)
+
+    def export(self, batch=500, **filters):
+        """Matching sessions one stripe at a time, so only a stripe is ever copied at once"""
+        state_code, emergency_code = filter_codes(filters.get('state'), filters.get('emergency_type'))
+        active_after, active_before = filters.get('active_after'), filters.get('active_before')
+        for i, lock in enumerate(self._locks):
+            now = time.time()
+            with lock:
+                data = self._maps[i]
+                rows = [(phone, data[phone].to_dict())
+                        for phone in self._candidates(i, state_code, emergency_code)
+                        if not self._expired(data[phone], now)
+                        and matches(data[phone], state_code, emergency_code, active_after, active_before)]
+            yield from rows
+
+    def clear(self):
+        for i, lock in enumerate(self._locks):
+            with lock:
+                self._maps[i].clear()
+                self._bytes[i] = 0
+                self._by_state[i] = [set() for _ in STATES]
+                self._by_emergency[i] = {}
+
+    def sweep(self):
+        """Drop idle sessions
+
+        Scans every record: LRU order is not expiry order, since a read moves a
+        session to the back without touching its last_active.
+        """
+        if not self.ttl:
+            return 0
+        now = time.time()
+        removed = 0
+        for i, lock in enumerate(self._locks):
+            with lock:
+                data = self._maps[i]
+                expired = [phone for phone, session in data.items() if self._expired(session, now)]
+                for phone in expired:
+                    session = data.pop(phone)
+                    self._bytes[i] -= session.nbytes()
+                    self._unindex(i, phone, session)
+                self._evicted_ttl[i] += len(expired)
+                removed += len(expired)
+        return removed
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "evicted_ttl": sum(self._evicted_ttl),
+            "evicted_lru": sum(self._evicted_lru),
+            "memory_bytes": sum(self._bytes),
+        }
+
+    def close(self):
+        self._stop.set()
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) backend shared by every process pointing at the same file.
+
+    Writes are staged in memory and committed in one transaction every
+    batch_interval seconds (or once batch_size are pending); reads in this
+    process see staged writes immediately. batch_interval=0 writes through.
+    """
+
+    _DELETED = object()
+
+    def __init__(self, path='sessions.db', ttl=3600, batch_interval=0.05, batch_size=256):
+        self.path = path
+        self.ttl = ttl
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " phone TEXT PRIMARY KEY, state INTEGER, emergency INTEGER, location TEXT,"
+            " created REAL, last_active REAL, extra TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions(last_active)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_state ON sessions(state, phone)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_emergency ON sessions(emergency, phone)")
+        conn.commit()
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if batch_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-flusher", daemon=True)
+            self._flusher.start()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, phone):
+        with self._pending_lock:
+            staged = self._pending.get(phone)
+        if staged is self._DELETED:
+            return None
+        if staged is not None:
+            return Session.from_row(staged)
+        row = self._conn().execute(
+            "SELECT state, emergency, location, created, last_active, extra"
+            " FROM sessions WHERE phone = ?", (phone,)
+        ).fetchone()
+        return Session.from_row(row) if row else None
+
+    def _live(self, phone):
+        session = self._load(phone)
+        if session is None:
+            return None
+        if self.ttl and time.time() - session.last_active > self.ttl:
+            self._stage(phone, self._DELETED)
+            return None
+        return session
+
+    def _stage(self, phone, value):
+        if not self.batch_interval:
+            self._write({phone: value})
+            return
+        with self._pending_lock:
+            self._pending[phone] = value
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _write(self, batch):
+        conn = self._conn()
+        upserts = [(phone,) + row for phone, row in batch.items() if row is not self._DELETED]
+        deletes = [(phone,) for phone, row in batch.items() if row is self._DELETED]
+        with conn:
+            if upserts:
+                conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)", upserts)
+            if deletes:
+                conn.executemany("DELETE FROM sessions WHERE phone = ?", deletes)
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    def flush(self):
+        """Commit every staged write in a single transaction"""
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+            if batch:
+                self._write(batch)
+
+    def _flush_loop(self):
+        import sqlite3
+
+        while not self._stop.wait(self.batch_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.error("❌ Session flush failed: %s", e)
+
+    def get(self, phone):
+        session = self._live(phone)
+        return session.to_dict() if session is not None else None
+
+    def set(self, phone, session):
+        record = Session.from_dict(session)
+        old = self._load(phone)
+        if old is not None:
+            record.created = old.created
+        self._stage(phone, record.to_row())
+
+    def update(self, phone, **fields):
+        session = self._live(phone)
+        if session is None:
+            return False
+        session.apply(fields)
+        session.last_active = time.time()
+        self._stage(phone, session.to_row())
+        return True
+
+    def delete(self, phone):
+        session = self._load(phone)
+        self._stage(phone, self._DELETED)
+        return session.to_dict() if session is not None else None
+
+    def __contains__(self, phone):
+        return self._live(phone) is not None
+
+    def __len__(self):
+        self.flush()
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def snapshot(self):
+        self.flush()
+        rows = self._conn().execute(
+            "SELECT phone, state, emergency, location, created, last_active, extra FROM sessions"
+        )
+        return {row[0]: Session.from_row(row[1:]).to_dict() for row in rows}
+
+    def count_by_state(self):
+        self.flush()
+        counts = dict.fromkeys(STATES, 0)
+        for code, count in self._conn().execute("SELECT state, COUNT(*) FROM sessions GROUP BY state"):
+            counts[STATES[code]] = count
+        return counts
+
+    def page(self, cursor=None, limit=100, state=None, emergency_type=None, active_after=None, active_before=None):
+        state_code, emergency_code = filter_codes(state, emergency_type)
+        clauses, params = [], []
+        for clause, value in (("phone > ?", cursor), ("state = ?", state_code), ("emergency = ?", emergency_code),
+                              ("last_active >= ?", active_after), ("last_active < ?", active_before),
+                              ("last_active >= ?", time.time() - self.ttl if self.ttl else None)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        self.flush()
+        rows = self._conn().execute(
+            "SELECT phone, state, emergency, location, created, last_active, extra"
+            f" FROM sessions{where} ORDER BY phone LIMIT ?", (*params, limit + 1)
+        )
+        return next_page([(row[0], Session.from_row(row[1:]).to_dict()) for row in rows], limit)
+
+    def sweep(self):
+        if not self.ttl:
+            return 0
+        self.flush()
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute("DELETE FROM sessions WHERE last_active < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def stats(self):
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": len(self),
+            "ttl_seconds": self.ttl,
+            "pending_writes": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+# ============================================
+# LOCAL-SOCKET BACKEND (many worker processes, one store)
+# ============================================
+
+_served_store = None
+
+
+def _get_served_store():
+    return _served_store
+
+
+_manager_class = None
+
+
+def _session_manager(address, authkey):
+    """Manager for the served store (multiprocessing is only imported by this backend)"""
+    global _manager_class
+    if _manager_class is None:
+        from multiprocessing.managers import BaseManager
+
+        class _SessionManager(BaseManager):
+            pass
+
+        _SessionManager.register(
+            'store', callable=_get_served_store,
+            exposed=('get', 'set', 'update', 'delete', '__contains__', '__len__', 'snapshot', 'count_by_state',
+                     'page', 'stats'),
+        )
+        _manager_class = _SessionManager
+    return _manager_class(address=parse_address(address), authkey=authkey)
+
+
+def parse_address(address):
+    """'127.0.0.1:50055' -> (host, port); anything else is a unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+LOCAL_KEY_FILE = os.path.join(os.path.expanduser('~'), '.whatsapp-bot-sessions.key')
+
+
+def is_loopback(address):
+    """True for a unix socket path or a loopback host"""
+    import ipaddress
+
+    address = parse_address(address)
+    if isinstance(address, str):
+        return True
+    host = address[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _local_authkey(path=LOCAL_KEY_FILE):
+    """This user's random session-server key, created on first use (atomically, mode 0600)"""
+    import secrets
+
+    if not os.path.exists(path):
+        staged = f"{path}.{os.getpid()}"
+        fd = os.open(staged, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_hex(32).encode())
+        try:
+            os.link(staged, path)
+        except FileExistsError:
+            pass   # another process got there first; use its key
+        finally:
+            os.unlink(staged)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+
+def session_authkey(address, key=None):
+    """authkey for a session server at address; refuses a non-loopback address without a key"""
+    if key:
+        return key.encode() if isinstance(key, str) else key
+    if not is_loopback(address):
+        raise ValueError(f"Set SESSION_SERVER_AUTHKEY: the session server at {address} is reachable "
+                         f"from other hosts, and it unpickles what authenticated clients send")
+    return _local_authkey()
+
+
+class RemoteSessionStore(SessionStore):
+    """Client for a session server; each thread gets its own socket connection"""
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self._manager = _session_manager(address, authkey)
+        self._manager.connect()
+        self._proxy = self._manager.store()
+
+    def get(self, phone):
+        return self._proxy.get(phone)
+
+    def set(self, phone, session):
+        self._proxy.set(phone, session)
+
+    def update(self, phone, **fields):
+        return self._proxy.update(phone, **fields)
+
+    def delete(self, phone):
+        return self._proxy.delete(phone)
+
+    def __contains__(self, phone):
+        return self._proxy.__contains__(phone)
+
+    def __len__(self):
+        return self._proxy.__len__()
+
+    def snapshot(self):
+        return self._proxy.snapshot()
+
+    def count_by_state(self):
+        return self._proxy.count_by_state()
+
+    def page(self, cursor=None, limit=100, **filters):
+        rows, cursor = self._proxy.page(cursor, limit, **filters)
+        return list(rows), cursor
+
+    def stats(self):
+        stats = dict(self._proxy.stats())
+        stats["backend"] = "server"
+        stats["address"] = self.address
+        return stats
+
+
+def serve_sessions(address, authkey, store):
+    """Serve a MemorySessionStore to RemoteSessionStore clients (blocks)"""
+    global _served_store
+    _served_store = store
+    manager = _session_manager(address, authkey)
+    server = manager.get_server()
+    log.info("🗂️ Session server listening on %s", address)
+    server.serve_forever()
+
+
+def create_memory_store(config):
+    """MemorySessionStore from SESSION_STRIPES / SESSION_TTL / SESSION_MAX_ENTRIES / SESSION_SWEEP_INTERVAL"""
+    return MemorySessionStore(
+        stripes=config.session_stripes,
+        ttl=config.session_ttl,
+        max_entries=config.session_max_entries,
+        sweep_interval=config.session_sweep_interval,
+    )
+
+
+def create_session_store(config):
+    """Build the store selected by SESSION_BACKEND (memory | sqlite | server), closed at exit"""
+    backend = config.session_backend
+    if backend == 'sqlite':
+        store = SQLiteSessionStore(
+            path=config.session_db_path,
+            ttl=config.session_ttl,
+            batch_interval=config.session_batch_interval,
+            batch_size=config.session_batch_size,
+        )
+    elif backend == 'server':
+        address = config.session_server_address
+        store = RemoteSessionStore(
+            address=address,
+            authkey=session_authkey(address, config.session_server_authkey),
+        )
+    elif backend == 'memory':
+        store = create_memory_store(config)
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    atexit.register(store.close)
+    return store
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['serve']:
+        from bot_logging import configure_logging
+        from config import load_config
+        config = load_config()
+        configure_logging(config)
+        address = config.session_server_address
+        serve_sessions(
+            address=address,
+            authkey=session_authkey(address, config.session_server_authkey),
+            store=create_memory_store(config),
+        )
+    else:
+        print("Usage: python session_store.py serve")
@@ -0,0 +1,296 @@
+"""
+💬 MESSAGE TEMPLATES - localized reply texts and pre-encoded send payloads
+Nearly every reply the bot sends is a fixed template, so its JSON body is
+rendered and encoded once; a send only splices the recipient into the cached
+bytes instead of rebuilding and re-serializing the whole payload. (Confirmations
+that quote an assigned unit are the exception and go through the LRU part.)
+"""
+import json
+import threading
+from collections import OrderedDict
+
+ANY = '*'   # fallback key in per-emergency templates (and "any input" in flow rules)
+
+EMERGENCY_NAMES = {
+    "medical": "Medical Emergency 🚑",
+    "fire": "Fire Emergency 🔥",
+    "police": "Police Emergency 👮"
+}
+
+# ============================================
+# ENGLISH (str, or {emergency_type: str} with ANY as the fallback)
+# ============================================
+
+TEMPLATES = {
+    "menu": """🚨 *Welcome to 108 Emergency Services*
+
+Please choose emergency type:
+
+1. 🚑 *Medical Emergency* - Ambulance
+2. 🔥 *Fire Emergency* - Fire Brigade
+3. 👮 *Police Emergency* - Police
+
+Reply with *1*, *2*, or *3*""",
+
+    "help_first": "Please type HELP first",
+
+    "start_hint": "Type 'HELP' to start emergency services",
+
+    "location_request": {
+        emergency: f"""📍 *{name} Selected*
+
+Please share your location:
+• Tap 📎 *attachment* icon
+• Select *Location*
+• Send your current location
+
+*OR* type your address manually."""
+        for emergency, name in dict(EMERGENCY_NAMES, **{ANY: 'Emergency'}).items()
+    },
+
+    # {eta} is the eta_default for the type, or eta_unit once a unit is assigned
+    "confirmation_dispatch": {
+        "medical": """✅ *Ambulance Dispatched!*
+
+⏱️ *ETA:* {eta}
+📞 *Medical team will call you shortly*
+
+*Please:*
+• Stay with the patient
+• Keep medicines handy
+• Clear entrance pathway
+• Keep phone accessible""",
+
+        "fire": """✅ *Fire Engine Dispatched!*
+
+⏱️ *ETA:* {eta}
+📞 *Firefighters will contact you*
+
+*Immediately:*
+• Evacuate everyone
+• Close all doors
+• Don't use elevators
+• Gather at safe distance""",
+
+        "police": """✅ *Police Patrol Dispatched!*
+
+⏱️ *ETA:* {eta}
+📞 *Officer will call for details*
+
+*Please:*
+• Stay in safe location
+• Secure premises
+• Keep phone ready
+• Note suspect details""",
+
+        ANY: "✅ Help is on the way!",
+    },
+
+    "eta_default": {"medical": "8-12 minutes", "fire": "6-10 minutes", "police": "5-9 minutes",
+                    ANY: "10-15 minutes"},
+
+    "eta_unit": "{low}-{high} minutes\n🚨 *Unit:* {unit} ({distance} km away)",
+}
+
+# ============================================
+# LOCALIZED VARIANTS (missing keys fall back to English)
+# ============================================
+
+EMERGENCY_NAMES_HI = {
+    "medical": "चिकित्सा आपातकाल 🚑",
+    "fire": "आग आपातकाल 🔥",
+    "police": "पुलिस आपातकाल 👮"
+}
+
+TEMPLATES_HI = {
+    "menu": """🚨 *108 आपातकालीन सेवाओं में आपका स्वागत है*
+
+कृपया आपातकाल का प्रकार चुनें:
+
+1. 🚑 *चिकित्सा आपातकाल* - एम्बुलेंस
+2. 🔥 *आग आपातकाल* - दमकल
+3. 👮 *पुलिस आपातकाल* - पुलिस
+
+*1*, *2* या *3* लिखकर जवाब दें""",
+
+    "help_first": "कृपया पहले HELP लिखें",
+
+    "start_hint": "आपातकालीन सेवा शुरू करने के लिए 'HELP' लिखें",
+
+    "location_request": {
+        emergency: f"""📍 *{name} चुना गया*
+
+कृपया अपना स्थान भेजें:
+• 📎 *अटैचमेंट* आइकन दबाएं
+• *Location* चुनें
+• अपना वर्तमान स्थान भेजें
+
+*या* अपना पता लिखकर भेजें।"""
+        for emergency, name in dict(EMERGENCY_NAMES_HI, **{ANY: 'आपातकाल'}).items()
+    },
+
+    "confirmation_dispatch": {
+        "medical": """✅ *एम्बुलेंस रवाना!*
+
+⏱️ *पहुंचने का समय:* {eta}
+📞 *मेडिकल टीम जल्द ही आपको कॉल करेगी*
+
+*कृपया:*
+• मरीज़ के साथ रहें
+• दवाइयां पास रखें
+• प्रवेश का रास्ता खाली रखें
+• फ़ोन पास रखें""",
+
+        "fire": """✅ *दमकल रवाना!*
+
+⏱️ *पहुंचने का समय:* {eta}
+📞 *दमकलकर्मी आपसे संपर्क करेंगे*
+
+*तुरंत:*
+• सभी को बाहर निकालें
+• सभी दरवाज़े बंद करें
+• लिफ्ट का उपयोग न करें
+• सुरक्षित दूरी पर इकट्ठा हों""",
+
+        "police": """✅ *पुलिस गश्ती दल रवाना!*
+
+⏱️ *पहुंचने का समय:* {eta}
+📞 *अधिकारी विवरण के लिए कॉल करेंगे*
+
+*कृपया:*
+• सुरक्षित स्थान पर रहें
+• परिसर सुरक्षित करें
+• फ़ोन तैयार रखें
+• संदिग्ध का विवरण नोट करें""",
+
+        ANY: "✅ मदद रास्ते में है!",
+    },
+
+    "eta_default": {"medical": "8-12 मिनट", "fire": "6-10 मिनट", "police": "5-9 मिनट",
+                    ANY: "10-15 मिनट"},
+
+    "eta_unit": "{low}-{high} मिनट\n🚨 *यूनिट:* {unit} ({distance} किमी दूर)",
+}
+
+LOCALIZED_TEMPLATES = {
+    'en': TEMPLATES,
+    'hi': TEMPLATES_HI,
+}
+
+
+# Building blocks that are formatted into other texts, never sent as they are
+FORMAT_KEYS = ('confirmation_dispatch', 'eta_default', 'eta_unit')
+
+
+def templates_for(language, overrides=None):
+    """Template set for a language code, falling back to English key by key.
+
+    overrides (e.g. a tenant's own texts) replace whole keys. "confirmation"
+    is derived here: the dispatch confirmations with the fixed per-type ETA
+    filled in, for when no unit could be assigned.
+    """
+    localized = LOCALIZED_TEMPLATES.get((language or 'en').lower(), {})
+    templates = dict(TEMPLATES, **localized)
+    templates.update(overrides or {})
+    eta = templates['eta_default']
+    templates['confirmation'] = {
+        emergency: text.format(eta=eta.get(emergency, eta[ANY]))
+        for emergency, text in templates['confirmation_dispatch'].items()
+    }
+    return templates
+
+
+def dispatch_text(templates, emergency_type, assignment):
+    """Confirmation quoting the assigned unit and its ETA window"""
+    eta = templates['eta_unit'].format(low=assignment.eta_min, high=assignment.eta_max,
+                                       unit=assignment.unit.name,
+                                       distance=f"{assignment.distance_km:.1f}")
+    confirmations = templates['confirmation_dispatch']
+    return confirmations.get(emergency_type, confirmations[ANY]).format(eta=eta)
+
+
+def template_texts(templates):
+    """Every concrete text in a template set (for pre-encoding at startup)"""
+    for key, template in templates.items():
+        if key in FORMAT_KEYS:
+            continue
+        if isinstance(template, dict):
+            yield from template.values()
+        else:
+            yield template
+
+# ============================================
+# PRE-ENCODED PAYLOADS
+# ============================================
+
+_RECIPIENT = "\x00recipient\x00"
+
+
+class PayloadCache:
+    """text -> encoded JSON body, split around the recipient so only `to` is spliced per send
+
+    `shape(recipient, text)` returns the provider's payload dict; it is called
+    once per distinct text. Prewarmed texts (the templates) live in their own
+    table and are never evicted; other texts (free-form replies) go through a
+    bounded LRU, so the cache never grows without limit.
+    """
+
+    def __init__(self, shape, max_entries=1024):
+        self.shape = shape
+        self.max_entries = max_entries
+        self._prewarmed = {}
+        self._parts = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _encode(self, text):
+        body = json.dumps(self.shape(_RECIPIENT, text), ensure_ascii=False, separators=(',', ':'))
+        return tuple(part.encode('utf-8') for part in body.split(json.dumps(_RECIPIENT)[1:-1]))
+
+    def prewarm(self, texts):
+        """Encode texts ahead of the first send; they stay cached whatever else is sent"""
+        prewarmed = dict(self._prewarmed)
+        for text in texts:
+            prewarmed[text] = self._encode(text)
+        self._prewarmed = prewarmed
+
+    def _cached(self, text):
+        """Parts for a free-form text, through the LRU"""
+        with self._lock:
+            parts = self._parts.get(text)
+            if parts is not None:
+                self._parts.move_to_end(text)
+                self.hits += 1
+                return parts
+        parts = self._encode(text)
+        with self._lock:
+            self.misses += 1
+            self._parts[text] = parts
+            if len(self._parts) > self.max_entries:
+                self._parts.popitem(last=False)
+        return parts
+
+    def body(self, recipient, text):
+        """Encoded JSON body for sending `text` to `recipient`"""
+        parts = self._prewarmed.get(text)
+        if parts is None:
+            parts = self._cached(text)
+        else:
+            self.hits += 1
+        if len(parts) == 1:
+            return parts[0]
+        # Phone numbers are digits (maybe a leading +), so they need no JSON escaping
+        if not recipient.lstrip('+').isdigit():
+            recipient = json.dumps(recipient)[1:-1]
+        return recipient.encode().join(parts)
+
+    def stats(self):
+        return {
+            "prewarmed": len(self._prewarmed),
+            "entries": len(self._parts),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,221 @@
+"""
+🏢 TENANTS - several regional 108 numbers served by one deployment
+Every webhook change names the business number it was sent to
+(value.metadata.phone_number_id). That id selects the tenant: its Graph
+credentials, reply language and template overrides (compiled into its own
+flow), and its own outbound pool, so one region's rate limits and backlog never
+hold up another's.
+
+Tenants load from TENANTS_FILE (JSON) into an in-memory table that is replaced
+whole on reload, so routing is a single dict lookup with no lock. The file is
+re-read when its mtime changes (checked every TENANTS_RELOAD_INTERVAL seconds)
+or on POST /tenants/reload; tenants whose config did not change are kept as
+they are, and a changed tenant keeps its outbound pool unless its outbound
+settings changed.
+
+    {"tenants": [{"phone_number_id": "1234", "name": "karnataka",
+                  "token_env": "KA_WHATSAPP_TOKEN", "language": "en",
+                  "templates": {"start_hint": "..."},
+                  "outbound": {"workers": 4, "rate": 40}}]}
+
+Without TENANTS_FILE the number from .env (WHATSAPP_PHONE_NUMBER_ID) is the
+only tenant, exactly as before. Sessions of other tenants are keyed
+"<phone_number_id>:<phone>" so one caller can talk to two regions at once.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from outbound import create_dispatcher
+from providers import MetaClient, GRAPH_BASE_URL
+from templates import templates_for, template_texts
+
+log = logging.getLogger(__name__)
+
+# Per-tenant "outbound" keys -> OutboundDispatcher settings
+OUTBOUND_SETTINGS = ('workers', 'max_queue', 'rate', 'burst', 'recipient_rate', 'recipient_burst',
+                     'max_retries', 'backoff_base', 'backoff_max')
+
+
+class Tenant:
+    """One business number and everything needed to answer on it"""
+
+    def __init__(self, number, name, client, conversation, outbound, config=None, default=False):
+        self.number = number
+        self.name = name
+        self.client = client
+        self.conversation = conversation
+        self.outbound = outbound
+        self.config = config or {}
+        self.default = default
+        self.session_prefix = '' if default else f"{number}:"
+
+    def session_key(self, phone):
+        return self.session_prefix + phone
+
+    def stats(self):
+        outbound = self.outbound.stats()
+        return {
+            "name": self.name,
+            "default": self.default,
+            "configured": self.client.configured,
+            "outbound": {key: outbound[key] for key in ('queue_depth', 'completed', 'failed', 'rejected')},
+        }
+
+
+def build_tenant(config, bot_config, previous=None, default=None, compile_for=None):
+    """Tenant from one TENANTS_FILE entry
+
+    bot_config is the bot's own Config (language, outbound and Graph defaults);
+    compile_for(templates) compiles the flow for a template set; previous is
+    the tenant this config replaces, whose outbound pool is reused when the
+    outbound settings are unchanged.
+    """
+    number = str(config['phone_number_id'])
+    name = config.get('name') or number
+    token = config.get('token') or os.getenv(config.get('token_env') or '')
+    if not token:
+        log.warning("⚠️ Tenant %s has no token (set token or token_env)", name)
+
+    templates = templates_for(config.get('language') or bot_config.bot_language, config.get('templates'))
+    settings = {key: value for key, value in (config.get('outbound') or {}).items() if key in OUTBOUND_SETTINGS}
+
+    if previous is not None and previous.config.get('outbound') == config.get('outbound'):
+        outbound = previous.outbound
+    else:
+        outbound = create_dispatcher(bot_config, f"outbound-{name}", **settings)
+    client = MetaClient(token, number, base_url=config.get('base_url') or bot_config.graph_base_url or GRAPH_BASE_URL,
+                        pool_size=settings.get('workers', outbound.workers))
+    client.payloads.prewarm(template_texts(templates))
+    return Tenant(number, name, client, compile_for(templates), outbound, config,
+                  default=default is not None and number == default.number)
+
+
+class TenantRegistry:
+    """phone_number_id -> Tenant, swapped whole on every (re)load"""
+
+    def __init__(self, default=None, path=None, build=None, reload_interval=5):
+        self.default = default
+        self.path = path
+        self._build = build
+        self._table = {default.number: default} if default is not None and default.number else {}
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+
+        self.reloads = 0
+        self.reload_errors = 0
+        self.unrouted = 0
+        self.loaded_at = None
+
+        self._stop = threading.Event()
+        self._watcher = None
+        if path:
+            self.reload()
+            if reload_interval:
+                self._watcher = threading.Thread(target=self._watch, args=(reload_interval,),
+                                                 name="tenant-reloader", daemon=True)
+                self._watcher.start()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __iter__(self):
+        return iter(list(self._table.values()))
+
+    def get(self, number):
+        return self._table.get(number)
+
+    def route(self, number):
+        """Tenant for a webhook's phone_number_id, or None for a number we don't serve
+
+        Without a tenants file every number goes to the default tenant, as before.
+        """
+        if number is None or self.path is None:
+            return self.default
+        tenant = self._table.get(number)
+        if tenant is None:
+            self.unrouted += 1
+        return tenant
+
+    def for_key(self, key):
+        """(tenant, phone) for a session key, e.g. from the journal; tenant is None if it is gone"""
+        number, _, phone = key.rpartition(':')
+        if number:
+            return self._table.get(number), phone
+        # Unprefixed keys belong to the .env number (possibly redefined in the file)
+        if self.default is not None and self.default.number in self._table:
+            return self._table[self.default.number], phone
+        return self.default, phone
+
+    def reload(self):
+        """Re-read the tenants file; the old table stays in place if it is unreadable"""
+        with self._reload_lock:
+            try:
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, encoding='utf-8') as f:
+                    configs = json.load(f)['tenants']
+                table = {}
+                for config in configs:
+                    number = str(config['phone_number_id'])
+                    previous = self._table.get(number)
+                    if previous is not None and previous.config == config:
+                        table[number] = previous
+                    else:
+                        table[number] = self._build(config, previous, self.default)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.reload_errors += 1
+                log.error("❌ Could not load tenants from %s: %s", self.path, e)
+                return False
+            if self.default is not None and self.default.number and self.default.number not in table:
+                table[self.default.number] = self.default
+
+            old, self._table = self._table, table
+            self.reloads += 1
+            self.loaded_at = time.time()
+
+        # Pools no tenant uses any more drain in the background; the default
+        # pool is also app.outbound, so it stays up even if the file replaces it
+        kept = {id(tenant.outbound) for tenant in table.values()}
+        if self.default is not None:
+            kept.add(id(self.default.outbound))
+        for tenant in old.values():
+            if id(tenant.outbound) not in kept:
+                kept.add(id(tenant.outbound))
+                threading.Thread(target=tenant.outbound.shutdown, daemon=True).start()
+        log.info("🏢 Loaded %s tenants from %s", len(table), self.path)
+        return True
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+
+    def stats(self):
+        return {
+            "tenants": len(self._table),
+            "file": self.path,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "unrouted_messages": self.unrouted,
+            "loaded_at": self.loaded_at,
+            "by_number": {number: tenant.stats() for number, tenant in sorted(self._table.items())},
+        }
+
+    def close(self):
+        self._stop.set()
+
+
+def create_tenants(config, default, compile_for):
+    """Registry from TENANTS_FILE / TENANTS_RELOAD_INTERVAL around the .env tenant"""
+
+    def build(entry, previous, default_tenant):
+        return build_tenant(entry, config, previous, default_tenant, compile_for)
+
+    return TenantRegistry(default, path=config.tenants_file or None, build=build,
+                          reload_interval=config.tenants_reload_interval)
@@ -3,128 +3,86 @@
 100% Working - No Meta issues!
 """
 from flask import Flask, request, jsonify
-import requests
-import os
-import json
-from dotenv import load_dotenv
-from datetime import datetime
+import logging
+import time
+import metrics
+from config import load_config
+from bot_logging import configure_logging, LazyJSON
+from outbound import create_dispatcher, RetryableSendError
+from providers import WatiClient
+from session_store import create_session_store
+from engine import create_engine
+from dedup import create_seen_cache
+from flow import compile_flow
+from dispatch import create_unit_index, dispatch_hook
+from geocode import create_geocoder
+from intents import compile_intents
+from templates import templates_for, template_texts
 
-# Load environment variables
-load_dotenv()
+# Every .env setting, parsed and checked once (ConfigError lists anything malformed)
+config = load_config()
+
+# Queue-backed logging (LOG_LEVEL / LOG_FORMAT in .env)
+configure_logging(config)
+log = logging.getLogger('wati')
 
 app = Flask(__name__)
 
-print("="*60)
-print("🚀 EMERGENCY BOT WITH WATI WHATSAPP")
-print("="*60)
+log.info("🚀 EMERGENCY BOT WITH WATI WHATSAPP")
 
 # WATI Configuration
-WATI_API_KEY = os.getenv('WATI_API_KEY')
-WATI_NUMBER = os.getenv('WATI_NUMBER')
-WATI_BASE_URL = "https://api.wati.io/api/v1"
+WATI_API_KEY = config.wati_api_key
+WATI_NUMBER = config.wati_number
 
-print(f"📱 WATI Number: {WATI_NUMBER}")
-print(f"🔑 API Key: {'✅ Present' if WATI_API_KEY else '❌ Missing'}")
-print("="*60)
+# Pooled keep-alive client for the WATI API (URL prefix and auth built once)
+wati_client = WatiClient.from_config(config)
 
-# Store user sessions
-user_sessions = {}
+log.info("📱 WATI Number: %s", WATI_NUMBER)
+log.info("🔑 API Key: %s", '✅ Present' if WATI_API_KEY else '❌ Missing')
 
-# ============================================
-# WATI WHATSAPP FUNCTIONS (GUARANTEED WORKING)
-# ============================================
-
-def send_wati_message(phone_number, message_text):
-    """Send WhatsApp message via WATI API"""
-    
-    if not WATI_API_KEY:
-        print("❌ ERROR: WATI_API_KEY not found in .env")
-        return False
-    
-    # Clean phone number (remove + if present)
-    phone_clean = phone_number.replace('+', '')
-    
-    # WATI API endpoint
-    url = f"{WATI_BASE_URL}/sendSessionMessage/{phone_clean}"
-    
-    # Headers with API Key
-    headers = {
-        'Authorization': f'Bearer {WATI_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
-    # Message data
-    data = {
-        "text": message_text
-    }
-    
-    print(f"📤 WATI → {phone_number}: {message_text[:50]}...")
-    
-    try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            print(f"✅ Message sent successfully!")
-            return True
-        else:
-            print(f"❌ WATI Error {response.status_code}: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Network error: {e}")
-        return False
+# Store user sessions (lock-striped, idle TTL + LRU cap, see SESSION_* in .env)
+user_sessions = create_session_store(config)
 
-def send_welcome_menu(phone_number):
-    """Send welcome message with emergency options"""
-    
-    message = """🚨 *Welcome to 108 Emergency Services*
+# Background scheduler that sends replies so the webhook can ack immediately
+# (priority lanes, per-number and per-recipient rate limits, retry with backoff)
+outbound = create_dispatcher(config)
 
-Please choose emergency type:
+# Per-phone ordered processing: same phone in order, different phones in parallel
+engine = create_engine(config)
 
-1. 🚑 *Medical Emergency* - Ambulance
-2. 🔥 *Fire Emergency* - Fire Brigade  
-3. 👮 *Police Emergency* - Police
+# Recently seen message IDs, so redelivered webhooks don't re-run the state machine
+seen_messages = create_seen_cache(config)
 
-Reply with *1*, *2*, or *3*"""
-    
-    return send_wati_message(phone_number, message)
+# Same compiled emergency flow as the Meta front end (app.py), in BOT_LANGUAGE
+reply_templates = templates_for(config.bot_language)
+dispatch_units = create_unit_index(config)
+# Offline gazetteer (GEOCODE_GAZETTEER_FILE) that gives typed addresses coordinates
+geocoder = create_geocoder(config)
+conversation = compile_flow(templates=reply_templates,
+                            hooks={'dispatch': dispatch_hook(dispatch_units, reply_templates, geocoder)},
+                            intents=compile_intents())
+wati_client.payloads.prewarm(template_texts(reply_templates))
 
-def ask_for_location(phone_number, emergency_type):
-    """Ask user to share location"""
-    
-    emergency_names = {
-        "medical": "Medical Emergency 🚑",
-        "fire": "Fire Emergency 🔥",
-        "police": "Police Emergency 👮"
-    }
-    
-    message = f"""📍 *{emergency_names.get(emergency_type, 'Emergency')} Selected*
+# Same /metrics series as app.py, labelled provider="wati"
+metrics.register_components(outbound=outbound, engine=engine, sessions=user_sessions, dedup=seen_messages)
+WEBHOOK_REQUESTS = metrics.counter('webhook_requests_total', "Webhook POSTs by response status",
+                                   ('provider', 'status'))
+PARSE_SECONDS = metrics.histogram('webhook_parse_seconds', "Webhook body decode and envelope grouping time",
+                                  ('provider',))
+TRANSITION_SECONDS = metrics.histogram('flow_transition_seconds', "Time to advance a session by one message",
+                                       ('state',))
 
-Please share your location or type your address."""
-    
-    return send_wati_message(phone_number, message)
+# ============================================
+# WATI WHATSAPP FUNCTIONS (GUARANTEED WORKING)
+# ============================================
 
-def send_confirmation(phone_number, emergency_type):
-    """Send confirmation that help is coming"""
-    
-    messages = {
-        "medical": """✅ *Ambulance Dispatched!*
-        
-⏱️ *ETA:* 8-12 minutes
-📞 Medical team will call you shortly""",
-        
-        "fire": """✅ *Fire Engine Dispatched!*
-        
-⏱️ *ETA:* 6-10 minutes
-📞 Firefighters will contact you""",
-        
-        "police": """✅ *Police Patrol Dispatched!*
-        
-⏱️ *ETA:* 5-9 minutes  
-📞 Officer will call for details"""
-    }
+def send_wati_message(phone_number, message_text):
+    """Send WhatsApp message via WATI API
     
-    return send_wati_message(phone_number, messages.get(emergency_type, "✅ Help is on the way!"))
+    Raises RetryableSendError on 429 / 5xx / network errors so the outbound
+    scheduler can back off and retry.
+    """
+    return wati_client.deliver(phone_number, message_text) is not None
 
 # ============================================
 # FLASK ROUTES
@@ -182,9 +140,46 @@ def health():
         "status": "healthy",
         "provider": "WATI.io",
         "whatsapp_number": WATI_NUMBER,
-        "sessions_active": len(user_sessions)
+        "sessions_active": len(user_sessions),
+        "session_store": user_sessions.stats(),
+        "engine": engine.stats(),
+        "dedup": seen_messages.stats(),
+        "outbound": outbound.stats(),
+        "dispatch": dispatch_units.stats(),
+        "geocoder": geocoder.stats()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+# ============================================
+# MESSAGE PROCESSING (runs on the sender's engine partition)
+# ============================================
+
+def process_wati_message(phone, text):
+    """Run one inbound WATI message through the shared emergency flow"""
+    
+    session = user_sessions.get(phone)
+    state = session['state'] if session else conversation.initial
+    started = time.perf_counter()
+    new_session, reply = conversation.step(session, text)
+    TRANSITION_SECONDS.since(started, state)
+    
+    if new_session is not session:
+        log.info("🔀 %s: %s → %s", phone, state, new_session['state'],
+                 extra={'phone': phone, 'state': new_session['state'],
+                        'emergency_type': new_session.get('emergency_type')})
+        user_sessions.set(phone, new_session)
+    
+    if reply:
+        reply_text, priority = reply
+        if not outbound.submit(send_wati_message, phone, reply_text,
+                               priority=priority, recipient=phone, timeout=config.queue_wait):
+            log.error("❌ Reply to %s not queued (outbound full or stopping) - lost", phone,
+                      extra={'phone': phone})
+
 # ============================================
 # WATI WEBHOOK HANDLING
 # ============================================
@@ -193,85 +188,44 @@ def health():
 def handle_webhook():
     """Handle incoming WhatsApp messages from WATI"""
     
-    print("\n" + "="*60)
-    print("📥 WATI WEBHOOK RECEIVED")
-    print("="*60)
-    
     try:
         # Get JSON data
+        started = time.perf_counter()
         data = request.get_json()
-        print(f"📊 Raw data: {json.dumps(data, indent=2)[:500]}...")
+        log.debug("📊 Raw data:\n%s", LazyJSON(data))
         
         # Extract phone number and message
         # WATI sends data in this format
         phone = data.get('waId', '').replace('whatsapp:', '')
         text = data.get('text', '').strip()
         
-        print(f"📱 From: {phone}")
-        print(f"💬 Message: {text}")
+        log.info("📨 Message from %s: %s", phone, text, extra={'phone': phone})
         
         if not phone or not text:
-            print("⚠️ No phone or text found")
+            log.debug("⚠️ No phone or text found")
+            WEBHOOK_REQUESTS.inc('wati', '200')
             return jsonify({"status": "ignored"}), 200
         
-        # Initialize user session
-        if phone not in user_sessions:
-            user_sessions[phone] = {
-                'state': 'idle',
-                'created': datetime.now().isoformat()
-            }
-        
-        session = user_sessions[phone]
+        message_id = data.get('whatsappMessageId') or data.get('id')
+        if seen_messages.seen(message_id):
+            log.info("🔁 Duplicate delivery of %s ignored", message_id)
+            WEBHOOK_REQUESTS.inc('wati', '200')
+            return jsonify({"status": "duplicate"}), 200
+        PARSE_SECONDS.since(started, 'wati')
         
-        # Handle messages
-        text_lower = text.lower()
-        
-        if text_lower == 'help':
-            session['state'] = 'awaiting_choice'
-            send_welcome_menu(phone)
-            print(f"👤 {phone}: Sent welcome menu")
-        
-        elif session['state'] == 'awaiting_choice':
-            if text == '1':
-                session['emergency_type'] = 'medical'
-                session['state'] = 'awaiting_location'
-                ask_for_location(phone, 'medical')
-                print(f"🚑 {phone}: Selected medical")
-            
-            elif text == '2':
-                session['emergency_type'] = 'fire'
-                session['state'] = 'awaiting_location'
-                ask_for_location(phone, 'fire')
-                print(f"🔥 {phone}: Selected fire")
-            
-            elif text == '3':
-                session['emergency_type'] = 'police'
-                session['state'] = 'awaiting_location'
-                ask_for_location(phone, 'police')
-                print(f"👮 {phone}: Selected police")
-            
-            else:
-                send_welcome_menu(phone)
-        
-        elif session['state'] == 'awaiting_location':
-            # User sent location or address
-            session['location'] = text
-            session['state'] = 'completed'
-            
-            emergency_type = session.get('emergency_type', 'unknown')
-            send_confirmation(phone, emergency_type)
-            print(f"📍 {phone}: Location received for {emergency_type}")
-        
-        else:
-            # Default response
-            send_wati_message(phone, "Type HELP to start emergency services")
+        # Queue on the sender's partition so this phone's messages stay in order;
+        # if it stays full, forget the id so WATI's retry is not taken as a duplicate
+        if not engine.submit(phone, process_wati_message, phone, text, timeout=config.queue_wait):
+            seen_messages.forget(message_id)
+            WEBHOOK_REQUESTS.inc('wati', '503')
+            return jsonify({"error": "Busy, retry later"}), 503
         
+        WEBHOOK_REQUESTS.inc('wati', '200')
         return jsonify({"status": "processed"}), 200
         
     except Exception as e:
-        print(f"❌ Webhook error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ Webhook error: %s", e)
+        WEBHOOK_REQUESTS.inc('wati', '500')
         return jsonify({"error": str(e)}), 500
 
 # ============================================
@@ -281,7 +235,11 @@ def handle_webhook():
 @app.route('/send-test/<phone_number>')
 def send_test(phone_number):
     """Manual test endpoint"""
-    success = send_wati_message(phone_number, "🚑 Emergency Bot Test: Type HELP")
+    try:
+        success = send_wati_message(phone_number, "🚑 Emergency Bot Test: Type HELP")
+    except RetryableSendError as e:
+        log.error("❌ Test send failed: %s", e, extra={'phone': phone_number})
+        success = False
     return jsonify({"success": success, "to": phone_number})
 
 # ============================================
@@ -289,11 +247,10 @@ def send_test(phone_number):
 # ============================================
 
 if __name__ == '__main__':
-    port = int(os.getenv('PORT', 5000))
+    port = config.port
     
-    print(f"🌐 Server starting on port {port}")
-    print(f"📡 Webhook URL: https://c3a85f73234a.ngrok-free.app/webhook")
-    print(f"💡 Message '{WATI_NUMBER}' with HELP to test!")
-    print("="*60)
+    log.info("🌐 Server starting on port %s", port)
+    log.info("📡 Webhook URL: https://c3a85f73234a.ngrok-free.app/webhook")
+    log.info("💡 Message '%s' with HELP to test!", WATI_NUMBER)
     
     app.run(host='0.0.0.0', port=port, debug=True, threaded=True)
\ No newline at end of file
@@ -1,13 +1,10 @@
 import requests
 import json
+import pytest
 
-def test_webhook():
-    """Test if webhook can receive messages"""
-    
-    webhook_url = "https://c3a85f73234a.ngrok-free.app/webhook"
-    
-    # Test data simulating WhatsApp
-    test_data = {
+def build_test_payload():
+    """Test data simulating WhatsApp"""
+    return {
         "object": "whatsapp_business_account",
         "entry": [{
             "id": "123456789",
@@ -30,6 +27,24 @@ def test_webhook():
             }]
         }]
     }
+
+@pytest.fixture(scope="module", autouse=True)
+def flushed_logging():
+    """Write out and stop the log listener while pytest's captured stdout is still open
+
+    app.py logs through a listener thread writing to the stdout it saw at import;
+    left to atexit, the outbound drain would log into a stream pytest has closed.
+    """
+    yield
+    from bot_logging import flush_logging
+    flush_logging()
+
+def test_webhook():
+    """Test if webhook can receive messages"""
+    
+    webhook_url = "https://c3a85f73234a.ngrok-free.app/webhook"
+    
+    test_data = build_test_payload()
     
     print("🧪 Testing webhook...")
     
@@ -46,5 +61,32 @@ def test_webhook():
     except Exception as e:
         print(f"❌ Error: {e}")
 
+def test_webhook_replay(times=50):
+    """Replay the same payload many times locally - only ONE reply may go out"""
+    
+    import app as bot
+    
+    sent = []
+    original_send = bot.send_whatsapp_message
+    bot.send_whatsapp_message = lambda phone, text: sent.append((phone, text))
+    
+    try:
+        test_data = build_test_payload()
+        client = bot.app.test_client()
+        
+        for _ in range(times):
+            response = client.post('/webhook', json=test_data)
+            assert response.status_code == 200
+        
+        bot.engine.join(timeout=5)
+        bot.outbound.join(timeout=5)
+        
+        print(f"🔁 Replayed {times}x -> {len(sent)} outbound send(s)")
+        assert len(sent) == 1
+        assert sent[0][0] == "919876543210"
+        
+    finally:
+        bot.send_whatsapp_message = original_send
+
 if __name__ == "__main__":
     test_webhook()
\ No newline at end of file